@@ -0,0 +1,281 @@
+"""
+Benchmark do caminho de cotação
+Latência (p50/p99) e vazão de uma cotação em cada camada, com baseline em
+JSON e limite de regressão
+
+Camadas medidas, de dentro para fora:
+- servico: ServicoCalculoCotacao.calcular
+- use_case: CalcularCotacaoUseCase.execute
+- controller: CotacaoController.calcular_cotacao (com o cache de cotações)
+- asgi: POST /api/v1/cotacao/calcular pela aplicação inteira, em processo
+
+Cada camada é medida por tamanho de família, operadora (com tabela própria
+ou desconhecida, que usa a tabela padrão) e, no controller e no ASGI, com o
+cache frio (limpo antes de cada chamada) ou quente.
+
+Uso (a partir de backend/):
+    python -m benchmarks.cotacao                  # mede e imprime
+    python -m benchmarks.cotacao --salvar         # grava o baseline
+    python -m benchmarks.cotacao --comparar       # falha (código 1) se regrediu
+    python -m benchmarks.cotacao --comparar --tolerancia 0.3 --filtro asgi
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+BASELINE_PADRAO = Path(__file__).parent / "baseline_cotacao.json"
+TAMANHOS_FAMILIA = [1, 4, 30, 500]
+OPERADORAS = ["AMIL", "OUTRA"]  # OUTRA: sem tabela própria (multiplicador padrão)
+FAMILIAS_POR_TAMANHO = 50
+ITERACOES = 100
+AQUECIMENTO = 10
+# Rodadas por cenário; vale a de menor p50 (ruído de máquina só aumenta a latência)
+RODADAS = 5
+# Regressão tolerada em relação ao baseline (0.5 = 50% mais lento). Em
+# máquinas compartilhadas a mediana oscila ~30% entre execuções; em
+# máquina dedicada dá para apertar
+TOLERANCIA = float(os.getenv("BENCH_TOLERANCIA", "0.5"))
+# p99 oscila bem mais que a mediana entre execuções
+TOLERANCIA_P99 = float(os.getenv("BENCH_TOLERANCIA_P99", "1.5"))
+
+
+def gerar_familias(tamanho: int, quantidade: int = FAMILIAS_POR_TAMANHO, semente: int = 42) -> List[List[int]]:
+    """Famílias aleatórias (reprodutíveis) de um tamanho"""
+    gerador = random.Random(semente + tamanho)
+    return [[gerador.randint(0, 90) for _ in range(tamanho)] for _ in range(quantidade)]
+
+
+async def medir(
+    chamada: Callable[[int], Awaitable],
+    preparar: Optional[Callable[[], None]] = None,
+    iteracoes: int = ITERACOES,
+    aquecimento: int = AQUECIMENTO
+) -> Dict:
+    """
+    Mede a latência de cada chamada (preparar() fica fora da medição).
+    O coletor de lixo é executado antes e desligado durante a medição,
+    para que pausas de GC não apareçam como ruído no p99.
+
+    Returns:
+        Dict com p50_us, p99_us e vazao_por_s (cotações por segundo em um
+        único worker, chamadas em sequência)
+    """
+    for i in range(aquecimento):
+        if preparar:
+            preparar()
+        await chamada(i)
+
+    tempos = np.empty(iteracoes, dtype=np.int64)
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(iteracoes):
+            if preparar:
+                preparar()
+            inicio = time.perf_counter_ns()
+            await chamada(i)
+            tempos[i] = time.perf_counter_ns() - inicio
+    finally:
+        gc.enable()
+
+    return {
+        "p50_us": round(float(np.percentile(tempos, 50)) / 1e3, 2),
+        "p99_us": round(float(np.percentile(tempos, 99)) / 1e3, 2),
+        "vazao_por_s": round(1e9 / float(tempos.mean()), 1),
+    }
+
+
+def montar_cenarios() -> Dict[str, Callable[[int], Dict]]:
+    """
+    Cenários nomeados camada/cache/tamanho/operadora; cada um devolve uma
+    função (iteracoes) -> corrotina de medição
+    """
+    import httpx
+
+    from main import app
+    from src.application.dtos.cotacao_dto import CotacaoInputDTO
+    from src.application.use_cases.calcular_cotacao_use_case import CalcularCotacaoUseCase
+    from src.domain.entities.cotacao import Cotacao
+    from src.infrastructure.services.servico_calculo_cotacao import ServicoCalculoCotacao
+    from src.presentation.routers.cotacao_router import cotacao_controller
+
+    servico = ServicoCalculoCotacao()
+    use_case = CalcularCotacaoUseCase(servico)
+    cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    def limpar_cache():
+        cotacao_controller.cache.cache.limpar()
+
+    cenarios = {}
+    for tamanho in TAMANHOS_FAMILIA:
+        familias = gerar_familias(tamanho)
+        for operadora in OPERADORAS:
+            corpos = [{"idades": f, "tipo": "PME", "operadora": operadora} for f in familias]
+            entradas = [CotacaoInputDTO(**corpo) for corpo in corpos]
+            cotacoes = [Cotacao.de_idades(f, "PME", operadora) for f in familias]
+            sufixo = f"{tamanho}_vidas/{operadora}"
+
+            def cenario(chamada, preparar=None):
+                return lambda iteracoes, aquecimento: medir(chamada, preparar, iteracoes, aquecimento)
+
+            async def via_servico(i, cotacoes=cotacoes):
+                await servico.calcular(cotacoes[i % len(cotacoes)])
+
+            async def via_use_case(i, entradas=entradas):
+                await use_case.execute(entradas[i % len(entradas)])
+
+            async def via_controller(i, entradas=entradas):
+                await cotacao_controller.calcular_cotacao(entradas[i % len(entradas)])
+
+            async def via_asgi(i, corpos=corpos):
+                resposta = await cliente.post("/api/v1/cotacao/calcular", json=corpos[i % len(corpos)])
+                resposta.raise_for_status()
+
+            cenarios[f"servico/{sufixo}"] = cenario(via_servico)
+            cenarios[f"use_case/{sufixo}"] = cenario(via_use_case)
+            cenarios[f"controller/frio/{sufixo}"] = cenario(via_controller, limpar_cache)
+            cenarios[f"controller/quente/{sufixo}"] = cenario(via_controller)
+            cenarios[f"asgi/frio/{sufixo}"] = cenario(via_asgi, limpar_cache)
+            cenarios[f"asgi/quente/{sufixo}"] = cenario(via_asgi)
+    return cenarios
+
+
+async def executar(
+    iteracoes: int = ITERACOES,
+    aquecimento: int = AQUECIMENTO,
+    filtro: Optional[str] = None,
+    rodadas: int = RODADAS
+) -> Dict:
+    """
+    Executa os cenários (os que contêm `filtro` no nome, se informado).
+    Cada cenário roda `rodadas` vezes e fica a rodada de menor p50; as
+    rodadas são intercaladas entre os cenários, para que um período de
+    máquina lenta não penalize um cenário só.
+
+    Returns:
+        Dict no formato do baseline: metadados e resultados por cenário
+    """
+    cenarios = {
+        nome: cenario for nome, cenario in montar_cenarios().items()
+        if not filtro or filtro in nome
+    }
+    resultados: Dict[str, Dict] = {}
+    for _ in range(rodadas):
+        for nome, cenario in cenarios.items():
+            medicao = await cenario(iteracoes, aquecimento)
+            if nome not in resultados or medicao["p50_us"] < resultados[nome]["p50_us"]:
+                resultados[nome] = medicao
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "iteracoes": iteracoes,
+        "rodadas": rodadas,
+        "cenarios": resultados,
+    }
+
+
+def comparar(
+    atual: Dict,
+    baseline: Dict,
+    tolerancia: float = TOLERANCIA,
+    tolerancia_p99: float = TOLERANCIA_P99
+) -> List[str]:
+    """
+    Compara uma execução com o baseline
+
+    Regressão: p50 acima de (1 + tolerancia) x baseline, vazão abaixo de
+    baseline / (1 + tolerancia) ou p99 acima de (1 + tolerancia_p99) x
+    baseline. Cenários ausentes em um dos lados são ignorados.
+
+    Returns:
+        Lista de regressões, uma mensagem por métrica (vazia = ok)
+    """
+    regressoes = []
+    for nome, medido in atual["cenarios"].items():
+        referencia = baseline.get("cenarios", {}).get(nome)
+        if referencia is None:
+            continue
+        for metrica, limite in (
+            ("p50_us", referencia["p50_us"] * (1 + tolerancia)),
+            ("p99_us", referencia["p99_us"] * (1 + tolerancia_p99)),
+        ):
+            if medido[metrica] > limite:
+                regressoes.append(
+                    f"{nome}: {metrica} {medido[metrica]:.1f} > {limite:.1f} "
+                    f"(baseline {referencia[metrica]:.1f})"
+                )
+        minimo = referencia["vazao_por_s"] / (1 + tolerancia)
+        if medido["vazao_por_s"] < minimo:
+            regressoes.append(
+                f"{nome}: vazao_por_s {medido['vazao_por_s']:.1f} < {minimo:.1f} "
+                f"(baseline {referencia['vazao_por_s']:.1f})"
+            )
+    return regressoes
+
+
+def imprimir(resultado: Dict, baseline: Optional[Dict] = None):
+    """Tabela com os resultados e, se houver baseline, a variação do p50"""
+    print(f"{'cenário':<40} {'p50 (µs)':>10} {'p99 (µs)':>10} {'cotações/s':>12} {'Δ p50':>8}")
+    for nome, medido in resultado["cenarios"].items():
+        variacao = ""
+        referencia = (baseline or {}).get("cenarios", {}).get(nome)
+        if referencia:
+            variacao = f"{(medido['p50_us'] / referencia['p50_us'] - 1) * 100:+.0f}%"
+        print(
+            f"{nome:<40} {medido['p50_us']:>10.1f} {medido['p99_us']:>10.1f} "
+            f"{medido['vazao_por_s']:>12.1f} {variacao:>8}"
+        )
+
+
+def main(argumentos: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do caminho de cotação")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PADRAO, help="Arquivo JSON do baseline")
+    parser.add_argument("--salvar", action="store_true", help="Grava o resultado como baseline")
+    parser.add_argument("--comparar", action="store_true", help="Falha se houver regressão em relação ao baseline")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Regressão tolerada no p50 e na vazão")
+    parser.add_argument("--tolerancia-p99", type=float, default=TOLERANCIA_P99, help="Regressão tolerada no p99")
+    parser.add_argument("--iteracoes", type=int, default=ITERACOES)
+    parser.add_argument("--aquecimento", type=int, default=AQUECIMENTO)
+    parser.add_argument("--rodadas", type=int, default=RODADAS)
+    parser.add_argument("--filtro", help="Executa só os cenários que contêm este texto")
+    args = parser.parse_args(argumentos)
+    # Uma linha de log por requisição do cliente ASGI distorce as medições
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    resultado = asyncio.run(executar(args.iteracoes, args.aquecimento, args.filtro, args.rodadas))
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    imprimir(resultado, baseline)
+
+    if args.salvar:
+        args.baseline.write_text(json.dumps(resultado, indent=2, ensure_ascii=False) + "\n")
+        print(f"\nBaseline gravado em {args.baseline}")
+
+    if args.comparar:
+        if baseline is None:
+            print(f"\nBaseline não encontrado: {args.baseline}")
+            return 1
+        regressoes = comparar(resultado, baseline, args.tolerancia, args.tolerancia_p99)
+        if regressoes:
+            print(f"\n❌ {len(regressoes)} regressão(ões):")
+            for regressao in regressoes:
+                print(f"  - {regressao}")
+            return 1
+        print("\n✅ Sem regressões em relação ao baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
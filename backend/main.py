@@ -8,11 +8,13 @@ Arquitetura: Clean Architecture
 - Infrastructure: Serviços e Repositórios
 - Presentation: Controllers e Routers (FastAPI)
 """
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
 from src.presentation.routers import cotacao_router, pdf_router, lead_router
+from src.infrastructure.services.upload_pdf import limpar_uploads_orfaos
 
 # Configuração da aplicação
 app = FastAPI(
@@ -43,6 +45,50 @@ app.include_router(pdf_router.router, prefix="/api/v1")
 app.include_router(lead_router.router)  # Já tem prefix="/api/v1/leads" no router
 
 
+@app.on_event("startup")
+async def iniciar_atualizacao_precos():
+    """Agenda a recarga periódica das tabelas de preços, se configurada"""
+    intervalo = float(os.getenv("PRECOS_INTERVALO_ATUALIZACAO", "0"))
+    if intervalo > 0:
+        cotacao_router.cotacao_controller.servico_calculo.iniciar_atualizacao_periodica(intervalo)
+
+
+@app.on_event("shutdown")
+async def parar_atualizacao_precos():
+    """Cancela a recarga periódica das tabelas de preços"""
+    cotacao_router.cotacao_controller.servico_calculo.parar_atualizacao_periodica()
+
+
+@app.on_event("startup")
+async def iniciar_fila_jobs_pdf():
+    """Devolve à fila os jobs de PDF interrompidos e sobe os workers"""
+    pdf_router.fila_jobs.iniciar()
+
+
+@app.on_event("shutdown")
+async def encerrar_fila_jobs_pdf():
+    """Para os workers de jobs de PDF antes do pool (os em andamento voltam à fila)"""
+    await pdf_router.fila_jobs.encerrar()
+
+
+@app.on_event("startup")
+async def limpar_uploads_pdf_orfaos():
+    """Remove arquivos temporários de uploads de PDF deixados por uma execução anterior"""
+    limpar_uploads_orfaos()
+
+
+@app.on_event("startup")
+async def iniciar_pool_extracao_pdf():
+    """Sobe os processos de extração de texto de PDFs antes da primeira requisição"""
+    pdf_router.ai_service.pool_extracao.iniciar()
+
+
+@app.on_event("shutdown")
+async def encerrar_pool_extracao_pdf():
+    """Encerra os processos de extração de texto de PDFs"""
+    pdf_router.ai_service.pool_extracao.encerrar()
+
+
 # Rotas principais
 @app.get("/", tags=["Root"])
 async def root():
@@ -3,9 +3,18 @@ DTOs para Cotação
 Data Transfer Objects para entrada e saída de dados
 """
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from decimal import Decimal
 
+# Quantidade máxima de cotações aceitas em uma chamada de cálculo em lote
+MAX_COTACOES_LOTE = 1000
+# Horizonte máximo (em anos) da projeção de custos
+MAX_ANOS_PROJECAO = 30
+# Quantidade máxima de planos retornados pela busca no catálogo
+MAX_PLANOS_BUSCA = 50
+# Quantidade máxima de anos simulados na simulação de coparticipação
+MAX_SIMULACOES = 200_000
+
 
 class BeneficiarioInputDTO(BaseModel):
     """DTO para entrada de dados de beneficiário"""
@@ -61,8 +70,376 @@ class CotacaoOutputDTO(BaseModel):
     desconto_aplicado: Decimal = Decimal("0.00")
     valor_final: Decimal
     observacoes: Optional[List[str]] = []
+    versao_tabela: Optional[str] = Field(None, description="Versão da tabela de preços usada no cálculo")
     
     class Config:
         json_encoders = {
             Decimal: lambda v: float(v)
         }
+
+
+class CotacaoLoteInputDTO(BaseModel):
+    """
+    DTO para entrada de cálculo em lote.
+    Cada item tem o formato de CotacaoInputDTO e é validado individualmente,
+    para que um item inválido não derrube o lote inteiro.
+    """
+    cotacoes: List[Dict[str, Any]] = Field(
+        ...,
+        min_items=1,
+        max_items=MAX_COTACOES_LOTE,
+        description=f"Lista de cotações (máximo {MAX_COTACOES_LOTE})"
+    )
+
+
+class CotacaoLoteItemDTO(BaseModel):
+    """DTO para o resultado de um item do lote"""
+    indice: int
+    sucesso: bool
+    cotacao: Optional[CotacaoOutputDTO] = None
+    erro: Optional[str] = None
+
+
+class CotacaoLoteOutputDTO(BaseModel):
+    """DTO para saída de cálculo em lote"""
+    total: int
+    sucessos: int
+    falhas: int
+    resultados: List[CotacaoLoteItemDTO]
+
+
+class ComparacaoInputDTO(BaseModel):
+    """DTO para entrada da comparação entre operadoras e tipos de contratação"""
+    idades: List[int] = Field(..., min_items=1, description="Lista de idades dos beneficiários")
+    
+    @validator('idades')
+    def validar_idades(cls, v):
+        for idade in v:
+            if idade < 0 or idade > 120:
+                raise ValueError('Todas as idades devem estar entre 0 e 120 anos')
+        return v
+
+
+class ComparacaoItemDTO(BaseModel):
+    """DTO para uma célula da matriz operadora x tipo de contratação"""
+    operadora: str
+    tipo_contratacao: str
+    valor_total: Decimal
+    desconto_aplicado: Decimal = Decimal("0.00")
+    valor_final: Decimal
+
+
+class ComparacaoOutputDTO(BaseModel):
+    """DTO para saída da comparação, ordenada por valor_final"""
+    quantidade_beneficiarios: int
+    resultados: List[ComparacaoItemDTO]
+    observacoes: Optional[List[str]] = []
+    versao_tabela: Optional[str] = Field(None, description="Versão da tabela de preços usada no cálculo")
+
+
+class CensoInputDTO(BaseModel):
+    """DTO para os parâmetros da cotação de um censo (o CSV vem como arquivo)"""
+    tipo: str = Field(..., description="Tipo de contratação: PME ou EMPRESARIAL")
+    operadoras: Optional[List[str]] = Field(
+        None, description="Operadoras a cotar (padrão: todas as disponíveis)"
+    )
+    
+    @validator('tipo')
+    def validar_tipo(cls, v):
+        tipos_validos = ["PME", "EMPRESARIAL"]
+        if v.upper() not in tipos_validos:
+            raise ValueError(f'Tipo deve ser um de: {tipos_validos}')
+        return v.upper()
+    
+    @validator('operadoras')
+    def validar_operadoras(cls, v):
+        if v is None:
+            return v
+        operadoras = [op.strip().upper() for op in v if op.strip()]
+        if not operadoras:
+            raise ValueError('Informe pelo menos uma operadora')
+        return list(dict.fromkeys(operadoras))
+
+
+class CensoFaixaDTO(BaseModel):
+    """DTO para a quantidade de vidas (e o valor, por operadora) de uma faixa etária"""
+    faixa_etaria: str
+    quantidade: int
+    valor_total: Optional[Decimal] = None
+
+
+class CensoOperadoraDTO(BaseModel):
+    """DTO para a cotação agregada do censo em uma operadora"""
+    operadora: str
+    sucesso: bool
+    valor_total: Optional[Decimal] = None
+    desconto_aplicado: Optional[Decimal] = None
+    valor_final: Optional[Decimal] = None
+    faixas: List[CensoFaixaDTO] = []
+    erro: Optional[str] = None
+
+
+class CensoOutputDTO(BaseModel):
+    """DTO para saída da cotação de censo, ordenada por valor_final"""
+    tipo_contratacao: str
+    quantidade_vidas: int
+    vidas_por_vinculo: Dict[str, int]
+    faixas: List[CensoFaixaDTO]
+    resultados: List[CensoOperadoraDTO]
+    linhas_invalidas: int = 0
+    erros: List[str] = []
+    observacoes: Optional[List[str]] = []
+    versao_tabela: Optional[str] = Field(None, description="Versão da tabela de preços usada no cálculo")
+
+
+class ProjecaoInputDTO(BaseModel):
+    """DTO para entrada da projeção de custos com envelhecimento e reajustes anuais"""
+    idades: List[int] = Field(..., min_items=1, description="Idades atuais dos beneficiários")
+    tipo: str = Field(..., description="Tipo de contratação: ADESAO, PME ou EMPRESARIAL")
+    anos: int = Field(10, ge=1, le=MAX_ANOS_PROJECAO, description="Anos projetados além do atual")
+    operadoras: Optional[List[str]] = Field(
+        None, description="Operadoras a projetar (padrão: todas as disponíveis)"
+    )
+    reajustes: Dict[str, Decimal] = Field(
+        default_factory=dict, description="Reajuste anual por operadora (ex.: {\"AMIL\": 0.12})"
+    )
+    reajuste_padrao: Decimal = Field(
+        Decimal("0"), description="Reajuste anual das operadoras sem valor em reajustes"
+    )
+    
+    @validator('tipo')
+    def validar_tipo(cls, v):
+        tipos_validos = ["ADESAO", "PME", "EMPRESARIAL"]
+        if v.upper() not in tipos_validos:
+            raise ValueError(f'Tipo deve ser um de: {tipos_validos}')
+        return v.upper()
+    
+    @validator('idades')
+    def validar_idades(cls, v):
+        for idade in v:
+            if idade < 0 or idade > 120:
+                raise ValueError('Todas as idades devem estar entre 0 e 120 anos')
+        return v
+    
+    @validator('operadoras')
+    def validar_operadoras(cls, v):
+        if v is None:
+            return v
+        operadoras = [op.strip().upper() for op in v if op.strip()]
+        if not operadoras:
+            raise ValueError('Informe pelo menos uma operadora')
+        return list(dict.fromkeys(operadoras))
+    
+    @validator('reajustes')
+    def validar_reajustes(cls, v):
+        for taxa in v.values():
+            if taxa < 0 or taxa > 1:
+                raise ValueError('Reajustes devem estar entre 0 e 1 (0% a 100%)')
+        return {op.strip().upper(): taxa for op, taxa in v.items()}
+    
+    @validator('reajuste_padrao')
+    def validar_reajuste_padrao(cls, v):
+        if v < 0 or v > 1:
+            raise ValueError('Reajuste padrão deve estar entre 0 e 1 (0% a 100%)')
+        return v
+
+
+class ProjecaoAnoDTO(BaseModel):
+    """DTO para o custo projetado de um ano"""
+    ano: int
+    valor_total: Decimal
+    desconto_aplicado: Decimal = Decimal("0.00")
+    valor_final: Decimal
+
+
+class ProjecaoOperadoraDTO(BaseModel):
+    """DTO para a projeção de uma operadora"""
+    operadora: str
+    reajuste_anual: Decimal
+    anos: List[ProjecaoAnoDTO]
+
+
+class TransicaoFaixaDTO(BaseModel):
+    """DTO para a mudança de faixa etária de um beneficiário na projeção"""
+    ano: int
+    beneficiario: int = Field(..., description="Posição do beneficiário em idades")
+    idade: int
+    faixa_anterior: str
+    faixa_nova: str
+
+
+class ProjecaoOutputDTO(BaseModel):
+    """DTO para saída da projeção, ordenada pelo valor_final do último ano"""
+    tipo_contratacao: str
+    quantidade_beneficiarios: int
+    resultados: List[ProjecaoOperadoraDTO]
+    transicoes: List[TransicaoFaixaDTO]
+    anos_com_transicao: List[int]
+    versao_tabela: Optional[str] = Field(None, description="Versão da tabela de preços usada no cálculo")
+
+
+class BuscaPlanosInputDTO(BaseModel):
+    """DTO para a busca dos planos mais baratos do catálogo que atendem às restrições"""
+    idades: List[int] = Field(..., min_items=1, description="Lista de idades dos beneficiários")
+    operadoras: Optional[List[str]] = Field(None, description="Operadoras aceitas (padrão: todas)")
+    modalidade: Optional[str] = Field(None, description="PME, PF ou Adesao")
+    acomodacao: Optional[str] = Field(None, description="Apartamento, Enfermaria ou Ambulatorial")
+    coparticipacao: Optional[bool] = Field(None, description="Com (true) ou sem (false) coparticipação")
+    abrangencia: Optional[str] = Field(None, description="Abrangência do plano (ex.: RJ, Nacional)")
+    hospitais: List[str] = Field(default_factory=list, description="Hospitais que devem estar na rede")
+    limite: int = Field(5, ge=1, le=MAX_PLANOS_BUSCA, description="Quantidade de planos retornados")
+    
+    @validator('idades')
+    def validar_idades(cls, v):
+        for idade in v:
+            if idade < 0 or idade > 120:
+                raise ValueError('Todas as idades devem estar entre 0 e 120 anos')
+        return v
+
+
+class PlanoEncontradoDTO(BaseModel):
+    """DTO para um plano do catálogo precificado para a família"""
+    plano_id: str
+    operadora: str
+    plano: str
+    modalidade: str
+    acomodacao: str
+    coparticipacao: bool
+    abrangencia: str
+    rede_hospitalar: List[str]
+    valor_total: Decimal
+    desconto_aplicado: Decimal = Decimal("0.00")
+    valor_final: Decimal
+
+
+class BuscaPlanosOutputDTO(BaseModel):
+    """DTO para saída da busca, ordenada por valor_final"""
+    quantidade_beneficiarios: int
+    planos_elegiveis: int = Field(..., description="Planos que atendem às restrições")
+    planos_sem_preco: int = Field(0, description="Elegíveis sem preço para alguma idade da família")
+    resultados: List[PlanoEncontradoDTO]
+    versao_tabela: Optional[str] = Field(None, description="Versão da tabela de preços usada no cálculo")
+
+
+class FaixaEtariaDTO(BaseModel):
+    """DTO de uma faixa etária (vai de `inicio` até o início da próxima)"""
+    inicio: int
+    rotulo: str
+
+
+class GradeDescontosDTO(BaseModel):
+    """
+    Regras de desconto compiladas para a grade.
+    
+    regra_por_vidas é achatado em tipos x operadoras x (limite_vidas + 1):
+    a regra aplicável a n vidas fica na posição min(n, limite_vidas)
+    (-1 = sem desconto).
+    """
+    limite_vidas: int
+    regra_por_vidas: List[int]
+    pontos_base: List[int] = Field(..., description="Desconto de cada regra em pontos-base (1/10000)")
+    observacoes: List[Optional[str]] = Field(..., description="Observação de cada regra")
+
+
+class GradePrecosDTO(BaseModel):
+    """
+    DTO da grade completa de preços para cotação no cliente, em colunas.
+    
+    precos_centavos é achatado em tipos x operadoras x idades (0 até
+    idade_maxima), na ordem de `tipos` e `operadoras`. Valor de uma
+    cotação = soma dos preços das idades - desconto arredondado
+    (centavos * pontos_base + 5000) // 10000.
+    """
+    versao_tabela: str
+    tipos: List[str]
+    operadoras: List[str]
+    idade_maxima: int
+    precos_centavos: List[int]
+    faixas_etarias: List[FaixaEtariaDTO]
+    descontos: GradeDescontosDTO
+    observacoes: List[Dict[str, Any]] = Field(
+        ..., description="Regras de observação (campo, operador, valor, texto e restrições)"
+    )
+
+
+class PerfilUtilizacaoDTO(BaseModel):
+    """DTO da utilização esperada por pessoa por ano, a partir de uma idade"""
+    idade_inicio: int = Field(..., ge=0, le=120, description="Idade inicial do perfil")
+    consulta: float = Field(..., ge=0, description="Consultas por pessoa por ano")
+    exame: float = Field(..., ge=0, description="Exames por pessoa por ano")
+    internacao: float = Field(..., ge=0, description="Internações por pessoa por ano")
+
+
+class CustosEventoDTO(BaseModel):
+    """DTO do custo médio de cada evento (base da coparticipação percentual)"""
+    consulta: Decimal = Field(..., ge=0)
+    exame: Decimal = Field(..., ge=0)
+    internacao: Decimal = Field(..., ge=0)
+
+
+class SimulacaoCoparticipacaoInputDTO(BaseModel):
+    """DTO para entrada da simulação de custo anual com coparticipação"""
+    idades: List[int] = Field(..., min_items=1, description="Lista de idades dos beneficiários")
+    planos: List[str] = Field(
+        ..., min_items=1, max_items=MAX_PLANOS_BUSCA, description="Ids dos planos candidatos no catálogo"
+    )
+    perfis_utilizacao: Optional[List[PerfilUtilizacaoDTO]] = Field(
+        None, description="Utilização por faixa etária (padrão: referência de mercado)"
+    )
+    custos_evento: Optional[CustosEventoDTO] = Field(None, description="Custo médio de cada evento")
+    coparticipacao_pct_padrao: float = Field(
+        30.0, ge=0, le=100, description="% dos planos com coparticipação sem percentual cadastrado"
+    )
+    teto_por_evento: Optional[Decimal] = Field(None, ge=0, description="Limite da coparticipação por evento")
+    dispersao: float = Field(1.5, gt=0, description="Forma da Gamma da utilização individual")
+    simulacoes: int = Field(100_000, ge=1000, le=MAX_SIMULACOES, description="Anos simulados")
+    semente: Optional[int] = Field(None, ge=0, description="Semente para resultado reprodutível")
+    
+    @validator('idades')
+    def validar_idades(cls, v):
+        for idade in v:
+            if idade < 0 or idade > 120:
+                raise ValueError('Todas as idades devem estar entre 0 e 120 anos')
+        return v
+    
+    @validator('planos')
+    def validar_planos(cls, v):
+        planos = [plano.strip() for plano in v if plano.strip()]
+        if not planos:
+            raise ValueError('Informe pelo menos um plano')
+        return list(dict.fromkeys(planos))
+    
+    @validator('perfis_utilizacao')
+    def validar_perfis(cls, v):
+        if v is None:
+            return v
+        inicios = [perfil.idade_inicio for perfil in v]
+        if 0 not in inicios:
+            raise ValueError('Os perfis de utilização devem começar na idade 0')
+        if len(set(inicios)) != len(inicios):
+            raise ValueError('Idades iniciais dos perfis de utilização repetidas')
+        return v
+
+
+class SimulacaoPlanoDTO(BaseModel):
+    """DTO do custo anual simulado de um plano"""
+    plano_id: str
+    operadora: str
+    plano: str
+    coparticipacao: bool
+    coparticipacao_pct: float = Field(..., description="% do custo de cada evento pago pelo beneficiário")
+    mensalidade: Decimal = Field(..., description="Mensalidade da família, com desconto")
+    custo_mensalidades_anual: Decimal
+    coparticipacao_media_anual: Decimal
+    custo_total_medio: Decimal
+    percentis: Dict[str, Decimal] = Field(..., description="Percentis do custo total anual (p10, p50, ...)")
+    probabilidade_menor_custo: float = Field(..., description="Fração dos anos simulados em que é o mais barato")
+
+
+class SimulacaoCoparticipacaoOutputDTO(BaseModel):
+    """DTO para saída da simulação, ordenada por custo_total_medio"""
+    quantidade_beneficiarios: int
+    simulacoes: int
+    eventos_medios: Dict[str, float] = Field(..., description="Eventos por ano da família, em média")
+    resultados: List[SimulacaoPlanoDTO]
+    versao_tabela: Optional[str] = Field(None, description="Versão da tabela de preços usada no cálculo")
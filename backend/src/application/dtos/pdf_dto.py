@@ -1,6 +1,7 @@
 """
 DTOs para extração de dados de PDF
 """
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -13,9 +14,12 @@ class PDFExtraidoDTO(BaseModel):
     tipo_plano: Optional[str] = None
     nome_beneficiarios: List[str] = []
     observacoes: Optional[str] = None
-    confianca: str = "alta"
+    confianca: str = "ia"  # caminho da extração: "layout" (regras da operadora) ou "ia"
+    pontuacao_layout: Optional[float] = None  # confiança (0 a 1) do extrator de layout
     texto_extraido_preview: Optional[str] = None
     total_caracteres: int = 0
+    tokens_economizados: int = 0  # tokens do documento deixados fora do prompt da IA
+    chamadas_ia: int = 0  # 0 no caminho por layout; mais de 1 em documentos processados em partes
     
     class Config:
         json_schema_extra = {
@@ -26,8 +30,34 @@ class PDFExtraidoDTO(BaseModel):
                 "tipo_plano": "ADESAO",
                 "nome_beneficiarios": ["João Silva", "Maria Silva", "Pedro Silva"],
                 "observacoes": "Plano com cobertura nacional",
-                "confianca": "alta",
+                "confianca": "layout",
+                "pontuacao_layout": 1.0,
                 "texto_extraido_preview": "PROPOSTA DE ADESÃO...",
-                "total_caracteres": 2500
+                "total_caracteres": 2500,
+                "tokens_economizados": 0,
+                "chamadas_ia": 0
             }
         }
+
+
+class PDFLoteItemDTO(BaseModel):
+    """DTO para o resultado de um arquivo do lote (uma linha NDJSON)"""
+    indice: int
+    arquivo: str
+    sucesso: bool
+    status: int
+    dados: Optional[PDFExtraidoDTO] = None
+    erro: Optional[str] = None
+
+
+class PDFJobDTO(BaseModel):
+    """DTO para o estado de um job de extração assíncrona"""
+    id: str
+    arquivo: str
+    status: str
+    etapa: Optional[str] = None
+    tentativas: int = 0
+    criado_em: datetime
+    atualizado_em: datetime
+    dados: Optional[PDFExtraidoDTO] = None
+    erro: Optional[str] = None
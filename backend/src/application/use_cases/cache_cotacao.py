@@ -0,0 +1,135 @@
+"""
+Cache de Cotações
+Memoização de CalcularCotacaoUseCase.execute por formato canônico da família
+"""
+from collections import Counter
+from decimal import Decimal
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from ..dtos.cotacao_dto import CotacaoInputDTO, CotacaoOutputDTO, ValorBeneficiarioDTO
+from ...infrastructure.services.cache_lru import CacheLRU
+from ...infrastructure.services.snapshot_precos import IDADE_MAXIMA, classes_por_idade
+
+
+class CacheCotacao:
+    """
+    Cache na frente de CalcularCotacaoUseCase.execute.
+
+    O resultado de uma cotação depende só do multiconjunto de classes de
+    idade da família: idades com o mesmo preço em todas as tabelas, a
+    mesma faixa etária e o mesmo lado de cada limite de idade usado nas
+    regras de observação. A chave é
+    (histograma de classes, tipo, operadora, plano, versão da tabela), de
+    modo que [30, 5] e [5, 31] compartilham a mesma entrada. Na leitura, os
+    valores individuais são remontados na ordem das idades informadas.
+
+    Uma nova versão da tabela de preços invalida o cache inteiro.
+    """
+
+    def __init__(self, use_case, servico_calculo, cache: Optional[CacheLRU] = None):
+        """
+        Args:
+            use_case: CalcularCotacaoUseCase a ser memoizado
+            servico_calculo: Serviço de cálculo (fonte do snapshot de preços)
+            cache: Armazenamento LRU/TTL
+        """
+        self.use_case = use_case
+        self.servico_calculo = servico_calculo
+        self.cache = cache or CacheLRU()
+        self._versao: Optional[str] = None
+        self._classes: Optional[List[int]] = None
+        self._rotulos: Optional[List[str]] = None
+
+    def _classes_vigentes(self) -> Tuple[str, List[int]]:
+        """Classes de idade da versão vigente; limpa o cache se a versão mudou"""
+        snapshot = self.servico_calculo.snapshot
+        if snapshot.versao != self._versao:
+            idades = np.arange(IDADE_MAXIMA + 1)
+            regras = snapshot.regras
+            assinatura = np.vstack(
+                [snapshot.classe_preco_por_idade, regras.indice_faixa_por_idade]
+                + [idades >= limite for limite in regras.limites_idade]
+            )
+            self.cache.limpar()
+            # Lista Python: famílias são pequenas e o acesso por índice é mais barato
+            self._classes = classes_por_idade(assinatura).tolist()
+            self._rotulos = regras.rotulo_faixa_por_idade
+            self._versao = snapshot.versao
+        return self._versao, self._classes
+
+    def chave(self, input_dto: CotacaoInputDTO, versao: str, classes: List[int]) -> Hashable:
+        """Chave canônica da cotação"""
+        forma = tuple(sorted(Counter(classes[idade] for idade in input_dto.idades).items()))
+        return (forma, input_dto.tipo, input_dto.operadora, input_dto.plano, versao)
+
+    async def execute(self, input_dto: CotacaoInputDTO) -> CotacaoOutputDTO:
+        """
+        Executa a cotação, consultando o cache antes do caso de uso
+
+        Args:
+            input_dto: Dados de entrada da cotação
+
+        Returns:
+            CotacaoOutputDTO: Resultado do cálculo
+        """
+        versao, classes = self._classes_vigentes()
+        chave = self.chave(input_dto, versao, classes)
+
+        modelo = self.cache.obter(chave)
+        if modelo is not None:
+            return self._montar_saida(modelo, input_dto, classes)
+
+        resultado = await self.use_case.execute(input_dto)
+
+        # Só armazena se o cálculo usou a mesma versão da chave
+        if resultado.versao_tabela == versao:
+            valor_por_classe = {
+                classes[v.idade]: v.valor for v in resultado.valores_individuais
+            }
+            por_idade = {v.idade: v for v in resultado.valores_individuais}
+            self.cache.armazenar(chave, (resultado, valor_por_classe, por_idade))
+
+        return resultado
+
+    def _montar_saida(
+        self,
+        modelo: Tuple[CotacaoOutputDTO, Dict[int, Decimal], Dict[int, ValorBeneficiarioDTO]],
+        input_dto: CotacaoInputDTO,
+        classes: List[int]
+    ) -> CotacaoOutputDTO:
+        """
+        Remonta a saída em cache para as idades da requisição.
+        Os ValorBeneficiarioDTO são reaproveitados por idade entre acertos.
+        """
+        resultado, valor_por_classe, por_idade = modelo
+
+        valores_individuais = []
+        for idade in input_dto.idades:
+            valor = por_idade.get(idade)
+            if valor is None:
+                valor = ValorBeneficiarioDTO(
+                    idade=idade,
+                    valor=valor_por_classe[classes[idade]],
+                    faixa_etaria=self._rotulos[idade]
+                )
+                por_idade[idade] = valor
+            valores_individuais.append(valor)
+
+        return CotacaoOutputDTO(
+            operadora=resultado.operadora,
+            tipo_contratacao=resultado.tipo_contratacao,
+            plano=resultado.plano,
+            quantidade_beneficiarios=resultado.quantidade_beneficiarios,
+            valores_individuais=valores_individuais,
+            valor_total=resultado.valor_total,
+            desconto_aplicado=resultado.desconto_aplicado,
+            valor_final=resultado.valor_final,
+            observacoes=list(resultado.observacoes or []),
+            versao_tabela=resultado.versao_tabela
+        )
+
+    def estatisticas(self) -> Dict:
+        """Contadores do cache e versão da tabela em uso"""
+        return {**self.cache.estatisticas(), "versao_tabela": self._versao}
@@ -2,16 +2,61 @@
 Use Case: Calcular Cotação
 Caso de uso responsável por calcular o valor de uma cotação de plano de saúde
 """
-from typing import List
-from decimal import Decimal
-from ..dtos.cotacao_dto import CotacaoInputDTO, CotacaoOutputDTO, ValorBeneficiarioDTO
-from ...domain.entities.cotacao import Cotacao, Beneficiario
+import asyncio
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from ..dtos.cotacao_dto import (
+    CotacaoInputDTO,
+    CotacaoOutputDTO,
+    ValorBeneficiarioDTO,
+    ComparacaoInputDTO,
+    ComparacaoItemDTO,
+    ComparacaoOutputDTO,
+    CensoInputDTO,
+    CensoFaixaDTO,
+    CensoOperadoraDTO,
+    CensoOutputDTO,
+    ProjecaoInputDTO,
+    ProjecaoAnoDTO,
+    ProjecaoOperadoraDTO,
+    ProjecaoOutputDTO,
+    TransicaoFaixaDTO,
+    BuscaPlanosInputDTO,
+    BuscaPlanosOutputDTO,
+    PlanoEncontradoDTO,
+    FaixaEtariaDTO,
+    GradeDescontosDTO,
+    GradePrecosDTO,
+    SimulacaoCoparticipacaoInputDTO,
+    SimulacaoCoparticipacaoOutputDTO,
+    SimulacaoPlanoDTO,
+)
+from ...domain.entities.cotacao import Cotacao, GrupoBeneficiarios, VINCULOS
+from ...infrastructure.services.leitor_censo import BlocoCenso
+from ...infrastructure.services.regras_cotacao import RegrasCotacao
+from ...infrastructure.services.simulador_coparticipacao import PERCENTIS, SimuladorCoparticipacao
+from ...domain.value_objects.centavos import (
+    aplicar_taxa,
+    aplicar_taxa_array,
+    para_centavos,
+    para_decimal,
+    para_pontos_base,
+    reajustar,
+)
 
 
 class CalcularCotacaoUseCase:
     """
     Caso de uso para calcular cotação de plano de saúde.
     Aplica regras de negócio e utiliza serviços de cálculo.
+    
+    Valores trafegam em centavos inteiros até a montagem dos DTOs
+    (regras de arredondamento em domain.value_objects.centavos).
+    
+    Descontos, observações e faixas etárias vêm das RegrasCotacao
+    compiladas do snapshot usado no cálculo (cada resultado do serviço traz
+    as regras da mesma versão dos preços).
     """
     
     def __init__(self, servico_calculo):
@@ -31,15 +76,9 @@ class CalcularCotacaoUseCase:
         Returns:
             CotacaoOutputDTO: Resultado do cálculo
         """
-        # Converter idades para beneficiários
-        beneficiarios = [
-            Beneficiario(idade=idade, tipo_vinculo="TITULAR" if i == 0 else "DEPENDENTE")
-            for i, idade in enumerate(input_dto.idades)
-        ]
-        
-        # Criar entidade de domínio
-        cotacao = Cotacao(
-            beneficiarios=beneficiarios,
+        # Criar entidade de domínio (idades em array, sem um objeto por vida)
+        cotacao = Cotacao.de_idades(
+            input_dto.idades,
             tipo_contratacao=input_dto.tipo,
             operadora=input_dto.operadora,
             plano=input_dto.plano
@@ -49,21 +88,27 @@ class CalcularCotacaoUseCase:
         resultado = await self.servico_calculo.calcular(cotacao)
         
         # Aplicar regras de desconto
-        desconto = self._calcular_desconto(cotacao, resultado['valor_total'])
-        valor_final = resultado['valor_total'] - desconto
+        regras = resultado['regras']
+        valor_total = resultado['valor_total_centavos']
+        regra_desconto, desconto = self._calcular_desconto(regras, cotacao, valor_total)
         
         # Gerar observações
-        observacoes = self._gerar_observacoes(cotacao)
-        
-        # Montar DTO de saída
-        valores_individuais = [
-            ValorBeneficiarioDTO(
-                idade=ben.idade,
-                valor=val,
-                faixa_etaria=self._definir_faixa_etaria(ben.idade)
-            )
-            for ben, val in zip(beneficiarios, resultado['valores_individuais'])
-        ]
+        observacoes = self._gerar_observacoes(regras, cotacao, regra_desconto)
+        
+        # Montar DTO de saída: um ValorBeneficiarioDTO por idade distinta,
+        # reaproveitado entre as vidas da mesma idade
+        rotulos = regras.rotulo_faixa_por_idade
+        por_idade = {}
+        valores_individuais = []
+        for idade, val in zip(input_dto.idades, resultado['valores_individuais_centavos']):
+            valor = por_idade.get(idade)
+            if valor is None:
+                valor = por_idade[idade] = ValorBeneficiarioDTO(
+                    idade=idade,
+                    valor=para_decimal(val),
+                    faixa_etaria=rotulos[idade]
+                )
+            valores_individuais.append(valor)
         
         return CotacaoOutputDTO(
             operadora=cotacao.operadora,
@@ -71,52 +116,539 @@ class CalcularCotacaoUseCase:
             plano=cotacao.plano or "PLANO_PADRAO",
             quantidade_beneficiarios=cotacao.quantidade_beneficiarios,
             valores_individuais=valores_individuais,
-            valor_total=resultado['valor_total'],
-            desconto_aplicado=desconto,
-            valor_final=valor_final,
-            observacoes=observacoes
+            valor_total=para_decimal(valor_total),
+            desconto_aplicado=para_decimal(desconto),
+            valor_final=para_decimal(valor_total - desconto),
+            observacoes=observacoes,
+            versao_tabela=resultado.get('versao_tabela')
         )
     
-    def _calcular_desconto(self, cotacao: Cotacao, valor_total: Decimal) -> Decimal:
-        """Calcula desconto baseado em regras de negócio"""
-        desconto = Decimal("0.00")
+    async def execute_lote(
+        self,
+        inputs: List[CotacaoInputDTO]
+    ) -> List[Union[CotacaoOutputDTO, ValueError]]:
+        """
+        Executa o cálculo de várias cotações em uma única passada vetorizada.
+        
+        Preços, descontos e observações são calculados como operações de array
+        sobre todos os beneficiários do lote; só a montagem dos DTOs é por item.
+        
+        Args:
+            inputs: Dados de entrada já validados, um por cotação
+            
+        Returns:
+            Resultados na mesma ordem da entrada; cotações que não puderam
+            ser calculadas aparecem como ValueError na sua posição
+        """
+        if not inputs:
+            return []
+        
+        quantidades = np.fromiter((len(i.idades) for i in inputs), dtype=np.intp, count=len(inputs))
+        inicios = np.concatenate(([0], np.cumsum(quantidades)[:-1]))
+        idades = np.fromiter(
+            (idade for i in inputs for idade in i.idades),
+            dtype=np.intp,
+            count=int(quantidades.sum())
+        )
+        familia = np.repeat(np.arange(len(inputs)), quantidades)
+        
+        resultado = self.servico_calculo.calcular_lote(
+            idades=idades,
+            familia=familia,
+            tipos=[i.tipo for i in inputs],
+            operadoras=[i.operadora for i in inputs],
+            planos=[i.plano for i in inputs]
+        )
+        
+        # Regras de negócio vetorizadas: um gather na tabela de descontos e
+        # uma avaliação de cada predicado de observação para o lote inteiro
+        regras = resultado['regras']
+        posicoes_tipo = np.array([regras.posicao_tipo(i.tipo) for i in inputs], dtype=np.intp)
+        posicoes_operadora = np.array(
+            [regras.posicao_operadora(i.operadora) for i in inputs], dtype=np.intp
+        )
+        regra_desconto = regras.regras_desconto(posicoes_tipo, posicoes_operadora, quantidades)
+        totais_centavos = resultado['valores_totais_centavos']
+        descontos_centavos = aplicar_taxa_array(totais_centavos, regras.pontos_desconto[regra_desconto])
+        observacoes = regras.observacoes_lote(
+            posicoes_tipo,
+            posicoes_operadora,
+            quantidades,
+            np.minimum.reduceat(idades, inicios),
+            np.maximum.reduceat(idades, inicios),
+            regra_desconto
+        )
+        rotulos = regras.rotulo_faixa_por_idade
         
-        # Desconto progressivo por quantidade de beneficiários
-        if cotacao.quantidade_beneficiarios >= 5:
-            desconto = valor_total * Decimal("0.10")  # 10% de desconto
-        elif cotacao.quantidade_beneficiarios >= 3:
-            desconto = valor_total * Decimal("0.05")  # 5% de desconto
+        valores = resultado['valores_individuais_centavos'].tolist()
+        totais = totais_centavos.tolist()
+        descontos = descontos_centavos.tolist()
+        lista_idades = idades.tolist()
         
-        return desconto
+        saidas = []
+        for k, input_dto in enumerate(inputs):
+            if k in resultado['erros']:
+                saidas.append(ValueError(resultado['erros'][k]))
+                continue
+            
+            inicio, fim = int(inicios[k]), int(inicios[k] + quantidades[k])
+            
+            saidas.append(CotacaoOutputDTO(
+                operadora=input_dto.operadora,
+                tipo_contratacao=input_dto.tipo,
+                plano=input_dto.plano or "PLANO_PADRAO",
+                quantidade_beneficiarios=fim - inicio,
+                valores_individuais=[
+                    ValorBeneficiarioDTO(
+                        idade=lista_idades[p],
+                        valor=para_decimal(valores[p]),
+                        faixa_etaria=rotulos[lista_idades[p]]
+                    )
+                    for p in range(inicio, fim)
+                ],
+                valor_total=para_decimal(totais[k]),
+                desconto_aplicado=para_decimal(descontos[k]),
+                valor_final=para_decimal(totais[k] - descontos[k]),
+                observacoes=observacoes[k],
+                versao_tabela=resultado.get('versao_tabela')
+            ))
+        
+        return saidas
     
-    def _gerar_observacoes(self, cotacao: Cotacao) -> List[str]:
-        """Gera observações sobre a cotação"""
-        observacoes = []
+    async def comparar(self, input_dto: ComparacaoInputDTO) -> ComparacaoOutputDTO:
+        """
+        Calcula a matriz operadora x tipo de contratação para uma família
         
-        if cotacao.possui_idoso:
-            observacoes.append("Cotação inclui beneficiário(s) idoso(s) - pode requerer carência")
+        Os totais de todas as combinações saem de uma única passada no
+        serviço de cálculo; os descontos seguem as mesmas regras de execute,
+        consultadas para a matriz inteira de uma vez. As observações são as
+        gerais (sem operadora/tipo específicos).
         
-        if cotacao.possui_crianca:
-            observacoes.append("Cotação inclui criança(s) - verificar cobertura pediátrica")
+        Args:
+            input_dto: Idades da família
+            
+        Returns:
+            ComparacaoOutputDTO: Combinações ordenadas por valor_final
+        """
+        beneficiarios = GrupoBeneficiarios(input_dto.idades)
+        
+        matriz = self.servico_calculo.calcular_matriz(input_dto.idades)
+        regras = matriz['regras']
+        totais_centavos = matriz['valores_totais_centavos']
+        regra_desconto = regras.regras_desconto(
+            np.array([regras.posicao_tipo(t) for t in matriz['tipos']], dtype=np.intp)[:, None],
+            np.array([regras.posicao_operadora(op) for op in matriz['operadoras']], dtype=np.intp)[None, :],
+            len(beneficiarios)
+        )
+        totais = totais_centavos.tolist()
+        descontos = aplicar_taxa_array(totais_centavos, regras.pontos_desconto[regra_desconto]).tolist()
+        
+        resultados = []
+        for i, tipo in enumerate(matriz['tipos']):
+            for j, operadora in enumerate(matriz['operadoras']):
+                valor_total, desconto = totais[i][j], descontos[i][j]
+                resultados.append(ComparacaoItemDTO(
+                    operadora=operadora,
+                    tipo_contratacao=tipo,
+                    valor_total=para_decimal(valor_total),
+                    desconto_aplicado=para_decimal(desconto),
+                    valor_final=para_decimal(valor_total - desconto)
+                ))
+        
+        resultados.sort(key=lambda r: r.valor_final)
+        
+        return ComparacaoOutputDTO(
+            quantidade_beneficiarios=len(beneficiarios),
+            resultados=resultados,
+            observacoes=self._observacoes_gerais(regras, beneficiarios.contagem_por_idade),
+            versao_tabela=matriz.get('versao_tabela')
+        )
+    
+    async def execute_censo(
+        self,
+        input_dto: CensoInputDTO,
+        blocos: Iterator[BlocoCenso]
+    ) -> CensoOutputDTO:
+        """
+        Cota um censo de empresa (centenas a dezenas de milhares de vidas)
+        
+        Os blocos do censo são lidos um a um (fora do event loop) e reduzidos
+        a histogramas de idade por plano; nenhum objeto é criado por vida e a
+        memória não cresce com o tamanho do censo. O preço de cada operadora
+        sai dos histogramas em uma única passada no serviço de cálculo.
+        
+        Args:
+            input_dto: Tipo de contratação e operadoras a cotar
+            blocos: Blocos do censo (ver leitor_censo.ler_censo_em_blocos)
+            
+        Returns:
+            CensoOutputDTO: Totais por operadora e por faixa etária,
+            ordenados por valor_final
+        """
+        contagens: Dict[Optional[str], np.ndarray] = {}
+        vidas_por_vinculo = np.zeros(len(VINCULOS), dtype=np.int64)
+        linhas_invalidas = 0
+        erros: List[str] = []
+        
+        while True:
+            bloco = await asyncio.to_thread(next, blocos, None)
+            if bloco is None:
+                break
+            
+            linhas_invalidas += bloco.linhas_invalidas
+            erros.extend(bloco.erros)
+            vidas_por_vinculo += np.bincount(bloco.vinculos, minlength=len(VINCULOS))
+            
+            if bloco.planos is None:
+                codigos, planos = np.full(len(bloco.idades), -1), []
+            else:
+                codigos, planos = pd.factorize(bloco.planos)
+            # Última linha (código -1) acumula as vidas sem plano informado
+            por_plano = np.zeros((len(planos) + 1, 121), dtype=np.int64)
+            np.add.at(por_plano, (codigos, bloco.idades), 1)
+            for plano, contagem in zip(list(planos) + [None], por_plano):
+                if contagem.any():
+                    contagens[plano] = contagens.get(plano, 0) + contagem
+        
+        contagem_por_idade = sum(contagens.values(), np.zeros(121, dtype=np.int64))
+        quantidade_vidas = int(contagem_por_idade.sum())
+        if quantidade_vidas == 0:
+            raise ValueError("Censo não possui nenhuma vida válida")
+        
+        operadoras = input_dto.operadoras or self.servico_calculo.obter_operadoras_disponiveis()
+        resultado = self.servico_calculo.calcular_censo(contagens, input_dto.tipo, operadoras)
+        
+        regras = resultado['regras']
+        valores_por_faixa = np.add.reduceat(
+            resultado['valores_por_idade_centavos'], regras.inicios_faixa, axis=1
+        )
+        totais = valores_por_faixa.sum(axis=1)
+        regra_desconto = regras.regras_desconto(
+            regras.posicao_tipo(input_dto.tipo),
+            np.array([regras.posicao_operadora(op) for op in operadoras], dtype=np.intp),
+            quantidade_vidas
+        )
+        descontos = aplicar_taxa_array(totais, regras.pontos_desconto[regra_desconto])
+        vidas_por_faixa = np.add.reduceat(contagem_por_idade, regras.inicios_faixa).tolist()
+        
+        resultados = []
+        for j, operadora in enumerate(operadoras):
+            if j in resultado['erros']:
+                resultados.append(CensoOperadoraDTO(
+                    operadora=operadora, sucesso=False, erro=resultado['erros'][j]
+                ))
+                continue
+            total, desconto = int(totais[j]), int(descontos[j])
+            resultados.append(CensoOperadoraDTO(
+                operadora=operadora,
+                sucesso=True,
+                valor_total=para_decimal(total),
+                desconto_aplicado=para_decimal(desconto),
+                valor_final=para_decimal(total - desconto),
+                faixas=[
+                    CensoFaixaDTO(faixa_etaria=rotulo, quantidade=quantidade, valor_total=para_decimal(valor))
+                    for rotulo, quantidade, valor in zip(
+                        regras.rotulos_faixa, vidas_por_faixa, valores_por_faixa[j].tolist()
+                    )
+                ]
+            ))
+        
+        # Operadoras com erro vão para o fim
+        resultados.sort(key=lambda r: (not r.sucesso, r.valor_final or 0))
+        
+        return CensoOutputDTO(
+            tipo_contratacao=input_dto.tipo,
+            quantidade_vidas=quantidade_vidas,
+            vidas_por_vinculo=dict(zip(VINCULOS, vidas_por_vinculo.tolist())),
+            faixas=[
+                CensoFaixaDTO(faixa_etaria=rotulo, quantidade=quantidade)
+                for rotulo, quantidade in zip(regras.rotulos_faixa, vidas_por_faixa)
+            ],
+            resultados=resultados,
+            linhas_invalidas=linhas_invalidas,
+            erros=erros,
+            observacoes=self._observacoes_gerais(regras, contagem_por_idade, input_dto.tipo),
+            versao_tabela=resultado.get('versao_tabela')
+        )
+    
+    async def projetar(self, input_dto: ProjecaoInputDTO) -> ProjecaoOutputDTO:
+        """
+        Projeta o custo da família ano a ano por operadora
         
-        if cotacao.quantidade_beneficiarios >= 5:
-            observacoes.append("Desconto de 10% aplicado por família numerosa")
-        elif cotacao.quantidade_beneficiarios >= 3:
-            observacoes.append("Desconto de 5% aplicado")
+        A matriz ano x operadora (envelhecimento) sai de uma única passada
+        no serviço de cálculo; o reajuste anual de cada operadora é composto
+        sobre o total de cada ano. O desconto por quantidade segue as
+        mesmas regras de execute (a família não muda de tamanho).
         
-        return observacoes
+        Args:
+            input_dto: Idades, tipo, horizonte e reajustes por operadora
+            
+        Returns:
+            ProjecaoOutputDTO: Custos por ano e por operadora, ordenados
+            pelo valor_final do último ano, e as mudanças de faixa etária
+        """
+        operadoras = input_dto.operadoras or self.servico_calculo.obter_operadoras_disponiveis()
+        projecao = self.servico_calculo.calcular_projecao(
+            input_dto.idades, input_dto.tipo, operadoras, input_dto.anos
+        )
+        totais = projecao['valores_totais_centavos'].tolist()
+        
+        regras = projecao['regras']
+        regra_desconto = regras.regras_desconto(
+            regras.posicao_tipo(input_dto.tipo),
+            np.array([regras.posicao_operadora(op) for op in operadoras], dtype=np.intp),
+            len(input_dto.idades)
+        )
+        pontos_por_operadora = regras.pontos_desconto[regra_desconto].tolist()
+        
+        resultados = []
+        for operadora, totais_operadora, pontos_desconto in zip(operadoras, totais, pontos_por_operadora):
+            taxa = input_dto.reajustes.get(operadora, input_dto.reajuste_padrao)
+            pontos_reajuste = para_pontos_base(taxa)
+            anos = []
+            for ano, total in enumerate(totais_operadora):
+                total = reajustar(total, pontos_reajuste, ano)
+                desconto = aplicar_taxa(total, pontos_desconto)
+                anos.append(ProjecaoAnoDTO(
+                    ano=ano,
+                    valor_total=para_decimal(total),
+                    desconto_aplicado=para_decimal(desconto),
+                    valor_final=para_decimal(total - desconto)
+                ))
+            resultados.append(ProjecaoOperadoraDTO(operadora=operadora, reajuste_anual=taxa, anos=anos))
+        
+        resultados.sort(key=lambda r: r.anos[-1].valor_final)
+        
+        # Mudanças de faixa: compara a faixa de cada beneficiário com a do ano anterior
+        faixas = regras.indice_faixa_por_idade[projecao['idades_por_ano']]
+        anos_mudanca, beneficiarios = np.nonzero(faixas[1:] != faixas[:-1])
+        transicoes = [
+            TransicaoFaixaDTO(
+                ano=ano + 1,
+                beneficiario=beneficiario,
+                idade=int(projecao['idades_por_ano'][ano + 1, beneficiario]),
+                faixa_anterior=regras.rotulos_faixa[faixas[ano, beneficiario]],
+                faixa_nova=regras.rotulos_faixa[faixas[ano + 1, beneficiario]]
+            )
+            for ano, beneficiario in zip(anos_mudanca.tolist(), beneficiarios.tolist())
+        ]
+        
+        return ProjecaoOutputDTO(
+            tipo_contratacao=input_dto.tipo,
+            quantidade_beneficiarios=len(input_dto.idades),
+            resultados=resultados,
+            transicoes=transicoes,
+            anos_com_transicao=sorted({t.ano for t in transicoes}),
+            versao_tabela=projecao.get('versao_tabela')
+        )
+    
+    async def buscar_planos(self, input_dto: BuscaPlanosInputDTO) -> BuscaPlanosOutputDTO:
+        """
+        Busca no catálogo os planos mais baratos para a família
+        
+        O desconto das regras de cotação é aplicado pelo serviço antes da
+        seleção dos mais baratos, já que pode variar por operadora e
+        modalidade do plano.
+        
+        Args:
+            input_dto: Idades e restrições (operadora, acomodação, rede...)
+            
+        Returns:
+            BuscaPlanosOutputDTO: Até `limite` planos, do mais barato ao mais caro
+        """
+        busca = self.servico_calculo.buscar_planos(
+            input_dto.idades,
+            input_dto.limite,
+            operadoras=input_dto.operadoras,
+            modalidade=input_dto.modalidade,
+            acomodacao=input_dto.acomodacao,
+            coparticipacao=input_dto.coparticipacao,
+            abrangencia=input_dto.abrangencia,
+            hospitais=input_dto.hospitais
+        )
+        
+        resultados = []
+        for plano, total, desconto in zip(
+            busca['planos'], busca['valores_totais_centavos'], busca['descontos_centavos']
+        ):
+            resultados.append(PlanoEncontradoDTO(
+                plano_id=plano.id,
+                operadora=plano.operadora_nome,
+                plano=plano.plano_nome,
+                modalidade=plano.modalidade,
+                acomodacao=plano.acomodacao,
+                coparticipacao=plano.coparticipacao,
+                abrangencia=plano.abrangencia,
+                rede_hospitalar=list(plano.rede_hospitalar),
+                valor_total=para_decimal(total),
+                desconto_aplicado=para_decimal(desconto),
+                valor_final=para_decimal(total - desconto)
+            ))
+        
+        return BuscaPlanosOutputDTO(
+            quantidade_beneficiarios=len(input_dto.idades),
+            planos_elegiveis=busca['elegiveis'],
+            planos_sem_preco=busca['sem_preco'],
+            resultados=resultados,
+            versao_tabela=busca.get('versao_tabela')
+        )
+    
+    async def simular_coparticipacao(
+        self,
+        input_dto: SimulacaoCoparticipacaoInputDTO
+    ) -> SimulacaoCoparticipacaoOutputDTO:
+        """
+        Simula o custo anual (mensalidades + coparticipação) da família em
+        cada plano candidato do catálogo
+        
+        As mensalidades saem do catálogo com o desconto das regras de
+        cotação; a coparticipação de cada plano é o percentual cadastrado
+        (ou coparticipacao_pct_padrao, se o plano tem coparticipação sem
+        percentual) sobre o custo médio de cada evento, limitado ao teto.
+        A simulação (CPU) roda fora do event loop.
+        
+        Args:
+            input_dto: Família, planos e parâmetros de utilização
+            
+        Returns:
+            SimulacaoCoparticipacaoOutputDTO: Planos do menor ao maior custo médio
+        """
+        precificacao = self.servico_calculo.precificar_planos(input_dto.idades, input_dto.planos)
+        planos = precificacao['planos']
+        mensalidades = precificacao['valores_totais_centavos'] - precificacao['descontos_centavos']
+        
+        simulador = SimuladorCoparticipacao(
+            perfis=[perfil.dict() for perfil in input_dto.perfis_utilizacao]
+            if input_dto.perfis_utilizacao else None,
+            custos_evento_centavos={
+                evento: para_centavos(custo) for evento, custo in input_dto.custos_evento.dict().items()
+            } if input_dto.custos_evento else None,
+            dispersao=input_dto.dispersao
+        )
+        percentuais = [
+            (plano.coparticipacao_pct or input_dto.coparticipacao_pct_padrao) if plano.coparticipacao else 0.0
+            for plano in planos
+        ]
+        teto = para_centavos(input_dto.teto_por_evento) if input_dto.teto_por_evento is not None else None
+        coparticipacao_evento = simulador.coparticipacao_por_evento(percentuais, teto)
+        
+        simulacao = await asyncio.to_thread(
+            simulador.simular,
+            input_dto.idades,
+            mensalidades,
+            coparticipacao_evento,
+            input_dto.simulacoes,
+            input_dto.semente
+        )
+        
+        def em_reais(centavos: float):
+            return para_decimal(int(round(centavos)))
+        
+        resultados = []
+        for i, plano in enumerate(planos):
+            mensalidade = int(mensalidades[i])
+            resultados.append(SimulacaoPlanoDTO(
+                plano_id=plano.id,
+                operadora=plano.operadora_nome,
+                plano=plano.plano_nome,
+                coparticipacao=plano.coparticipacao,
+                coparticipacao_pct=percentuais[i],
+                mensalidade=para_decimal(mensalidade),
+                custo_mensalidades_anual=para_decimal(12 * mensalidade),
+                coparticipacao_media_anual=em_reais(simulacao['coparticipacao_media'][i]),
+                custo_total_medio=em_reais(simulacao['custo_medio'][i]),
+                percentis={
+                    f"p{percentil}": em_reais(valor)
+                    for percentil, valor in zip(PERCENTIS, simulacao['percentis'][:, i])
+                },
+                probabilidade_menor_custo=round(float(simulacao['probabilidade_menor_custo'][i]), 4)
+            ))
+        resultados.sort(key=lambda r: r.custo_total_medio)
+        
+        return SimulacaoCoparticipacaoOutputDTO(
+            quantidade_beneficiarios=len(input_dto.idades),
+            simulacoes=input_dto.simulacoes,
+            eventos_medios={
+                evento: round(media, 4) for evento, media in simulacao['eventos_medios'].items()
+            },
+            resultados=resultados,
+            versao_tabela=precificacao.get('versao_tabela')
+        )
+    
+    async def exportar_grade(self) -> GradePrecosDTO:
+        """
+        Exporta a grade de preços (idade x operadora x tipo) com as regras
+        de desconto e observação, para o cliente cotar sem chamar a API
+        
+        Returns:
+            GradePrecosDTO: Grade em colunas, da versão vigente
+        """
+        grade = self.servico_calculo.calcular_grade()
+        regras = grade['regras']
+        precos = grade['precos_por_idade_centavos']
+        
+        return GradePrecosDTO(
+            versao_tabela=grade['versao_tabela'],
+            tipos=grade['tipos'],
+            operadoras=grade['operadoras'],
+            idade_maxima=precos.shape[-1] - 1,
+            precos_centavos=precos.ravel().tolist(),
+            faixas_etarias=[
+                FaixaEtariaDTO(inicio=inicio, rotulo=rotulo)
+                for inicio, rotulo in zip(regras.inicios_faixa.tolist(), regras.rotulos_faixa)
+            ],
+            descontos=GradeDescontosDTO(
+                limite_vidas=regras.limite_vidas,
+                regra_por_vidas=regras.tabela_desconto(grade['tipos'], grade['operadoras']).ravel().tolist(),
+                # Sem a posição final (sentinela de "nenhuma regra")
+                pontos_base=regras.pontos_desconto[:-1].tolist(),
+                observacoes=regras.observacao_desconto[:-1]
+            ),
+            observacoes=regras.definicao.get('observacoes') or []
+        )
+    
+    def _calcular_desconto(
+        self,
+        regras: RegrasCotacao,
+        cotacao: Cotacao,
+        valor_total_centavos: int
+    ) -> Tuple[int, int]:
+        """Regra de desconto aplicável e o desconto em centavos"""
+        regra = regras.regra_desconto(
+            cotacao.tipo_contratacao, cotacao.operadora, cotacao.quantidade_beneficiarios
+        )
+        return regra, aplicar_taxa(valor_total_centavos, int(regras.pontos_desconto[regra]))
+    
+    def _gerar_observacoes(self, regras: RegrasCotacao, cotacao: Cotacao, regra_desconto: int) -> List[str]:
+        """Gera observações sobre a cotação"""
+        beneficiarios = cotacao.beneficiarios
+        return regras.observacoes(
+            cotacao.tipo_contratacao,
+            cotacao.operadora,
+            len(beneficiarios),
+            beneficiarios.idade_minima,
+            beneficiarios.idade_maxima,
+            regra_desconto
+        )
+    
+    def _observacoes_gerais(
+        self,
+        regras: RegrasCotacao,
+        contagem_por_idade: np.ndarray,
+        tipo_contratacao: Optional[str] = None
+    ) -> List[str]:
+        """Observações de um grupo cotado em várias operadoras (regras sem operadora específica)"""
+        presentes = np.flatnonzero(contagem_por_idade)
+        quantidade = int(contagem_por_idade.sum())
+        return regras.observacoes(
+            tipo_contratacao,
+            None,
+            quantidade,
+            int(presentes[0]),
+            int(presentes[-1]),
+            regras.regra_desconto(tipo_contratacao, None, quantidade)
+        )
     
-    def _definir_faixa_etaria(self, idade: int) -> str:
-        """Define a faixa etária do beneficiário"""
-        if idade < 18:
-            return "0-17 anos"
-        elif idade < 30:
-            return "18-29 anos"
-        elif idade < 40:
-            return "30-39 anos"
-        elif idade < 50:
-            return "40-49 anos"
-        elif idade < 60:
-            return "50-59 anos"
-        else:
-            return "60+ anos"
+    def faixa_etaria(self, idade: int) -> str:
+        """Rótulo da faixa etária nas regras vigentes"""
+        return self.servico_calculo.regras.rotulo_faixa_por_idade[idade]
@@ -3,11 +3,25 @@ Entidade Cotação - Representa uma cotação de seguro saúde
 """
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
 from decimal import Decimal
 
+import numpy as np
 
-@dataclass
+# Limites de idade usados nas regras da cotação
+IDADE_MAIORIDADE = 18  # abaixo disso, criança
+IDADE_IDOSO = 60
+IDADE_MAXIMA = 120
+
+VINCULOS = ("TITULAR", "DEPENDENTE", "AGREGADO")
+
+# A ordem é a dos índices das matrizes de preços e de regras
+TIPOS_CONTRATACAO = ("ADESAO", "PME", "EMPRESARIAL")
+
+_IDADES = np.arange(IDADE_MAXIMA + 1)
+
+
+@dataclass(slots=True)
 class Beneficiario:
     """Representa um beneficiário do plano de saúde"""
     idade: int
@@ -18,13 +32,149 @@ class Beneficiario:
             raise ValueError("Idade deve estar entre 0 e 120 anos")
 
 
+class GrupoBeneficiarios(Sequence):
+    """
+    Beneficiários de uma cotação em forma compacta: um array de idades e
+    um array de códigos de vínculo, em vez de um objeto por vida.
+    
+    Comporta-se como uma sequência somente leitura de Beneficiario (os
+    objetos são criados sob demanda no acesso). Os agregados usados nas
+    regras da cotação saem do histograma de idades, calculado uma única
+    vez na criação.
+    """
+    
+    __slots__ = (
+        "idades", "_vinculos", "rotulos_vinculo", "contagem_por_idade",
+        "idade_minima", "idade_maxima"
+    )
+    
+    def __init__(
+        self,
+        idades: Union[np.ndarray, Iterable[int]],
+        vinculos: Optional[Union[np.ndarray, Iterable[int]]] = None,
+        rotulos_vinculo: Sequence[str] = VINCULOS
+    ):
+        """
+        Args:
+            idades: Idades dos beneficiários
+            vinculos: Código de vínculo de cada beneficiário (índice em
+                rotulos_vinculo); se omitido, o primeiro é TITULAR e os
+                demais DEPENDENTE
+            rotulos_vinculo: Nome de cada código de vínculo
+        """
+        idades = np.asarray(idades)
+        if idades.size == 0:
+            # Lista vazia vira array float; o grupo vazio é recusado pela Cotacao
+            idades = idades.astype(np.int64)
+        if idades.ndim != 1:
+            raise ValueError("Idades devem ser uma lista de inteiros")
+        
+        # Uma passada sobre as vidas: o histograma valida as idades e dá
+        # origem aos demais agregados
+        try:
+            contagem = np.bincount(idades, minlength=IDADE_MAXIMA + 1)
+        except TypeError:
+            raise ValueError("Idades devem ser uma lista de inteiros")
+        except ValueError:  # idade negativa
+            raise ValueError("Idade deve estar entre 0 e 120 anos")
+        if len(contagem) > IDADE_MAXIMA + 1:
+            raise ValueError("Idade deve estar entre 0 e 120 anos")
+        
+        if vinculos is not None:
+            vinculos = np.array(vinculos, dtype=np.int8)
+            if vinculos.shape != idades.shape:
+                raise ValueError("Deve haver um vínculo por beneficiário")
+            vinculos.setflags(write=False)
+        
+        self.idades = idades.astype(np.int16)
+        self.idades.setflags(write=False)
+        # None = padrão (primeiro TITULAR, demais DEPENDENTE), montado sob demanda
+        self._vinculos = vinculos
+        self.rotulos_vinculo = VINCULOS if vinculos is None else tuple(rotulos_vinculo)
+        self.contagem_por_idade = contagem
+        contagem.setflags(write=False)
+        
+        presentes = contagem.nonzero()[0]
+        if len(presentes):
+            self.idade_minima = int(presentes[0])
+            self.idade_maxima = int(presentes[-1])
+        else:
+            self.idade_minima = self.idade_maxima = None
+    
+    @classmethod
+    def de_beneficiarios(cls, beneficiarios: Iterable[Beneficiario]) -> "GrupoBeneficiarios":
+        """Monta o grupo compacto a partir de objetos Beneficiario"""
+        beneficiarios = list(beneficiarios)
+        rotulos = list(VINCULOS)
+        codigos = []
+        for beneficiario in beneficiarios:
+            if beneficiario.tipo_vinculo not in rotulos:
+                rotulos.append(beneficiario.tipo_vinculo)
+            codigos.append(rotulos.index(beneficiario.tipo_vinculo))
+        return cls(
+            np.fromiter((b.idade for b in beneficiarios), dtype=np.int64, count=len(beneficiarios)),
+            np.array(codigos, dtype=np.int8),
+            rotulos
+        )
+    
+    @property
+    def vinculos(self) -> np.ndarray:
+        """Código de vínculo de cada beneficiário (índice em rotulos_vinculo)"""
+        if self._vinculos is None:
+            vinculos = np.ones(len(self.idades), dtype=np.int8)
+            vinculos[:1] = 0
+            vinculos.setflags(write=False)
+            self._vinculos = vinculos
+        return self._vinculos
+    
+    @property
+    def idade_media(self) -> float:
+        """Idade média, a partir do histograma"""
+        if not len(self.idades):
+            return 0
+        return int(self.contagem_por_idade @ _IDADES) / len(self.idades)
+    
+    def __len__(self) -> int:
+        return len(self.idades)
+    
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        vinculos = self.vinculos
+        return Beneficiario(
+            idade=int(self.idades[indice]),
+            tipo_vinculo=self.rotulos_vinculo[vinculos[indice]]
+        )
+    
+    def __iter__(self) -> Iterator[Beneficiario]:
+        rotulos = self.rotulos_vinculo
+        for idade, vinculo in zip(self.idades.tolist(), self.vinculos.tolist()):
+            yield Beneficiario(idade=idade, tipo_vinculo=rotulos[vinculo])
+    
+    def __repr__(self) -> str:
+        return f"GrupoBeneficiarios({len(self)} vidas)"
+    
+    @property
+    def possui_idoso(self) -> bool:
+        """Há beneficiário idoso (60+)"""
+        return self.idade_maxima is not None and self.idade_maxima >= IDADE_IDOSO
+    
+    @property
+    def possui_crianca(self) -> bool:
+        """Há criança (0-17)"""
+        return self.idade_minima is not None and self.idade_minima < IDADE_MAIORIDADE
+
+
 @dataclass
 class Cotacao:
     """
     Entidade principal de Cotação
     Representa uma cotação de plano de saúde
+    
+    Os beneficiários são guardados como GrupoBeneficiarios (arrays); uma
+    lista de Beneficiario informada na criação é convertida.
     """
-    beneficiarios: List[Beneficiario]
+    beneficiarios: Sequence[Beneficiario]
     tipo_contratacao: str  # ADESAO, PME, EMPRESARIAL
     operadora: str  # AMIL, BRADESCO, SULAMERICA, etc
     plano: Optional[str] = None
@@ -33,16 +183,47 @@ class Cotacao:
     data_cotacao: datetime = None
     
     def __post_init__(self):
-        if not self.beneficiarios:
+        if not isinstance(self.beneficiarios, GrupoBeneficiarios):
+            self.beneficiarios = GrupoBeneficiarios.de_beneficiarios(self.beneficiarios)
+        
+        if not len(self.beneficiarios):
             raise ValueError("Cotação deve ter pelo menos um beneficiário")
         
         if self.data_cotacao is None:
             self.data_cotacao = datetime.now()
         
         # Validar tipo de contratação
-        tipos_validos = ["ADESAO", "PME", "EMPRESARIAL"]
-        if self.tipo_contratacao not in tipos_validos:
-            raise ValueError(f"Tipo de contratação deve ser um de: {tipos_validos}")
+        if self.tipo_contratacao not in TIPOS_CONTRATACAO:
+            raise ValueError(f"Tipo de contratação deve ser um de: {list(TIPOS_CONTRATACAO)}")
+    
+    @classmethod
+    def de_idades(
+        cls,
+        idades: Union[np.ndarray, Iterable[int]],
+        tipo_contratacao: str,
+        operadora: str,
+        plano: Optional[str] = None,
+        vinculos: Optional[Union[np.ndarray, Iterable[int]]] = None
+    ) -> "Cotacao":
+        """
+        Cria a cotação direto das idades, sem objetos Beneficiario
+        
+        Args:
+            idades: Idades dos beneficiários
+            vinculos: Códigos de vínculo (índice em VINCULOS); se omitido,
+                o primeiro é TITULAR e os demais DEPENDENTE
+        """
+        return cls(
+            beneficiarios=GrupoBeneficiarios(idades, vinculos),
+            tipo_contratacao=tipo_contratacao,
+            operadora=operadora,
+            plano=plano
+        )
+    
+    @property
+    def idades(self) -> np.ndarray:
+        """Idades dos beneficiários (array somente leitura)"""
+        return self.beneficiarios.idades
     
     @property
     def quantidade_beneficiarios(self) -> int:
@@ -52,16 +233,14 @@ class Cotacao:
     @property
     def idade_media(self) -> float:
         """Calcula a idade média dos beneficiários"""
-        if not self.beneficiarios:
-            return 0
-        return sum(b.idade for b in self.beneficiarios) / len(self.beneficiarios)
+        return self.beneficiarios.idade_media
     
     @property
     def possui_idoso(self) -> bool:
         """Verifica se há beneficiário idoso (60+)"""
-        return any(b.idade >= 60 for b in self.beneficiarios)
+        return self.beneficiarios.possui_idoso
     
     @property
     def possui_crianca(self) -> bool:
         """Verifica se há criança (0-17)"""
-        return any(b.idade < 18 for b in self.beneficiarios)
+        return self.beneficiarios.possui_crianca
@@ -0,0 +1,74 @@
+"""
+Value Object - Centavos
+Aritmética monetária em inteiros (centavos de real)
+
+Regras de arredondamento do cálculo de cotações:
+- Preço por beneficiário: produto decimal exato (valor base x multiplicador)
+  arredondado para o centavo com ROUND_HALF_UP, uma única vez, na
+  compilação da tabela de preços.
+- Valor total: soma inteira exata dos centavos.
+- Desconto: valor_total x taxa (em pontos-base) arredondado para o centavo
+  com ROUND_HALF_UP.
+- Valor final: valor_total - desconto, exato.
+A conversão para Decimal acontece apenas na montagem dos DTOs.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Union
+
+import numpy as np
+
+PONTOS_BASE = 10000  # 100% = 10.000 pontos-base
+
+
+def para_centavos(valor: Union[Decimal, float, int, str]) -> int:
+    """
+    Converte um valor em reais para centavos (ROUND_HALF_UP)
+
+    Floats são lidos pela sua representação decimal mais curta (str),
+    e não pelo valor binário.
+    """
+    if isinstance(valor, float):
+        valor = repr(valor)
+    return int((Decimal(valor) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def multiplicar_centavos(valor: Union[Decimal, float, str], fator: Union[Decimal, float, str]) -> int:
+    """Produto decimal exato de valor x fator, arredondado para centavos"""
+    produto = Decimal(repr(valor) if isinstance(valor, float) else valor) * \
+        Decimal(repr(fator) if isinstance(fator, float) else fator)
+    return para_centavos(produto)
+
+
+def para_decimal(centavos: int) -> Decimal:
+    """Converte centavos para Decimal com duas casas (fronteira dos DTOs)"""
+    return Decimal(int(centavos)).scaleb(-2)
+
+
+def para_pontos_base(taxa: Union[Decimal, str]) -> int:
+    """Converte uma taxa decimal (ex.: Decimal("0.05")) para pontos-base"""
+    pontos = Decimal(taxa) * PONTOS_BASE
+    if pontos != pontos.to_integral_value():
+        raise ValueError(f"Taxa {taxa} não é representável em pontos-base")
+    return int(pontos)
+
+
+def aplicar_taxa(centavos: int, pontos_base: int) -> int:
+    """centavos x taxa, arredondado para o centavo (ROUND_HALF_UP, valores >= 0)"""
+    return (centavos * pontos_base + PONTOS_BASE // 2) // PONTOS_BASE
+
+
+def aplicar_taxa_array(centavos: np.ndarray, pontos_base: np.ndarray) -> np.ndarray:
+    """Versão vetorizada (int64) de aplicar_taxa"""
+    return (centavos * pontos_base + PONTOS_BASE // 2) // PONTOS_BASE
+
+
+def reajustar(centavos: int, pontos_base: int, anos: int) -> int:
+    """
+    Aplica `anos` reajustes anuais compostos de `pontos_base` cada
+
+    O fator acumulado (1 + taxa) ** anos é exato (inteiros de precisão
+    arbitrária); o resultado é arredondado uma única vez (ROUND_HALF_UP).
+    """
+    numerador = (PONTOS_BASE + pontos_base) ** anos
+    denominador = PONTOS_BASE ** anos
+    return (2 * centavos * numerador + denominador) // (2 * denominador)
@@ -4,31 +4,218 @@ Utiliza OpenAI GPT-4 para análise de documentos de planos de saúde
 """
 import os
 import json
-from typing import Dict, List, Optional
-from pypdf import PdfReader
-from openai import OpenAI
+import asyncio
+import hashlib
+from datetime import date
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+from openai import APITimeoutError, AsyncOpenAI
 from dotenv import load_dotenv
-import io
+from .cache_extracao_pdf import CacheExtracaoPDF
+from .extratores_layout import (
+    CAMPO_DATAS_NASCIMENTO,
+    RegistroExtratoresLayout,
+    criar_registro_padrao,
+    idades_na_data,
+)
+from .pool_extracao_pdf import PoolExtracaoPDF, extrair_texto_pdf
+from .reducao_extracoes import VERSAO_REDUCAO, reduzir_extracoes
+from .selecao_trechos import (
+    MARCADOR_CONTEXTO,
+    VERSAO_SELECAO,
+    Janela,
+    dividir_em_janelas,
+    estimar_tokens,
+    selecionar_trechos,
+)
+from .upload_pdf import ConteudoPDF, PDFRecebido
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
+PROMPT_SISTEMA = (
+    "Você é um assistente especializado em extrair dados estruturados de documentos "
+    "de planos de saúde. Sempre retorne JSON válido."
+)
+
+PROMPT_EXTRACAO = """
+Você é um especialista em análise de documentos de planos de saúde.
+
+Analise o documento abaixo e extraia as seguintes informações:
+- **idades**: lista de idades dos beneficiários (números inteiros)
+- **operadora**: nome da operadora de saúde (ex: AMIL, BRADESCO, SULAMERICA, UNIMED, etc)
+- **valor_atual**: valor atual do plano (número decimal, sem símbolo de moeda)
+- **tipo_plano**: tipo de plano se mencionado (ADESAO, PME, EMPRESARIAL ou null)
+- **nome_beneficiarios**: lista com nomes dos beneficiários se disponíveis
+- **observacoes**: qualquer informação relevante adicional
+
+**IMPORTANTE:**
+- Se não encontrar alguma informação, use null
+- Para idades, extraia APENAS números
+- Para operadora, use o nome em MAIÚSCULAS
+- Para valor, use apenas números (ex: 1500.50)
+
+Retorne APENAS um objeto JSON válido, sem texto adicional.
+
+DOCUMENTO:
+{texto_pdf}
+
+JSON:
+"""
+
+# Mesmo prompt, para uma janela de um documento grande (processamento em partes)
+PROMPT_EXTRACAO_JANELA = PROMPT_EXTRACAO.replace(
+    "- Para valor, use apenas números (ex: 1500.50)\n",
+    f"""- Para valor, use apenas números (ex: 1500.50)
+- O documento abaixo é uma parte de um documento maior. O texto após "{MARCADOR_CONTEXTO}" é só a
+  continuação desta parte: não extraia beneficiários que comecem nele
+- Liste nome_beneficiarios e idades na mesma ordem, uma posição por beneficiário
+""",
+)
+
+# Baixa temperatura para respostas mais consistentes
+TEMPERATURA = 0.1
+
+# Incrementar ao mudar _validar_dados_extraidos: invalida as extrações em cache
+VERSAO_VALIDACAO = 1
+
+# Etapas do pipeline informadas ao callback de progresso
+ETAPA_TEXTO_EXTRAIDO = "texto_extraido"
+ETAPA_IA_CONCLUIDA = "ia_concluida"
+ETAPA_VALIDADO = "validado"
+
+# Valores de `confianca`: caminho que produziu os dados
+CONFIANCA_LAYOUT = "layout"
+CONFIANCA_IA = "ia"
+
 
 class AIService:
-    """Serviço de IA para processamento de documentos"""
+    """
+    Serviço de IA para processamento de documentos.
+    
+    O pipeline não bloqueia o event loop: a extração de texto (CPU) roda no
+    PoolExtracaoPDF, um pool de processos com fila limitada que recusa novos
+    PDFs quando saturado (ExtracaoSaturadaError), e a análise usa o cliente
+    assíncrono da OpenAI. Um semáforo limita as chamadas simultâneas à
+    OpenAI; quem excede espera a vez sem ocupar o loop. Cada etapa tem seu
+    próprio timeout e o pipeline pode ser cancelado (ex.: cliente
+    desconectou), o que tira o PDF da fila de extração ou cancela a chamada
+    à OpenAI em andamento.
+    
+    Antes da IA, o texto passa pelos extratores de layout das operadoras
+    conhecidas (regras determinísticas, microssegundos); a OpenAI só é
+    chamada quando a confiança do extrator fica abaixo de `limiar_layout`.
+    O campo `confianca` do resultado indica o caminho usado ("layout" ou
+    "ia") e `pontuacao_layout`, a confiança do extrator.
     
-    def __init__(self):
-        """Inicializa o cliente OpenAI"""
+    O prompt não leva o documento inteiro: acima de `orcamento_tokens`, só
+    entram os trechos (páginas e seções) mais relevantes para os campos
+    extraídos; `tokens_economizados` registra o que ficou de fora. Quando
+    os dados de beneficiários não cabem no orçamento, o documento é
+    processado em janelas paralelas (map-reduce).
+    """
+    
+    def __init__(
+        self,
+        max_concorrencia: Optional[int] = None,
+        timeout_extracao: Optional[float] = None,
+        timeout_ia: Optional[float] = None,
+        pool_extracao: Optional[PoolExtracaoPDF] = None,
+        cache_extracao: Optional[CacheExtracaoPDF] = None,
+        registro_layouts: Optional[RegistroExtratoresLayout] = None,
+        limiar_layout: Optional[float] = None,
+        orcamento_tokens: Optional[int] = None,
+        concorrencia_janelas: Optional[int] = None,
+        max_janelas: Optional[int] = None,
+        max_paginas: Optional[int] = None,
+        max_caracteres: Optional[int] = None
+    ):
+        """
+        Inicializa o cliente OpenAI
+        
+        Args:
+            max_concorrencia: Chamadas simultâneas à OpenAI
+                (padrão: env PDF_MAX_CONCORRENCIA ou 4)
+            timeout_extracao: Limite em segundos da extração de texto
+                (padrão: env PDF_TIMEOUT_EXTRACAO ou 30)
+            timeout_ia: Limite em segundos de cada chamada à OpenAI
+                (padrão: env OPENAI_TIMEOUT ou 60)
+            pool_extracao: Pool de processos da extração de texto
+                (padrão: configurado pelas variáveis PDF_WORKERS,
+                PDF_FILA_MAXIMA e PDF_TAREFAS_POR_WORKER, com a leitura
+                página a página descrita em extrair_texto_pdf)
+            cache_extracao: Cache de extrações por conteúdo do PDF
+                (None = toda extração é processada)
+            registro_layouts: Extratores por layout de operadora
+                (padrão: criar_registro_padrao())
+            limiar_layout: Confiança mínima (0 a 1) para dispensar a IA
+                (padrão: env PDF_LAYOUT_LIMIAR ou 0.8; acima de 1 desativa)
+            orcamento_tokens: Tokens do documento no prompt
+                (padrão: env PDF_ORCAMENTO_TOKENS ou 6000)
+            concorrencia_janelas: Janelas de um documento analisadas ao
+                mesmo tempo (padrão: env PDF_JANELAS_CONCORRENCIA ou 4)
+            max_janelas: Janelas por documento no processamento em partes
+                (padrão: env PDF_MAX_JANELAS ou 30; 0 desativa)
+            max_paginas: Páginas lidas de cada PDF no pool padrão
+                (padrão: env PDF_MAX_PAGINAS ou 300; 0 = todas)
+            max_caracteres: Caracteres de texto lidos de cada PDF no pool
+                padrão (padrão: env PDF_MAX_CARACTERES ou 1000000; 0 = sem limite)
+        """
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY não encontrada nas variáveis de ambiente")
         
-        self.client = OpenAI(api_key=api_key)
+        self.max_concorrencia = max_concorrencia or int(os.getenv("PDF_MAX_CONCORRENCIA", "4"))
+        self.timeout_extracao = timeout_extracao or float(os.getenv("PDF_TIMEOUT_EXTRACAO", "30"))
+        self.timeout_ia = timeout_ia or float(os.getenv("OPENAI_TIMEOUT", "60"))
+        self._semaforo = asyncio.Semaphore(self.max_concorrencia)
+        self._em_andamento = 0
+        self.cache_extracao = cache_extracao
+        self.registro_layouts = registro_layouts or criar_registro_padrao()
+        self.limiar_layout = limiar_layout if limiar_layout is not None else float(os.getenv("PDF_LAYOUT_LIMIAR", "0.8"))
+        self.max_paginas = max_paginas if max_paginas is not None else int(os.getenv("PDF_MAX_PAGINAS", "300"))
+        self.max_caracteres = (
+            max_caracteres if max_caracteres is not None else int(os.getenv("PDF_MAX_CARACTERES", "1000000"))
+        )
+        # Leitura página a página: para quando o extrator de layout já tem os campos
+        # (o critério vai para os workers junto com a função)
+        parada = (
+            partial(self.registro_layouts.campos_completos, limiar=self.limiar_layout)
+            if self.limiar_layout <= 1 else None
+        )
+        self._extrair = partial(
+            extrair_texto_pdf, parada=parada, max_paginas=self.max_paginas, max_caracteres=self.max_caracteres
+        )
+        self.pool_extracao = pool_extracao or PoolExtracaoPDF(funcao=self._extrair)
+        self.orcamento_tokens = orcamento_tokens or int(os.getenv("PDF_ORCAMENTO_TOKENS", "6000"))
+        self.concorrencia_janelas = concorrencia_janelas or int(os.getenv("PDF_JANELAS_CONCORRENCIA", "4"))
+        self.max_janelas = max_janelas if max_janelas is not None else int(os.getenv("PDF_MAX_JANELAS", "30"))
+        self.extracoes_layout = 0
+        self.extracoes_ia = 0
+        self.tokens_economizados = 0
+        
+        self.client = AsyncOpenAI(api_key=api_key, timeout=self.timeout_ia)
         self.model = "gpt-4o-mini"
     
+    @property
+    def versao_extracao(self) -> str:
+        """
+        Identifica o que determina o resultado de uma extração além do PDF
+        (modelo, prompts, temperatura, validação, regras de layout, seleção
+        de trechos, processamento em partes e limites de leitura); compõe a
+        chave do cache
+        """
+        assinatura = json.dumps([
+            self.model, PROMPT_SISTEMA, PROMPT_EXTRACAO, PROMPT_EXTRACAO_JANELA, TEMPERATURA,
+            VERSAO_VALIDACAO, self.registro_layouts.versao, self.limiar_layout, VERSAO_SELECAO,
+            self.orcamento_tokens, VERSAO_REDUCAO, self.max_janelas, self.max_paginas, self.max_caracteres
+        ])
+        return hashlib.sha256(assinatura.encode()).hexdigest()[:12]
+    
     def extrair_texto_pdf(self, file_bytes: bytes) -> str:
         """
-        Extrai texto de um arquivo PDF
+        Extrai texto de um arquivo PDF no processo atual (síncrono), com a
+        mesma parada antecipada e os mesmos limites do pool padrão
         
         Args:
             file_bytes: Bytes do arquivo PDF
@@ -36,97 +223,127 @@ class AIService:
         Returns:
             str: Texto extraído do PDF
         """
-        try:
-            # Criar um objeto de arquivo em memória
-            pdf_file = io.BytesIO(file_bytes)
-            
-            # Ler o PDF
-            reader = PdfReader(pdf_file)
-            
-            # Extrair texto de todas as páginas
-            texto_completo = []
-            for page in reader.pages:
-                texto = page.extract_text()
-                if texto:
-                    texto_completo.append(texto)
-            
-            return "\n\n".join(texto_completo)
-        
-        except Exception as e:
-            raise ValueError(f"Erro ao extrair texto do PDF: {str(e)}")
+        return self._extrair(file_bytes)
     
-    def analisar_documento_saude(self, texto_pdf: str) -> Dict:
+    async def analisar_documento_saude(
+        self,
+        texto_pdf: str,
+        progresso: Optional[Callable[[str], None]] = None
+    ) -> Dict:
         """
         Analisa documento de plano de saúde usando OpenAI
         
+        Acima do orçamento de tokens, o prompt leva só os trechos mais
+        relevantes. Se com isso ficariam de fora trechos com dados de
+        beneficiários (ex.: contrato empresarial com centenas de vidas), o
+        documento é analisado em janelas sobrepostas, em paralelo, e as
+        extrações parciais são reduzidas a um único resultado.
+        
         Args:
             texto_pdf: Texto extraído do PDF
+            progresso: Chamado com ETAPA_IA_CONCLUIDA e ETAPA_VALIDADO
             
         Returns:
-            Dict: Dados estruturados extraídos
+            Dict: Dados estruturados extraídos, com `tokens_economizados`
+                (tokens estimados do documento que não entraram no prompt)
+                e `chamadas_ia`
         """
-        prompt = f"""
-Você é um especialista em análise de documentos de planos de saúde.
-
-Analise o documento abaixo e extraia as seguintes informações:
-- **idades**: lista de idades dos beneficiários (números inteiros)
-- **operadora**: nome da operadora de saúde (ex: AMIL, BRADESCO, SULAMERICA, UNIMED, etc)
-- **valor_atual**: valor atual do plano (número decimal, sem símbolo de moeda)
-- **tipo_plano**: tipo de plano se mencionado (ADESAO, PME, EMPRESARIAL ou null)
-- **nome_beneficiarios**: lista com nomes dos beneficiários se disponíveis
-- **observacoes**: qualquer informação relevante adicional
-
-**IMPORTANTE:**
-- Se não encontrar alguma informação, use null
-- Para idades, extraia APENAS números
-- Para operadora, use o nome em MAIÚSCULAS
-- Para valor, use apenas números (ex: 1500.50)
-
-Retorne APENAS um objeto JSON válido, sem texto adicional.
-
-DOCUMENTO:
-{texto_pdf}
-
-JSON:
-"""
+        # Em thread: o loop segue atendendo entre um trecho e outro em documentos longos
+        selecao = await asyncio.to_thread(selecionar_trechos, texto_pdf, self.orcamento_tokens)
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Você é um assistente especializado em extrair dados estruturados de documentos de planos de saúde. Sempre retorne JSON válido."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.1,  # Baixa temperatura para respostas mais consistentes
-                response_format={"type": "json_object"}  # Força resposta JSON
+        if selecao.trechos_com_dados_descartados and self.max_janelas:
+            janelas = await asyncio.to_thread(
+                dividir_em_janelas, texto_pdf, self.orcamento_tokens, self.max_janelas
             )
+            parciais = await self._analisar_janelas(janelas)
+            if progresso:
+                progresso(ETAPA_IA_CONCLUIDA)
+            dados = reduzir_extracoes(parciais)
+            enviados = sum(estimar_tokens(janela.texto) for janela in janelas)
+            tokens_economizados = max(selecao.tokens_originais - enviados, 0)
+            chamadas = len(janelas)
+        else:
+            dados_extraidos = await self._chamar_ia(PROMPT_EXTRACAO.format(texto_pdf=selecao.texto))
+            if progresso:
+                progresso(ETAPA_IA_CONCLUIDA)
+            dados = self._validar_dados_extraidos(dados_extraidos)
+            tokens_economizados = selecao.tokens_economizados
+            chamadas = 1
+        
+        if progresso:
+            progresso(ETAPA_VALIDADO)
+        self.tokens_economizados += tokens_economizados
+        dados["tokens_economizados"] = tokens_economizados
+        dados["chamadas_ia"] = chamadas
+        return dados
+    
+    async def _analisar_janelas(self, janelas: List[Janela]) -> List[Dict]:
+        """
+        Map: uma chamada por janela, até `concorrencia_janelas` ao mesmo tempo
+        (e dentro do limite global de chamadas). A latência total fica na
+        da janela mais lenta quando as janelas cabem no limite. Uma falha
+        cancela as demais.
+        """
+        limite = asyncio.Semaphore(self.concorrencia_janelas)
+        
+        async def analisar(janela: Janela) -> Dict:
+            async with limite:
+                dados = await self._chamar_ia(PROMPT_EXTRACAO_JANELA.format(texto_pdf=janela.texto))
+            return self._validar_dados_extraidos(dados)
+        
+        tarefas = [asyncio.ensure_future(analisar(janela)) for janela in janelas]
+        try:
+            return await asyncio.gather(*tarefas)
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+    
+    async def _chamar_ia(self, prompt: str) -> Dict:
+        """
+        Uma chamada à OpenAI, dentro do limite de chamadas simultâneas
+        
+        Returns:
+            Dict: JSON devolvido pelo modelo, sem validação
+        """
+        try:
+            async with self._semaforo:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": PROMPT_SISTEMA
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=TEMPERATURA,
+                    response_format={"type": "json_object"},  # Força resposta JSON
+                    timeout=self.timeout_ia
+                )
             
             # Extrair resposta
             resposta_texto = response.choices[0].message.content
             
             # Parsear JSON
-            dados_extraidos = json.loads(resposta_texto)
-            
-            # Validar e limpar dados
-            return self._validar_dados_extraidos(dados_extraidos)
+            return json.loads(resposta_texto)
         
         except json.JSONDecodeError as e:
             raise ValueError(f"Erro ao parsear resposta da IA: {str(e)}")
+        except APITimeoutError:
+            raise TimeoutError(f"A análise com IA excedeu {self.timeout_ia:g}s")
         except Exception as e:
             raise ValueError(f"Erro ao analisar documento com IA: {str(e)}")
     
-    def _validar_dados_extraidos(self, dados: Dict) -> Dict:
+    def _validar_dados_extraidos(self, dados: Dict, confianca: str = CONFIANCA_IA) -> Dict:
         """
         Valida e normaliza dados extraídos
         
         Args:
             dados: Dados brutos extraídos
+            confianca: Caminho que produziu os dados (CONFIANCA_IA ou CONFIANCA_LAYOUT)
             
         Returns:
             Dict: Dados validados e normalizados
@@ -138,7 +355,7 @@ JSON:
             "tipo_plano": None,
             "nome_beneficiarios": [],
             "observacoes": None,
-            "confianca": "alta"  # Indicador de confiança na extração
+            "confianca": confianca  # Caminho que produziu os dados
         }
         
         # Validar idades
@@ -178,31 +395,167 @@ JSON:
         
         return resultado
     
-    async def processar_pdf_completo(self, file_bytes: bytes) -> Dict:
+    async def processar_pdf_completo(
+        self,
+        file_bytes: ConteudoPDF,
+        limite_extracao: Optional[asyncio.Semaphore] = None,
+        progresso: Optional[Callable[[str], None]] = None
+    ) -> Dict:
         """
         Pipeline completo: extrai texto do PDF e analisa com IA
         
+        Com cache_extracao, um PDF já processado (mesmos bytes e mesma
+        versao_extracao) não é extraído nem analisado de novo, e envios
+        simultâneos do mesmo arquivo compartilham um único processamento.
+        
         Args:
-            file_bytes: Bytes do arquivo PDF
+            file_bytes: Bytes do arquivo PDF ou PDF recebido do upload (um
+                upload grande é lido pelo worker direto do arquivo temporário)
+            limite_extracao: Semáforo adicional da etapa de extração (usado
+                pelos lotes para não encher a fila do pool sozinhos)
+            progresso: Chamado ao fim de cada etapa (ETAPA_TEXTO_EXTRAIDO,
+                ETAPA_IA_CONCLUIDA, ETAPA_VALIDADO); um acerto no cache
+                não passa pelas etapas. Quem se junta a uma extração em
+                andamento recebe as etapas dela, inclusive as já concluídas
+                (e não ocupa o pool, então o seu limite_extracao não se aplica)
             
         Returns:
             Dict: Dados estruturados extraídos
+            
+        Raises:
+            ValueError: PDF inválido, sem conteúdo ou resposta inválida da IA
+            TimeoutError: Extração de texto ou análise excedeu o limite
+            ExtracaoSaturadaError: Pool de extração e fila cheios
         """
-        # Extrair texto
-        texto = self.extrair_texto_pdf(file_bytes)
+        processar = partial(self._processar_pdf, limite_extracao=limite_extracao)
+        if self.cache_extracao is None:
+            dados = await processar(file_bytes, progresso)
+        else:
+            dados = await self.cache_extracao.obter_ou_calcular(
+                file_bytes, self.versao_extracao, processar, progresso
+            )
         
-        if not texto or len(texto.strip()) < 50:
-            raise ValueError("PDF vazio ou com pouco conteúdo para análise")
+        # Idades calculadas na data de hoje (documento sem data de emissão):
+        # o cache guarda as datas de nascimento e as idades valem para o dia da entrega
+        nascimentos = dados.pop(CAMPO_DATAS_NASCIMENTO, None)
+        if nascimentos:
+            dados["idades"] = idades_na_data([date.fromisoformat(data) for data in nascimentos], date.today())
+        return dados
+    
+    async def _extrair_texto(self, file_bytes: ConteudoPDF) -> str:
+        """Extrai o texto em um processo do pool, fora do event loop"""
+        origem = file_bytes.origem if isinstance(file_bytes, PDFRecebido) else file_bytes
+        try:
+            return await self.pool_extracao.extrair(origem, timeout=self.timeout_extracao)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"A extração de texto do PDF excedeu {self.timeout_extracao:g}s")
+    
+    async def _processar_pdf(
+        self,
+        file_bytes: ConteudoPDF,
+        progresso: Optional[Callable[[str], None]] = None,
+        limite_extracao: Optional[asyncio.Semaphore] = None
+    ) -> Dict:
+        """Extração e análise, sem cache"""
+        self._em_andamento += 1
+        try:
+            if limite_extracao is None:
+                texto = await self._extrair_texto(file_bytes)
+            else:
+                async with limite_extracao:
+                    texto = await self._extrair_texto(file_bytes)
+            
+            if not texto or len(texto.strip()) < 50:
+                raise ValueError("PDF vazio ou com pouco conteúdo para análise")
+            if progresso:
+                progresso(ETAPA_TEXTO_EXTRAIDO)
+            
+            # Layout conhecido: dispensa a IA
+            layout = self.registro_layouts.extrair(texto)
+            if layout is not None and layout.confianca >= self.limiar_layout:
+                dados = self._validar_dados_extraidos(layout.dados, CONFIANCA_LAYOUT)
+                if CAMPO_DATAS_NASCIMENTO in layout.dados:
+                    dados[CAMPO_DATAS_NASCIMENTO] = layout.dados[CAMPO_DATAS_NASCIMENTO]
+                dados["chamadas_ia"] = 0
+                self.extracoes_layout += 1
+                if progresso:
+                    progresso(ETAPA_VALIDADO)
+            else:
+                # Analisar com IA
+                dados = await self.analisar_documento_saude(texto, progresso)
+                dados["confianca"] = CONFIANCA_IA
+                self.extracoes_ia += 1
+        finally:
+            self._em_andamento -= 1
         
-        # Analisar com IA
-        dados = self.analisar_documento_saude(texto)
+        dados["pontuacao_layout"] = layout.confianca if layout is not None else None
         
         # Adicionar metadados
         dados["texto_extraido_preview"] = texto[:500] + "..." if len(texto) > 500 else texto
         dados["total_caracteres"] = len(texto)
         
         return dados
+    
+    async def processar_lote(
+        self,
+        arquivos: List[bytes],
+        extracoes_paralelas: Optional[int] = None
+    ) -> AsyncIterator[Tuple[int, Union[Dict, Exception]]]:
+        """
+        Processa vários PDFs ao mesmo tempo, entregando cada um assim que
+        termina (ordem de conclusão, não de envio)
+        
+        As etapas ficam limitadas: no máximo `extracoes_paralelas` PDFs do
+        lote na extração de texto (padrão: workers do pool) e, na análise,
+        o semáforo global de chamadas à OpenAI. Enquanto um PDF está na IA,
+        o próximo já está sendo extraído.
+        
+        Args:
+            arquivos: Bytes de cada PDF
+            extracoes_paralelas: PDFs do lote extraídos ao mesmo tempo
+                (padrão: env PDF_LOTE_EXTRACOES_PARALELAS ou workers do pool)
+            
+        Yields:
+            (índice do arquivo, dados extraídos ou a exceção do arquivo)
+        """
+        extracoes_paralelas = (
+            extracoes_paralelas
+            or int(os.getenv("PDF_LOTE_EXTRACOES_PARALELAS", "0"))
+            or self.pool_extracao.workers
+        )
+        limite_extracao = asyncio.Semaphore(extracoes_paralelas)
+        
+        async def processar(indice: int, file_bytes: bytes):
+            try:
+                return indice, await self.processar_pdf_completo(file_bytes, limite_extracao)
+            except Exception as e:
+                return indice, e
+        
+        tarefas = [asyncio.ensure_future(processar(i, arquivo)) for i, arquivo in enumerate(arquivos)]
+        try:
+            for proxima in asyncio.as_completed(tarefas):
+                yield await proxima
+        finally:
+            # Consumidor desistiu (ex.: cliente desconectou): cancela o restante
+            for tarefa in tarefas:
+                tarefa.cancel()
+    
+    def estatisticas(self) -> Dict:
+        """Ocupação do pipeline: PDFs em processamento, limites e pool de extração"""
+        return {
+            "em_andamento": self._em_andamento,
+            "max_concorrencia": self.max_concorrencia,
+            "timeout_extracao_s": self.timeout_extracao,
+            "timeout_ia_s": self.timeout_ia,
+            "extracao": self.pool_extracao.estatisticas(),
+            "extracoes_layout": self.extracoes_layout,
+            "extracoes_ia": self.extracoes_ia,
+            "limiar_layout": self.limiar_layout,
+            "orcamento_tokens": self.orcamento_tokens,
+            "tokens_economizados": self.tokens_economizados,
+            "cache": self.cache_extracao.estatisticas() if self.cache_extracao else None
+        }
 
 
 # Instância singleton do serviço
-ai_service = AIService()
+ai_service = AIService(cache_extracao=CacheExtracaoPDF.do_ambiente())
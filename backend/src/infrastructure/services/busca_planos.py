@@ -0,0 +1,144 @@
+"""
+Busca de Planos
+Índices de bitsets sobre o catálogo para filtrar planos por restrições
+"""
+import re
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .catalogo_precos import SEM_PRECO, CatalogoPrecos, PlanoCatalogo
+
+
+def normalizar_termo(texto: str) -> str:
+    """Forma canônica para comparação: sem acentos, pontuação, espaços e caixa"""
+    sem_acento = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode()
+    return re.sub(r"[^0-9a-z]", "", sem_acento.casefold())
+
+
+class IndiceBuscaPlanos:
+    """
+    Índices em bitsets (np.packbits) sobre os planos do catálogo.
+
+    Para cada hospital da rede, acomodação, modalidade, operadora e
+    abrangência há um bitset com um bit por plano; filtrar é um AND entre
+    bitsets (OR entre operadoras), sem percorrer os planos. Os termos são
+    comparados na forma de normalizar_termo ("Barra D'Or" == "barra dor").
+
+    O índice é montado junto com o snapshot de preços e é imutável.
+    """
+
+    def __init__(self, catalogo: CatalogoPrecos):
+        """
+        Args:
+            catalogo: Catálogo compilado
+        """
+        self.catalogo = catalogo
+        self.quantidade_planos = len(catalogo)
+        planos = catalogo.planos
+
+        self._todos = self._empacotar(np.ones(self.quantidade_planos, dtype=bool))
+        self._nenhum = self._empacotar(np.zeros(self.quantidade_planos, dtype=bool))
+        self._por_hospital = self._indexar(planos, lambda p: p.rede_hospitalar)
+        self._por_acomodacao = self._indexar(planos, lambda p: [p.acomodacao])
+        self._por_modalidade = self._indexar(planos, lambda p: [p.modalidade])
+        self._por_operadora = self._indexar(planos, lambda p: [p.operadora_id, p.operadora_nome])
+        self._por_abrangencia = self._indexar(planos, lambda p: [p.abrangencia])
+
+        coparticipacao = np.array([p.coparticipacao for p in planos], dtype=bool)
+        self._com_coparticipacao = self._empacotar(coparticipacao)
+        self._sem_coparticipacao = self._empacotar(~coparticipacao)
+
+        self._vidas_min = np.array([p.vidas_min for p in planos], dtype=np.int64)
+        self._vidas_max = np.array([p.vidas_max for p in planos], dtype=np.int64)
+
+    @staticmethod
+    def _empacotar(mascara: np.ndarray) -> np.ndarray:
+        """Converte uma máscara booleana em bitset"""
+        bitset = np.packbits(mascara)
+        bitset.setflags(write=False)
+        return bitset
+
+    def _indexar(
+        self,
+        planos: List[PlanoCatalogo],
+        termos: Callable[[PlanoCatalogo], Iterable[str]]
+    ) -> Dict[str, np.ndarray]:
+        """Um bitset por termo normalizado"""
+        mascaras: Dict[str, np.ndarray] = {}
+        for i, plano in enumerate(planos):
+            for termo in termos(plano):
+                chave = normalizar_termo(termo)
+                if chave:
+                    mascaras.setdefault(chave, np.zeros(self.quantidade_planos, dtype=bool))[i] = True
+        return {chave: self._empacotar(mascara) for chave, mascara in mascaras.items()}
+
+    def filtrar(
+        self,
+        quantidade_vidas: int,
+        operadoras: Optional[List[str]] = None,
+        modalidade: Optional[str] = None,
+        acomodacao: Optional[str] = None,
+        coparticipacao: Optional[bool] = None,
+        abrangencia: Optional[str] = None,
+        hospitais: Optional[List[str]] = None
+    ) -> np.ndarray:
+        """
+        Índices dos planos que atendem a todas as restrições
+
+        Args:
+            quantidade_vidas: Vidas da família (vidas_min <= n <= vidas_max)
+            operadoras: Aceita qualquer uma (id ou nome)
+            modalidade: PME, PF ou Adesao
+            acomodacao: Apartamento, Enfermaria ou Ambulatorial
+            coparticipacao: True/False; None = indiferente
+            abrangencia: RJ, Nacional, ...
+            hospitais: Todos devem estar na rede do plano
+
+        Returns:
+            np.ndarray: Índices no catálogo, em ordem crescente
+        """
+        bits = self._todos
+
+        if operadoras:
+            qualquer = self._nenhum
+            for operadora in operadoras:
+                qualquer = qualquer | self._por_operadora.get(normalizar_termo(operadora), self._nenhum)
+            bits = bits & qualquer
+
+        for indice, termo in (
+            (self._por_modalidade, modalidade),
+            (self._por_acomodacao, acomodacao),
+            (self._por_abrangencia, abrangencia),
+        ):
+            if termo:
+                bits = bits & indice.get(normalizar_termo(termo), self._nenhum)
+
+        for hospital in hospitais or []:
+            bits = bits & self._por_hospital.get(normalizar_termo(hospital), self._nenhum)
+
+        if coparticipacao is not None:
+            bits = bits & (self._com_coparticipacao if coparticipacao else self._sem_coparticipacao)
+
+        bits = bits & np.packbits(
+            (self._vidas_min <= quantidade_vidas) & (self._vidas_max >= quantidade_vidas)
+        )
+        return np.flatnonzero(np.unpackbits(bits, count=self.quantidade_planos))
+
+    def precificar(self, indices: np.ndarray, contagem_por_idade: np.ndarray) -> np.ndarray:
+        """
+        Valor total da família em cada plano, em uma única passada
+
+        Args:
+            indices: Planos a precificar
+            contagem_por_idade: Vidas por idade (0-120)
+
+        Returns:
+            np.ndarray: Total em centavos por plano (int64); SEM_PRECO para
+            planos sem preço em alguma faixa da família
+        """
+        precos = self.catalogo.precos_por_idade_centavos[indices]
+        totais = precos @ contagem_por_idade
+        totais[(precos[:, contagem_por_idade > 0] == SEM_PRECO).any(axis=1)] = SEM_PRECO
+        return totais
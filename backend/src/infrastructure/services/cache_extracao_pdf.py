@@ -0,0 +1,260 @@
+"""
+Cache de Extrações de PDF
+Resultados de AIService.processar_pdf_completo endereçados pelo conteúdo
+do PDF, em memória (LRU) e em disco (SQLite), com single-flight
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .cache_lru import CacheLRU
+from .upload_pdf import ConteudoPDF, PDFRecebido
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = "data/cache_extracao_pdf.sqlite3"
+
+# Pipeline de extração: recebe o PDF e o callback de progresso das etapas
+Calcular = Callable[[ConteudoPDF, Callable[[str], None]], Awaitable[Dict]]
+
+
+class _Voo:
+    """Extração em andamento, compartilhada pelos envios simultâneos do mesmo PDF"""
+
+    def __init__(self):
+        self.tarefa: Optional[asyncio.Task] = None
+        self.aguardando = 0
+        self.etapas: List[str] = []
+        self.ouvintes: List[Callable[[str], None]] = []
+
+    def publicar(self, etapa: str):
+        """Repassa a etapa concluída a todos os que aguardam a extração"""
+        self.etapas.append(etapa)
+        for ouvinte in list(self.ouvintes):
+            ouvinte(etapa)
+
+
+class CacheExtracaoPDF:
+    """
+    Cache de extrações na frente do pipeline de PDF.
+
+    A chave é o SHA-256 dos bytes do PDF mais a versão da extração (modelo,
+    prompts e validação): o mesmo arquivo reenviado reaproveita o resultado,
+    e uma mudança de prompt ou de modelo invalida tudo sem apagar nada.
+
+    Camadas:
+    - memória: CacheLRU com as extrações mais recentes;
+    - disco: SQLite (sobrevive a reinícios), limitado em bytes; ao passar
+      do limite saem as entradas acessadas há mais tempo.
+
+    Single-flight: envios simultâneos do mesmo PDF aguardam uma única
+    extração. Ela só é cancelada se todos os que a aguardam desistirem, e
+    retém o arquivo temporário do upload que a iniciou até terminar. Cada
+    etapa concluída chega ao progresso de todos os que a aguardam (quem
+    chega depois recebe primeiro as etapas já concluídas). Erros não são
+    armazenados.
+    """
+
+    def __init__(
+        self,
+        caminho: Optional[str] = CAMINHO_PADRAO,
+        tamanho_memoria: int = 256,
+        tamanho_maximo_disco_bytes: int = 256 * 1024 * 1024
+    ):
+        """
+        Args:
+            caminho: Arquivo SQLite da camada em disco (None = só memória)
+            tamanho_memoria: Extrações mantidas em memória
+            tamanho_maximo_disco_bytes: Limite da camada em disco
+        """
+        self.memoria = CacheLRU(tamanho_maximo=tamanho_memoria, ttl_segundos=None)
+        self.tamanho_maximo_disco_bytes = tamanho_maximo_disco_bytes
+        self._em_voo: Dict[str, _Voo] = {}
+        self._lock_disco = threading.Lock()
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._bytes_disco = 0
+        self.acertos_disco = 0
+        self.compartilhadas = 0
+        self.calculadas = 0
+        self.remocoes_disco = 0
+
+        if caminho:
+            self._abrir_disco(caminho)
+
+    @classmethod
+    def do_ambiente(cls) -> "CacheExtracaoPDF":
+        """Cache configurado por PDF_CACHE_ARQUIVO, PDF_CACHE_TAMANHO_MEMORIA e PDF_CACHE_TAMANHO_DISCO_MB"""
+        return cls(
+            caminho=os.getenv("PDF_CACHE_ARQUIVO", CAMINHO_PADRAO) or None,
+            tamanho_memoria=int(os.getenv("PDF_CACHE_TAMANHO_MEMORIA", "256")),
+            tamanho_maximo_disco_bytes=int(float(os.getenv("PDF_CACHE_TAMANHO_DISCO_MB", "256")) * 1024 * 1024)
+        )
+
+    def _abrir_disco(self, caminho: str):
+        """Abre (ou cria) o SQLite; sem disco utilizável o cache segue só em memória"""
+        try:
+            diretorio = os.path.dirname(caminho)
+            if diretorio:
+                os.makedirs(diretorio, exist_ok=True)
+            conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+            conexao.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extracoes (
+                    chave TEXT PRIMARY KEY,
+                    dados TEXT NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    acessado_em REAL NOT NULL
+                )
+                """
+            )
+            conexao.execute("CREATE INDEX IF NOT EXISTS idx_extracoes_acesso ON extracoes (acessado_em)")
+            self._bytes_disco = conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM extracoes").fetchone()[0]
+            self._conexao = conexao
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Cache de extrações em disco indisponível ({caminho}): {e}")
+
+    @staticmethod
+    def chave(file_bytes: ConteudoPDF, versao_extracao: str) -> str:
+        """Chave endereçada pelo conteúdo: sha256 do PDF + versão da extração"""
+        if isinstance(file_bytes, PDFRecebido):
+            resumo = file_bytes.sha256  # calculado durante o upload
+        else:
+            resumo = hashlib.sha256(file_bytes).hexdigest()
+        return f"{resumo}:{versao_extracao}"
+
+    def _ler_disco(self, chave: str) -> Optional[Dict]:
+        if self._conexao is None:
+            return None
+        with self._lock_disco:
+            linha = self._conexao.execute("SELECT dados FROM extracoes WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                return None
+            self._conexao.execute("UPDATE extracoes SET acessado_em = ? WHERE chave = ?", (time.time(), chave))
+        return json.loads(linha[0])
+
+    def _gravar_disco(self, chave: str, dados: Dict):
+        if self._conexao is None:
+            return
+        conteudo = json.dumps(dados, ensure_ascii=False)
+        tamanho = len(conteudo.encode())
+        if tamanho > self.tamanho_maximo_disco_bytes:
+            return
+        with self._lock_disco:
+            anterior = self._conexao.execute("SELECT tamanho FROM extracoes WHERE chave = ?", (chave,)).fetchone()
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO extracoes (chave, dados, tamanho, acessado_em) VALUES (?, ?, ?, ?)",
+                (chave, conteudo, tamanho, time.time())
+            )
+            self._bytes_disco += tamanho - (anterior[0] if anterior else 0)
+
+            # Remove as menos acessadas até caber no limite
+            while self._bytes_disco > self.tamanho_maximo_disco_bytes:
+                antigas = self._conexao.execute(
+                    "SELECT chave, tamanho FROM extracoes ORDER BY acessado_em LIMIT 64"
+                ).fetchall()
+                for chave_antiga, tamanho_antigo in antigas:
+                    if self._bytes_disco <= self.tamanho_maximo_disco_bytes:
+                        break
+                    self._conexao.execute("DELETE FROM extracoes WHERE chave = ?", (chave_antiga,))
+                    self._bytes_disco -= tamanho_antigo
+                    self.remocoes_disco += 1
+
+    async def obter_ou_calcular(
+        self,
+        file_bytes: ConteudoPDF,
+        versao_extracao: str,
+        calcular: Calcular,
+        progresso: Optional[Callable[[str], None]] = None
+    ) -> Dict:
+        """
+        Retorna a extração em cache ou executa `calcular` (uma vez por PDF,
+        mesmo com envios simultâneos)
+
+        Args:
+            file_bytes: Bytes do PDF ou PDF recebido do upload
+            versao_extracao: Versão da extração (AIService.versao_extracao)
+            calcular: Pipeline de extração, chamado só em caso de falha, com
+                o PDF e um progresso que repassa as etapas a todos os que
+                aguardam
+            progresso: Chamado a cada etapa da extração em andamento; um
+                acerto no cache não passa pelas etapas
+
+        Returns:
+            Dict: Cópia dos dados extraídos
+        """
+        chave = self.chave(file_bytes, versao_extracao)
+
+        dados = self.memoria.obter(chave)
+        if dados is not None:
+            return copy.deepcopy(dados)
+
+        voo = self._em_voo.get(chave)
+        if voo is None:
+            voo = _Voo()
+            voo.tarefa = asyncio.ensure_future(self._calcular(chave, file_bytes, calcular, voo.publicar))
+            self._em_voo[chave] = voo
+            voo.tarefa.add_done_callback(lambda _: self._em_voo.pop(chave, None))
+            if isinstance(file_bytes, PDFRecebido):
+                # A extração é dona do arquivo temporário até terminar, mesmo que quem o enviou desista
+                file_bytes.reter()
+                voo.tarefa.add_done_callback(lambda _: file_bytes.descartar())
+        else:
+            self.compartilhadas += 1
+
+        if progresso is not None:
+            for etapa in voo.etapas:
+                progresso(etapa)
+            voo.ouvintes.append(progresso)
+        voo.aguardando += 1
+        try:
+            dados = await asyncio.shield(voo.tarefa)
+        except asyncio.CancelledError:
+            # Cancela a extração só quando ninguém mais a aguarda
+            if voo.aguardando == 1 and not voo.tarefa.done():
+                voo.tarefa.cancel()
+            raise
+        finally:
+            voo.aguardando -= 1
+            if progresso is not None:
+                voo.ouvintes.remove(progresso)
+        return copy.deepcopy(dados)
+
+    async def _calcular(
+        self, chave: str, file_bytes: ConteudoPDF, calcular: Calcular, progresso: Callable[[str], None]
+    ) -> Dict:
+        dados = await asyncio.to_thread(self._ler_disco, chave)
+        if dados is not None:
+            self.acertos_disco += 1
+        else:
+            dados = await calcular(file_bytes, progresso)
+            self.calculadas += 1
+            await asyncio.to_thread(self._gravar_disco, chave, dados)
+        self.memoria.armazenar(chave, dados)
+        return dados
+
+    def limpar(self):
+        """Remove todas as extrações (memória e disco)"""
+        self.memoria.limpar()
+        if self._conexao is not None:
+            with self._lock_disco:
+                self._conexao.execute("DELETE FROM extracoes")
+                self._bytes_disco = 0
+
+    def estatisticas(self) -> Dict:
+        """Contadores das camadas e do single-flight"""
+        return {
+            "memoria": self.memoria.estatisticas(),
+            "acertos_disco": self.acertos_disco,
+            "compartilhadas": self.compartilhadas,
+            "calculadas": self.calculadas,
+            "disco_ativo": self._conexao is not None,
+            "bytes_disco": self._bytes_disco,
+            "remocoes_disco": self.remocoes_disco
+        }
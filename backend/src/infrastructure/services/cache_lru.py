@@ -0,0 +1,97 @@
+"""
+Cache LRU com TTL
+Cache em memória limitado por quantidade de entradas e por tempo de vida
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class CacheLRU:
+    """
+    Cache LRU em memória com expiração por TTL.
+
+    Mantém contadores de acertos, falhas, remoções por capacidade,
+    expirações e invalidações para exposição em endpoints de métricas.
+    """
+
+    def __init__(
+        self,
+        tamanho_maximo: int = 10000,
+        ttl_segundos: Optional[float] = 300,
+        relogio: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            tamanho_maximo: Quantidade máxima de entradas
+            ttl_segundos: Tempo de vida de cada entrada (None = sem expiração)
+            relogio: Fonte de tempo (monotônica); injetável para testes
+        """
+        if tamanho_maximo < 1:
+            raise ValueError("tamanho_maximo deve ser pelo menos 1")
+
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_segundos = ttl_segundos
+        self._relogio = relogio
+        self._entradas: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self.expiracoes = 0
+        self.invalidacoes = 0
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def obter(self, chave: Hashable) -> Optional[Any]:
+        """Retorna o valor da chave (ou None), atualizando a ordem de uso"""
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            self.falhas += 1
+            return None
+
+        valor, expira_em = entrada
+        if expira_em is not None and self._relogio() >= expira_em:
+            del self._entradas[chave]
+            self.expiracoes += 1
+            self.falhas += 1
+            return None
+
+        self._entradas.move_to_end(chave)
+        self.acertos += 1
+        return valor
+
+    def armazenar(self, chave: Hashable, valor: Any):
+        """Armazena o valor, removendo a entrada menos usada se necessário"""
+        expira_em = self._relogio() + self.ttl_segundos if self.ttl_segundos else None
+        self._entradas[chave] = (valor, expira_em)
+        self._entradas.move_to_end(chave)
+
+        while len(self._entradas) > self.tamanho_maximo:
+            self._entradas.popitem(last=False)
+            self.remocoes += 1
+
+    def remover(self, chave: Hashable) -> bool:
+        """Remove uma entrada específica"""
+        return self._entradas.pop(chave, None) is not None
+
+    def limpar(self):
+        """Invalida todas as entradas"""
+        if self._entradas:
+            self.invalidacoes += 1
+        self._entradas.clear()
+
+    def estatisticas(self) -> Dict:
+        """Contadores do cache"""
+        consultas = self.acertos + self.falhas
+        return {
+            "entradas": len(self._entradas),
+            "tamanho_maximo": self.tamanho_maximo,
+            "ttl_segundos": self.ttl_segundos,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0,
+            "remocoes": self.remocoes,
+            "expiracoes": self.expiracoes,
+            "invalidacoes": self.invalidacoes
+        }
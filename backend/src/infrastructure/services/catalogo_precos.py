@@ -0,0 +1,345 @@
+"""
+Catálogo de Preços
+Índice compilado em memória dos planos reais (planos_operadora) e de seus
+preços por faixa etária ANS (precos_faixa)
+"""
+import csv
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ...domain.value_objects.centavos import para_centavos
+from .paginacao_supabase import ler_todas_as_paginas
+
+logger = logging.getLogger(__name__)
+
+IDADE_MAXIMA = 120
+SEM_PRECO = -1  # Sentinela para faixa sem preço no plano
+
+CAMINHO_SNAPSHOT_PADRAO = Path(__file__).resolve().parents[3] / "data" / "catalogo_precos.json"
+
+_REGEX_FAIXA = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+)|\+)\s*$")
+
+
+def interpretar_faixa_etaria(rotulo: str) -> Tuple[int, int]:
+    """
+    Converte o rótulo textual de uma faixa ANS em limites de idade
+
+    Args:
+        rotulo: Faixa no formato "19-23" ou "59+"
+
+    Returns:
+        Tuple (idade_inicio, idade_fim), ambos inclusivos
+    """
+    match = _REGEX_FAIXA.match(rotulo or "")
+    if not match:
+        raise ValueError(f"Faixa etária inválida: {rotulo!r}")
+
+    inicio = int(match.group(1))
+    fim = int(match.group(2)) if match.group(2) else IDADE_MAXIMA
+    if fim < inicio:
+        raise ValueError(f"Faixa etária inválida: {rotulo!r}")
+    return inicio, fim
+
+
+@dataclass(frozen=True)
+class PlanoCatalogo:
+    """Plano de uma operadora, como cadastrado em planos_operadora"""
+    id: str
+    operadora_id: str
+    operadora_nome: str
+    plano_nome: str
+    modalidade: str  # PME, PF, Adesao
+    acomodacao: str  # Apartamento, Enfermaria, Ambulatorial
+    coparticipacao: bool = False
+    coparticipacao_pct: float = 0.0
+    abrangencia: str = "RJ"
+    vidas_min: int = 1
+    vidas_max: int = 99
+    rede_hospitalar: Tuple[str, ...] = field(default_factory=tuple)
+    notas: Optional[str] = None
+
+    @property
+    def chave(self) -> Tuple[str, str, str, bool]:
+        """Chave do índice: operadora/modalidade/acomodação/coparticipação"""
+        return chave_catalogo(self.operadora_id, self.modalidade, self.acomodacao, self.coparticipacao)
+
+
+def chave_catalogo(
+    operadora_id: str,
+    modalidade: str,
+    acomodacao: str,
+    coparticipacao: bool
+) -> Tuple[str, str, str, bool]:
+    """Normaliza a chave do índice do catálogo"""
+    return (operadora_id.upper(), modalidade.upper(), acomodacao.upper(), bool(coparticipacao))
+
+
+class CatalogoPrecos:
+    """
+    Índice compilado do catálogo de planos.
+
+    As faixas etárias textuais são convertidas em uma tabela ordenada de
+    limites inferiores (`limites_faixa`), pesquisável por busca binária.
+    Cada plano vira uma linha de preços em centavos por faixa e, a partir
+    dela, uma linha densa indexada por idade (0-120), de modo que cotar uma
+    família é um único gather.
+    """
+
+    def __init__(self, planos: List[PlanoCatalogo], precos: Dict[str, List[Tuple[str, int, str]]]):
+        """
+        Args:
+            planos: Planos ativos do catálogo
+            precos: Por id de plano, lista de (faixa_etaria, faixa_ordem, valor)
+        """
+        self.planos = list(planos)
+        self._compilar(precos)
+
+    def _compilar(self, precos: Dict[str, List[Tuple[str, int, str]]]):
+        """Compila tabela de faixas, matriz de preços e índices de busca"""
+        faixas_por_plano = []
+        limites = {0}
+        rotulos = {}
+        for plano in self.planos:
+            faixas = []
+            for rotulo, ordem, valor in sorted(precos.get(plano.id, []), key=lambda f: f[1]):
+                inicio, fim = interpretar_faixa_etaria(rotulo)
+                faixas.append((inicio, fim, para_centavos(valor)))
+                limites.add(inicio)
+                if fim < IDADE_MAXIMA:
+                    limites.add(fim + 1)
+                rotulos.setdefault(inicio, rotulo)
+            faixas_por_plano.append(faixas)
+
+        # Tabela de limites: a faixa i cobre [limites_faixa[i], limites_faixa[i + 1])
+        self.limites_faixa = np.array(sorted(limites), dtype=np.int64)
+        self.limites_faixa.setflags(write=False)
+        self.rotulos_faixa = [
+            rotulos.get(int(inicio), self._rotulo_padrao(i)) for i, inicio in enumerate(self.limites_faixa)
+        ]
+
+        n_faixas = len(self.limites_faixa)
+        matriz = np.full((len(self.planos), n_faixas), SEM_PRECO, dtype=np.int64)
+        for i, faixas in enumerate(faixas_por_plano):
+            for inicio, fim, centavos in faixas:
+                primeira = self.faixa_da_idade(inicio)
+                ultima = self.faixa_da_idade(fim)
+                matriz[i, primeira:ultima + 1] = centavos
+        matriz.setflags(write=False)
+        self.precos_faixa_centavos = matriz
+
+        por_idade = matriz[:, self.faixas_das_idades(np.arange(IDADE_MAXIMA + 1))]
+        por_idade.setflags(write=False)
+        self.precos_por_idade_centavos = por_idade
+
+        self._por_chave: Dict[Tuple[str, str, str, bool], List[int]] = {}
+        self._por_nome: Dict[Tuple[str, str], int] = {}
+        self._por_id: Dict[str, int] = {}
+        for i, plano in enumerate(self.planos):
+            self._por_id[plano.id.casefold()] = i
+            self._por_chave.setdefault(plano.chave, []).append(i)
+            self._por_nome[(plano.operadora_id.upper(), plano.plano_nome.casefold())] = i
+            self._por_nome[(plano.operadora_id.upper(), plano.id.casefold())] = i
+
+    def _rotulo_padrao(self, indice: int) -> str:
+        """Rótulo de uma faixa que não aparece textualmente em nenhum plano"""
+        inicio = int(self.limites_faixa[indice])
+        if indice + 1 < len(self.limites_faixa):
+            return f"{inicio}-{int(self.limites_faixa[indice + 1]) - 1}"
+        return f"{inicio}+"
+
+    def __len__(self) -> int:
+        return len(self.planos)
+
+    def faixa_da_idade(self, idade: int) -> int:
+        """Índice da faixa que contém a idade (busca binária)"""
+        return int(np.searchsorted(self.limites_faixa, idade, side='right')) - 1
+
+    def faixas_das_idades(self, idades: np.ndarray) -> np.ndarray:
+        """Versão vetorizada de faixa_da_idade"""
+        return np.searchsorted(self.limites_faixa, idades, side='right') - 1
+
+    def buscar(
+        self,
+        operadora_id: Optional[str] = None,
+        modalidade: Optional[str] = None,
+        acomodacao: Optional[str] = None,
+        coparticipacao: Optional[bool] = None
+    ) -> List[int]:
+        """
+        Índices dos planos que atendem à chave informada.
+        Campos omitidos funcionam como curinga.
+        """
+        filtro = (
+            operadora_id.upper() if operadora_id else None,
+            modalidade.upper() if modalidade else None,
+            acomodacao.upper() if acomodacao else None,
+            coparticipacao
+        )
+        if None not in filtro:
+            return list(self._por_chave.get(filtro, []))
+
+        indices = []
+        for chave, planos in self._por_chave.items():
+            if all(f is None or f == c for f, c in zip(filtro, chave)):
+                indices.extend(planos)
+        return sorted(indices)
+
+    def indice_plano(self, operadora: str, plano: Optional[str]) -> Optional[int]:
+        """Resolve um plano pelo nome ou id dentro da operadora (None se não existir)"""
+        if not plano:
+            return None
+        return self._por_nome.get((operadora.upper(), plano.casefold()))
+
+    def indice_por_id(self, plano_id: str) -> Optional[int]:
+        """Resolve um plano pelo id, sem depender da operadora (None se não existir)"""
+        return self._por_id.get(plano_id.casefold())
+
+    def calcular_centavos(self, indice_plano: int, idades: np.ndarray) -> np.ndarray:
+        """
+        Calcula o valor de cada beneficiário em um plano do catálogo
+
+        Args:
+            indice_plano: Índice do plano (ver buscar/indice_plano)
+            idades: Idades dos beneficiários
+
+        Returns:
+            np.ndarray: Valores em centavos (int64), alinhados a idades
+        """
+        valores = self.precos_por_idade_centavos[indice_plano, idades]
+        if (valores == SEM_PRECO).any():
+            idade = int(np.asarray(idades)[valores == SEM_PRECO][0])
+            raise ValueError(
+                f"Plano {self.planos[indice_plano].plano_nome} não possui preço para a idade {idade}"
+            )
+        return valores
+
+    @classmethod
+    def de_registros(cls, registros: Iterable[Dict]) -> "CatalogoPrecos":
+        """
+        Monta o catálogo a partir de registros no formato de
+        `select('*, precos_faixa(*)')` em planos_operadora
+        """
+        planos = []
+        precos = {}
+        for registro in registros:
+            if registro.get("ativo", True) is False:
+                continue
+
+            plano = PlanoCatalogo(
+                id=str(registro["id"]),
+                operadora_id=registro["operadora_id"],
+                operadora_nome=registro.get("operadora_nome") or registro["operadora_id"],
+                plano_nome=registro["plano_nome"],
+                modalidade=registro["modalidade"],
+                acomodacao=registro.get("acomodacao") or "Apartamento",
+                coparticipacao=bool(registro.get("coparticipacao")),
+                coparticipacao_pct=float(registro.get("coparticipacao_pct") or 0),
+                abrangencia=registro.get("abrangencia") or "RJ",
+                vidas_min=int(registro.get("vidas_min") or 1),
+                vidas_max=int(registro.get("vidas_max") or 99),
+                rede_hospitalar=tuple(registro.get("rede_hospitalar") or ()),
+                notas=registro.get("notas")
+            )
+            planos.append(plano)
+            precos[plano.id] = [
+                (f["faixa_etaria"], int(f.get("faixa_ordem") or 0), str(f["valor"]))
+                for f in registro.get("precos_faixa") or []
+            ]
+
+        return cls(planos, precos)
+
+
+def _ler_snapshot_csv(caminho: Path) -> List[Dict]:
+    """
+    Lê um snapshot CSV com uma linha por (plano, faixa), nas colunas do RPC
+    get_precos_operadora. rede_hospitalar usa "|" como separador.
+    """
+    registros: Dict[str, Dict] = {}
+    with open(caminho, newline="", encoding="utf-8") as arquivo:
+        for linha in csv.DictReader(arquivo):
+            plano_id = linha.get("plano_id") or linha.get("id")
+            registro = registros.get(plano_id)
+            if registro is None:
+                registro = {
+                    "id": plano_id,
+                    "operadora_id": linha["operadora_id"],
+                    "operadora_nome": linha.get("operadora_nome"),
+                    "plano_nome": linha["plano_nome"],
+                    "modalidade": linha["modalidade"],
+                    "acomodacao": linha.get("acomodacao"),
+                    "coparticipacao": (linha.get("coparticipacao") or "").lower() in ("true", "t", "1"),
+                    "coparticipacao_pct": linha.get("coparticipacao_pct") or 0,
+                    "abrangencia": linha.get("abrangencia"),
+                    "vidas_min": linha.get("vidas_min"),
+                    "vidas_max": linha.get("vidas_max"),
+                    "rede_hospitalar": [h for h in (linha.get("rede_hospitalar") or "").split("|") if h],
+                    "notas": linha.get("notas"),
+                    "precos_faixa": []
+                }
+                registros[plano_id] = registro
+            registro["precos_faixa"].append({
+                "faixa_etaria": linha["faixa_etaria"],
+                "faixa_ordem": linha.get("faixa_ordem"),
+                "valor": linha["valor"]
+            })
+    return list(registros.values())
+
+
+def ler_snapshot(caminho: Path) -> List[Dict]:
+    """Lê os registros de um snapshot local do catálogo (JSON ou CSV)"""
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == ".csv":
+        return _ler_snapshot_csv(caminho)
+
+    with open(caminho, encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    return dados["planos"] if isinstance(dados, dict) else dados
+
+
+def carregar_catalogo_precos(
+    supabase_client=None,
+    caminho_snapshot: Optional[str] = None
+) -> Optional[CatalogoPrecos]:
+    """
+    Carrega o catálogo uma única vez: do banco quando há conexão com o
+    Supabase, senão do snapshot local (CATALOGO_PRECOS_SNAPSHOT).
+
+    Returns:
+        CatalogoPrecos compilado, ou None se nenhuma fonte estiver disponível
+    """
+    if supabase_client is not None:
+        try:
+            registros = ler_todas_as_paginas(
+                lambda: supabase_client.table("planos_operadora")
+                .select("*, precos_faixa(*)")
+                .eq("ativo", True)
+                .order("id")
+            )
+            catalogo = CatalogoPrecos.de_registros(registros)
+            logger.info(
+                f"✅ Catálogo de preços carregado do banco: {len(registros)} registros, {len(catalogo)} planos"
+            )
+            return catalogo
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar catálogo do banco, usando snapshot: {e}")
+
+    caminho = Path(caminho_snapshot or os.getenv("CATALOGO_PRECOS_SNAPSHOT") or CAMINHO_SNAPSHOT_PADRAO)
+    if not caminho.exists():
+        logger.warning(f"⚠️ Catálogo de preços indisponível: snapshot {caminho} não encontrado")
+        return None
+
+    try:
+        catalogo = CatalogoPrecos.de_registros(ler_snapshot(caminho))
+    except Exception as e:
+        logger.error(f"❌ Erro ao ler snapshot do catálogo {caminho}: {e}")
+        return None
+
+    logger.info(f"✅ Catálogo de preços carregado do snapshot: {len(catalogo)} planos")
+    return catalogo
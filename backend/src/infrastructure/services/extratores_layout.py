@@ -0,0 +1,321 @@
+"""
+Extratores por Layout
+Leitura determinística (âncoras e regex) dos PDFs das operadoras com layout
+conhecido, antes de recorrer à IA
+"""
+import hashlib
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ...domain.entities.cotacao import IDADE_MAXIMA
+from .pool_extracao_pdf import SEPARADOR_PAGINAS
+
+# Peso de cada campo na confiança do resultado (soma 1). Sem idades ou sem
+# valor o resultado não passa do limiar padrão e o PDF vai para a IA
+PESOS_CAMPOS = {"operadora": 0.3, "idades": 0.35, "valor_atual": 0.25, "tipo_plano": 0.1}
+
+# Os campos das propostas e faturas ficam nas primeiras páginas; ler só o
+# início mantém o custo constante (e baixo, no event loop) em PDFs longos
+LIMITE_CARACTERES = 20_000
+
+# Incrementar ao mudar a leitura (expressões, cálculo de idades): invalida as extrações em cache
+VERSAO_LEITURA = 2
+
+# Valor monetário no formato brasileiro (R$ 1.250,50)
+_VALOR = r"R\$\s*(\d{1,3}(?:\.\d{3})*,\d{2})"
+_DATA = r"(\d{2})/(\d{2})/(\d{4})"
+
+# Datas de nascimento (ISO) de idades calculadas na data de hoje, por falta da
+# data de emissão; com elas as idades são recalculadas ao entregar a extração
+CAMPO_DATAS_NASCIMENTO = "datas_nascimento"
+
+ANCORAS_IDADE = (r"idade",)
+ANCORAS_NASCIMENTO = (r"data de nascimento", r"dt\.? ?nasc\.?", r"nascimento")
+ANCORAS_EMISSAO = (r"data de emiss[aã]o", r"emitid[oa] em", r"data da proposta")
+ANCORAS_BENEFICIARIO = (r"benefici[aá]rio(?: titular)?", r"titular", r"dependente", r"nome do benefici[aá]rio")
+
+# Tipo de contratação: PME antes de EMPRESARIAL ("Coletivo Empresarial PME")
+_TIPOS_PLANO = (
+    ("ADESAO", re.compile(r"ades[aã]o", re.IGNORECASE)),
+    ("PME", re.compile(r"\bPME\b|pequenas e m[eé]dias empresas", re.IGNORECASE)),
+    ("EMPRESARIAL", re.compile(r"empresarial", re.IGNORECASE)),
+)
+
+# Fim do nome de um beneficiário na linha: número, data, dois espaços ou outra âncora
+_FIM_NOME = re.compile(r"\s{2,}|\d|\b(?:idade|nasc|cpf|data|sexo|parentesco)\b", re.IGNORECASE)
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas e sem acentos, para a busca de palavras-chave"""
+    sem_acento = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return sem_acento.lower()
+
+
+def _para_float(valor: str) -> float:
+    """'1.250,50' -> 1250.5"""
+    return float(valor.replace(".", "").replace(",", "."))
+
+
+def _idade_em(nascimento: date, referencia: date) -> int:
+    return referencia.year - nascimento.year - ((referencia.month, referencia.day) < (nascimento.month, nascimento.day))
+
+
+def idades_na_data(nascimentos: Sequence[date], referencia: date) -> List[int]:
+    """Idades em `referencia`, só as válidas (0 a IDADE_MAXIMA)"""
+    idades = [_idade_em(nascimento, referencia) for nascimento in nascimentos]
+    return [idade for idade in idades if 0 <= idade <= IDADE_MAXIMA]
+
+
+def _data(dia: str, mes: str, ano: str) -> Optional[date]:
+    try:
+        return date(int(ano), int(mes), int(dia))
+    except ValueError:
+        return None
+
+
+def _compilar_ancoras(ancoras: Sequence[str], sufixo: str) -> "re.Pattern":
+    # \b: "idade" não casa dentro de "Quantidade" ou "Validade"
+    return re.compile(rf"\b(?:{'|'.join(ancoras)})\s*:?\s*{sufixo}", re.IGNORECASE)
+
+
+@dataclass
+class ResultadoLayout:
+    """Dados lidos por um extrator de layout e a confiança (0 a 1) neles"""
+    operadora: str
+    dados: Dict
+    confianca: float
+
+
+class ExtratorLayout:
+    """
+    Regras de leitura do layout de uma operadora.
+
+    As âncoras são expressões regulares (sem grupos de captura) que
+    precedem o dado na linha. As de valor são testadas na ordem dada: a
+    primeira que casar vence, então o total da família vem antes da
+    mensalidade individual. Idades vêm das âncoras de idade ou, na falta
+    delas, das datas de nascimento (na data de emissão do documento, ou
+    hoje se ela não aparece; nesse caso as datas seguem no resultado, para
+    as idades serem recalculadas no dia em que a extração é entregue).
+    """
+
+    def __init__(
+        self,
+        operadora: str,
+        palavras_chave: Sequence[str],
+        ancoras_valor: Sequence[str],
+        ancoras_idade: Sequence[str] = ANCORAS_IDADE,
+        ancoras_nascimento: Sequence[str] = ANCORAS_NASCIMENTO,
+        ancoras_emissao: Sequence[str] = ANCORAS_EMISSAO,
+        ancoras_beneficiario: Sequence[str] = ANCORAS_BENEFICIARIO
+    ):
+        """
+        Args:
+            operadora: Nome normalizado (como em Operadora)
+            palavras_chave: Termos que identificam a operadora no texto
+                (comparados sem acento e em minúsculas)
+            ancoras_valor: Rótulos do valor mensal, em ordem de preferência
+            ancoras_idade: Rótulos de idade
+            ancoras_nascimento: Rótulos de data de nascimento
+            ancoras_emissao: Rótulos da data do documento
+            ancoras_beneficiario: Rótulos dos nomes dos beneficiários
+        """
+        self.operadora = operadora
+        self.palavras_chave = tuple(normalizar_texto(palavra) for palavra in palavras_chave)
+        self._valores = [
+            re.compile(rf"\b(?:{ancora})[^\n\d]{{0,40}}?{_VALOR}", re.IGNORECASE) for ancora in ancoras_valor
+        ]
+        self._idade = _compilar_ancoras(ancoras_idade, r"(\d{1,3})\b(?!/)")
+        self._nascimento = _compilar_ancoras(ancoras_nascimento, _DATA)
+        self._emissao = _compilar_ancoras(ancoras_emissao, _DATA)
+        self._beneficiario = _compilar_ancoras(ancoras_beneficiario, r"([^\n:]+)")
+        self.assinatura = "|".join(
+            [operadora, *self.palavras_chave, *ancoras_valor, *ancoras_idade,
+             *ancoras_nascimento, *ancoras_emissao, *ancoras_beneficiario]
+        )
+
+    def _idades(self, texto: str) -> Tuple[List[int], List[date]]:
+        """
+        Returns:
+            (idades, datas de nascimento se as idades foram calculadas na
+            data de hoje; vazia se vieram do texto ou da data de emissão)
+        """
+        idades = [int(idade) for idade in self._idade.findall(texto)]
+        if idades:
+            return [idade for idade in idades if 0 <= idade <= IDADE_MAXIMA], []
+        emissao = self._emissao.search(texto)
+        referencia = _data(*emissao.groups()) if emissao else None
+        nascimentos = [data for data in (_data(*grupos) for grupos in self._nascimento.findall(texto)) if data]
+        if referencia is not None:
+            return idades_na_data(nascimentos, referencia), []
+        return idades_na_data(nascimentos, date.today()), nascimentos
+
+    def _valor(self, texto: str) -> Optional[float]:
+        for padrao in self._valores:
+            encontrado = padrao.search(texto)
+            if encontrado:
+                return _para_float(encontrado.group(1))
+        return None
+
+    def _beneficiarios(self, texto: str) -> List[str]:
+        nomes = []
+        for trecho in self._beneficiario.findall(texto):
+            nome = _FIM_NOME.split(trecho, maxsplit=1)[0].strip(" -").title()
+            if len(nome.split()) >= 2 and nome not in nomes:
+                nomes.append(nome)
+        return nomes
+
+    def extrair(self, texto: str) -> Dict:
+        """
+        Lê os campos do texto do PDF
+
+        Returns:
+            Dict: Campos no formato de AIService._validar_dados_extraidos
+                (os não encontrados ficam vazios) e, com idades calculadas
+                na data de hoje, CAMPO_DATAS_NASCIMENTO
+        """
+        tipo_plano = next((tipo for tipo, padrao in _TIPOS_PLANO if padrao.search(texto)), None)
+        idades, nascimentos = self._idades(texto)
+        dados = {
+            "idades": idades,
+            "operadora": self.operadora,
+            "valor_atual": self._valor(texto),
+            "tipo_plano": tipo_plano,
+            "nome_beneficiarios": self._beneficiarios(texto),
+        }
+        if nascimentos:
+            dados[CAMPO_DATAS_NASCIMENTO] = [nascimento.isoformat() for nascimento in nascimentos]
+        return dados
+
+
+class RegistroExtratoresLayout:
+    """
+    Extratores de layout por operadora, com detecção da operadora por um
+    índice de palavras-chave.
+
+    Todas as palavras-chave entram em uma única expressão regular; a
+    operadora com mais ocorrências no texto escolhe o extrator. A confiança
+    é a soma dos pesos dos campos encontrados multiplicada pela parcela da
+    operadora no total de ocorrências: um documento que cita duas
+    operadoras por igual (ex.: uma proposta de portabilidade) fica abaixo
+    do limiar e vai para a IA.
+    """
+
+    def __init__(self, extratores: Sequence[ExtratorLayout] = ()):
+        self._extratores: Dict[str, ExtratorLayout] = {}
+        self._indice: Dict[str, str] = {}
+        self._palavras: Optional["re.Pattern"] = None
+        for extrator in extratores:
+            self.registrar(extrator)
+
+    def registrar(self, extrator: ExtratorLayout):
+        """Adiciona (ou substitui) o extrator da operadora"""
+        self._extratores[extrator.operadora] = extrator
+        self._indice = {
+            palavra: operadora
+            for operadora, registrado in self._extratores.items()
+            for palavra in registrado.palavras_chave
+        }
+        # Termos mais longos primeiro: "bradesco saude" antes de "bradesco"
+        termos = sorted(self._indice, key=len, reverse=True)
+        self._palavras = re.compile(rf"\b(?:{'|'.join(map(re.escape, termos))})\b")
+
+    @property
+    def operadoras(self) -> List[str]:
+        return list(self._extratores)
+
+    @property
+    def versao(self) -> str:
+        """Muda com qualquer regra registrada (entra na versão da extração do cache)"""
+        assinaturas = sorted(extrator.assinatura for extrator in self._extratores.values())
+        return hashlib.sha256("\n".join([str(VERSAO_LEITURA), *assinaturas]).encode()).hexdigest()[:12]
+
+    def detectar_operadora(self, texto: str) -> Optional[Tuple[str, float]]:
+        """
+        Returns:
+            (operadora, parcela das ocorrências de palavras-chave), ou None
+        """
+        if self._palavras is None:
+            return None
+        contagem: Dict[str, int] = {}
+        for palavra in self._palavras.findall(normalizar_texto(texto)):
+            operadora = self._indice[palavra]
+            contagem[operadora] = contagem.get(operadora, 0) + 1
+        if not contagem:
+            return None
+        operadora = max(contagem, key=contagem.get)
+        return operadora, contagem[operadora] / sum(contagem.values())
+
+    def extrair(self, texto: str) -> Optional[ResultadoLayout]:
+        """
+        Aplica o extrator da operadora detectada nos primeiros
+        LIMITE_CARACTERES do texto
+
+        Returns:
+            ResultadoLayout, ou None se nenhuma operadora registrada aparece
+        """
+        texto = texto[:LIMITE_CARACTERES]
+        detectada = self.detectar_operadora(texto)
+        if detectada is None:
+            return None
+        operadora, parcela = detectada
+        dados = self._extratores[operadora].extrair(texto)
+        campos = sum(peso for campo, peso in PESOS_CAMPOS.items() if dados[campo])
+        confianca = campos * parcela
+        return ResultadoLayout(operadora=operadora, dados=dados, confianca=round(confianca, 4))
+
+    def campos_completos(self, paginas: Sequence[str], limiar: float) -> bool:
+        """
+        Critério de parada da extração página a página (CriterioParada):
+        o extrator confia nos campos das páginas lidas (>= limiar) e a
+        última página não traz idades, ou seja, a lista de beneficiários
+        já terminou
+
+        Os campos vêm dos primeiros LIMITE_CARACTERES; com as páginas
+        anteriores já além disso o resultado não muda mais, e a leitura
+        segue até o fim sem reavaliar.
+        """
+        if sum(len(pagina) for pagina in paginas[:-1]) >= LIMITE_CARACTERES:
+            return False
+        resultado = self.extrair(SEPARADOR_PAGINAS.join(paginas))
+        if resultado is None or resultado.confianca < limiar:
+            return False
+        idades, _ = self._extratores[resultado.operadora]._idades(paginas[-1])
+        return not idades
+
+
+def criar_registro_padrao() -> RegistroExtratoresLayout:
+    """Extratores dos layouts de proposta e fatura das operadoras mais frequentes"""
+    return RegistroExtratoresLayout([
+        ExtratorLayout(
+            "AMIL",
+            palavras_chave=["amil", "amil assistencia medica", "amil saude"],
+            ancoras_valor=[
+                r"valor total (?:da proposta|mensal)", r"total a pagar", r"valor mensal", r"mensalidade"
+            ],
+        ),
+        ExtratorLayout(
+            "BRADESCO",
+            palavras_chave=["bradesco saude", "bradesco seguros", "bradesco"],
+            ancoras_valor=[
+                r"pr[eê]mio total", r"total a pagar", r"pr[eê]mio mensal", r"valor do pr[eê]mio", r"mensalidade"
+            ],
+        ),
+        ExtratorLayout(
+            "SULAMERICA",
+            palavras_chave=["sulamerica", "sul america", "sulamerica saude"],
+            ancoras_valor=[
+                r"total mensal", r"total a pagar", r"valor da mensalidade", r"mensalidade"
+            ],
+        ),
+        ExtratorLayout(
+            "UNIMED",
+            palavras_chave=["unimed"],
+            ancoras_valor=[
+                r"total da fatura", r"valor total", r"total a pagar", r"valor da mensalidade", r"mensalidade"
+            ],
+        ),
+    ])
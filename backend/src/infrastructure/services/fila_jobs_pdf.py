@@ -0,0 +1,331 @@
+"""
+Fila de Jobs de PDF
+Processamento assíncrono de PDFs: o envio devolve um id na hora, workers
+asyncio consomem uma tabela SQLite e o progresso de cada job é publicado
+aos assinantes
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from .pool_extracao_pdf import ExtracaoSaturadaError
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = "data/jobs_pdf.sqlite3"
+
+STATUS_PENDENTE = "pendente"
+STATUS_PROCESSANDO = "processando"
+STATUS_CONCLUIDO = "concluido"
+STATUS_ERRO = "erro"
+STATUS_FINAIS = (STATUS_CONCLUIDO, STATUS_ERRO)
+
+# Intervalo máximo (segundos) entre as remoções de jobs expirados
+INTERVALO_LIMPEZA_MAXIMO = 3600
+
+# Colunas devolvidas ao cliente (o PDF fica só no banco)
+COLUNAS_JOB = "id, arquivo, status, etapa, resultado, erro, tentativas, criado_em, atualizado_em"
+
+ProcessarPDF = Callable[..., Awaitable[Dict]]
+
+
+class FilaJobsPDF:
+    """
+    Fila de extrações de PDF persistida em SQLite, sem broker externo.
+
+    `enviar` grava o PDF na tabela `jobs` e retorna na hora; `workers`
+    tarefas asyncio reservam os jobs pendentes (o mais antigo primeiro) e
+    chamam `processar(pdf, progresso=...)`, que informa cada etapa
+    concluída. Cada mudança de status ou etapa é gravada e publicada para
+    quem acompanha o job em `eventos`.
+
+    Reinício: jobs que estavam em processamento voltam a pendente em
+    `iniciar`. Um job interrompido `max_tentativas` vezes (ex.: um PDF que
+    derruba o processo) vai para erro em vez de voltar à fila. Com o pool
+    de extração saturado, o job volta à fila e o worker aguarda o
+    Retry-After.
+
+    Jobs finalizados ficam disponíveis por `retencao_segundos`; o PDF é
+    apagado assim que o job termina. Uma tarefa de limpeza remove os
+    expirados periodicamente, e `obter` já não os devolve antes disso.
+    """
+
+    def __init__(
+        self,
+        processar: ProcessarPDF,
+        caminho: str = CAMINHO_PADRAO,
+        workers: int = 2,
+        max_tentativas: int = 3,
+        retencao_segundos: float = 24 * 3600
+    ):
+        """
+        Args:
+            processar: Pipeline de extração (AIService.processar_pdf_completo)
+            caminho: Arquivo SQLite da fila
+            workers: Jobs processados ao mesmo tempo
+            max_tentativas: Interrupções toleradas por job
+            retencao_segundos: Tempo que um job finalizado fica consultável
+        """
+        self.processar = processar
+        self.workers = workers
+        self.max_tentativas = max_tentativas
+        self.retencao_segundos = retencao_segundos
+        self._lock = threading.Lock()
+        self._novo = asyncio.Event()
+        self._tarefas: List[asyncio.Task] = []
+        self._limpeza: Optional[asyncio.Task] = None
+        self._assinantes: Dict[str, Set[asyncio.Queue]] = {}
+
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conexao.row_factory = sqlite3.Row
+        # WAL sem fsync a cada commit: as atualizações de etapa são gravadas no event loop
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                arquivo TEXT NOT NULL,
+                status TEXT NOT NULL,
+                etapa TEXT,
+                pdf BLOB,
+                resultado TEXT,
+                erro TEXT,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                criado_em REAL NOT NULL,
+                atualizado_em REAL NOT NULL
+            )
+            """
+        )
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, criado_em)")
+
+    @classmethod
+    def do_ambiente(cls, processar: ProcessarPDF) -> "FilaJobsPDF":
+        """Fila configurada por PDF_JOBS_ARQUIVO, PDF_JOBS_WORKERS e PDF_JOBS_RETENCAO_HORAS"""
+        return cls(
+            processar,
+            caminho=os.getenv("PDF_JOBS_ARQUIVO", CAMINHO_PADRAO),
+            workers=int(os.getenv("PDF_JOBS_WORKERS", "2")),
+            retencao_segundos=float(os.getenv("PDF_JOBS_RETENCAO_HORAS", "24")) * 3600
+        )
+
+    @staticmethod
+    def _job(linha: sqlite3.Row) -> Dict:
+        job = dict(linha)
+        job["resultado"] = json.loads(job["resultado"]) if job["resultado"] else None
+        return job
+
+    def _executar_sql(self, sql: str, parametros: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conexao.execute(sql, parametros).fetchall()
+
+    def _obter(self, job_id: str) -> Optional[Dict]:
+        linhas = self._executar_sql(
+            f"SELECT {COLUNAS_JOB} FROM jobs WHERE id = ? "
+            f"AND NOT (status IN ({', '.join('?' * len(STATUS_FINAIS))}) AND atualizado_em < ?)",
+            (job_id, *STATUS_FINAIS, time.time() - self.retencao_segundos)
+        )
+        return self._job(linhas[0]) if linhas else None
+
+    def _atualizar(self, job_id: str, **campos) -> Optional[Dict]:
+        """Grava os campos e publica o novo estado do job"""
+        campos["atualizado_em"] = time.time()
+        atribuicoes = ", ".join(f"{campo} = ?" for campo in campos)
+        linhas = self._executar_sql(
+            f"UPDATE jobs SET {atribuicoes} WHERE id = ? RETURNING {COLUNAS_JOB}",
+            (*campos.values(), job_id)
+        )
+        if not linhas:
+            return None
+        job = self._job(linhas[0])
+        self._publicar(job)
+        return job
+
+    def _publicar(self, job: Dict):
+        """Entrega o estado do job aos assinantes (no event loop)"""
+        for fila in self._assinantes.get(job["id"], ()):
+            fila.put_nowait(job)
+
+    def _reservar(self) -> Optional[Dict]:
+        """Marca o job pendente mais antigo como em processamento (atômico no SQLite)"""
+        linhas = self._executar_sql(
+            f"""
+            UPDATE jobs SET status = ?, etapa = NULL, tentativas = tentativas + 1, atualizado_em = ?
+            WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY criado_em LIMIT 1)
+            RETURNING {COLUNAS_JOB}, pdf
+            """,
+            (STATUS_PROCESSANDO, time.time(), STATUS_PENDENTE)
+        )
+        return self._job(linhas[0]) if linhas else None
+
+    async def enviar(self, file_bytes: bytes, arquivo: str) -> Dict:
+        """
+        Enfileira um PDF
+
+        Args:
+            file_bytes: Bytes do PDF
+            arquivo: Nome do arquivo enviado
+
+        Returns:
+            Dict: Job criado (status pendente)
+        """
+        agora = time.time()
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(
+            self._executar_sql,
+            "INSERT INTO jobs (id, arquivo, status, pdf, criado_em, atualizado_em) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, arquivo, STATUS_PENDENTE, file_bytes, agora, agora)
+        )
+        self._novo.set()
+        return await self.obter(job_id)
+
+    async def obter(self, job_id: str) -> Optional[Dict]:
+        """Estado atual do job (None se não existe ou já expirou)"""
+        return await asyncio.to_thread(self._obter, job_id)
+
+    async def eventos(self, job_id: str, intervalo_sem_evento: Optional[float] = None) -> AsyncIterator[Optional[Dict]]:
+        """
+        Acompanha o job: o estado atual e depois cada mudança, até o status final
+
+        Args:
+            job_id: Id do job
+            intervalo_sem_evento: Sem mudanças nesse intervalo (segundos),
+                entrega None (usado para manter a conexão viva)
+
+        Yields:
+            Estado do job a cada mudança, ou None
+        """
+        fila: asyncio.Queue = asyncio.Queue()
+        self._assinantes.setdefault(job_id, set()).add(fila)
+        try:
+            job = await self.obter(job_id)
+            if job is None:
+                return
+            yield job
+            while job["status"] not in STATUS_FINAIS:
+                try:
+                    novo = await asyncio.wait_for(fila.get(), intervalo_sem_evento)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                # Mudanças publicadas antes da leitura inicial já estão nela
+                if novo["atualizado_em"] < job["atualizado_em"]:
+                    continue
+                job = novo
+                yield job
+        finally:
+            assinantes = self._assinantes[job_id]
+            assinantes.discard(fila)
+            if not assinantes:
+                del self._assinantes[job_id]
+
+    def _recuperar(self):
+        """Devolve à fila os jobs interrompidos e remove os finalizados expirados"""
+        agora = time.time()
+        self._executar_sql(
+            "UPDATE jobs SET status = ?, etapa = NULL, pdf = NULL, erro = ?, atualizado_em = ? "
+            "WHERE status = ? AND tentativas >= ?",
+            (STATUS_ERRO, "Processamento interrompido repetidamente", agora, STATUS_PROCESSANDO, self.max_tentativas)
+        )
+        recuperados = self._executar_sql(
+            "UPDATE jobs SET status = ?, etapa = NULL, atualizado_em = ? WHERE status = ? RETURNING id",
+            (STATUS_PENDENTE, agora, STATUS_PROCESSANDO)
+        )
+        if recuperados:
+            logger.info(f"🔁 {len(recuperados)} job(s) de PDF interrompido(s) de volta à fila")
+        self._remover_expirados()
+
+    def _remover_expirados(self) -> int:
+        """Remove os jobs finalizados há mais de `retencao_segundos`"""
+        linhas = self._executar_sql(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(STATUS_FINAIS))}) AND atualizado_em < ? "
+            "RETURNING id",
+            (*STATUS_FINAIS, time.time() - self.retencao_segundos)
+        )
+        return len(linhas)
+
+    async def _limpar_periodicamente(self):
+        """Remove os expirados a cada fração da retenção (no máximo a cada hora)"""
+        intervalo = min(max(self.retencao_segundos / 10, 1), INTERVALO_LIMPEZA_MAXIMO)
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                removidos = await asyncio.to_thread(self._remover_expirados)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Falha ao remover jobs de PDF expirados: {e}")
+                continue
+            if removidos:
+                logger.info(f"🧹 {removidos} job(s) de PDF expirado(s) removido(s)")
+
+    def iniciar(self):
+        """Recupera os jobs interrompidos e sobe os workers (no event loop da aplicação)"""
+        if self._tarefas:
+            return
+        self._recuperar()
+        self._novo = asyncio.Event()
+        self._novo.set()
+        self._tarefas = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._limpeza = asyncio.create_task(self._limpar_periodicamente())
+
+    async def encerrar(self):
+        """Para os workers; os jobs em andamento voltam à fila para o próximo início"""
+        tarefas, self._tarefas = self._tarefas, []
+        if self._limpeza is not None:
+            tarefas.append(self._limpeza)
+            self._limpeza = None
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+    async def _worker(self):
+        while True:
+            job = await asyncio.to_thread(self._reservar)
+            if job is None:
+                # Limpa o aviso e confere de novo: um envio entre as duas consultas não se perde
+                self._novo.clear()
+                job = await asyncio.to_thread(self._reservar)
+                if job is None:
+                    await self._novo.wait()
+                    continue
+            self._publicar({chave: valor for chave, valor in job.items() if chave != "pdf"})
+            await self._executar(job)
+
+    async def _executar(self, job: Dict):
+        job_id = job["id"]
+
+        def progresso(etapa: str):
+            self._atualizar(job_id, etapa=etapa)
+
+        try:
+            dados = await self.processar(job["pdf"], progresso=progresso)
+        except asyncio.CancelledError:
+            # Encerramento: volta à fila sem contar a tentativa
+            self._atualizar(job_id, status=STATUS_PENDENTE, etapa=None, tentativas=job["tentativas"] - 1)
+            raise
+        except ExtracaoSaturadaError as e:
+            self._atualizar(job_id, status=STATUS_PENDENTE, etapa=None, tentativas=job["tentativas"] - 1)
+            self._novo.set()
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            self._atualizar(job_id, status=STATUS_ERRO, pdf=None, erro=str(e))
+        else:
+            self._atualizar(
+                job_id, status=STATUS_CONCLUIDO, pdf=None, resultado=json.dumps(dados, ensure_ascii=False)
+            )
+
+    def estatisticas(self) -> Dict:
+        """Jobs por status e workers ativos"""
+        linhas = self._executar_sql("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        return {
+            "workers": len(self._tarefas),
+            "jobs": {status: quantidade for status, quantidade in linhas}
+        }
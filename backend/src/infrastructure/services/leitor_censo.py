@@ -0,0 +1,158 @@
+"""
+Leitor de Censo
+Leitura em blocos de censos de beneficiários (CSV) para cotações PME/EMPRESARIAL
+"""
+import csv
+import unicodedata
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ...domain.entities.cotacao import IDADE_MAXIMA, VINCULOS
+
+TAMANHO_BLOCO_CENSO = 5000
+
+# Nomes de coluna aceitos (após normalização: minúsculas, sem acento)
+_COLUNAS = {
+    "idade": "idade",
+    "vinculo": "vinculo",
+    "tipo_vinculo": "vinculo",
+    "plano": "plano",
+}
+
+
+@dataclass
+class BlocoCenso:
+    """
+    Bloco de linhas válidas de um censo, em arrays.
+
+    Linhas inválidas não entram nos arrays: são contadas e descritas
+    (até o limite pedido ao leitor) em `erros`.
+    """
+    idades: np.ndarray  # int64
+    vinculos: np.ndarray  # índice em VINCULOS
+    planos: Optional[np.ndarray] = None  # object; None quando o censo não tem coluna de plano
+    linhas_invalidas: int = 0
+    erros: List[str] = field(default_factory=list)
+
+
+def _normalizar_coluna(nome: str) -> str:
+    """Minúsculas, sem acentos e sem espaços nas pontas"""
+    sem_acento = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode()
+    return sem_acento.strip().lower().replace(" ", "_")
+
+
+def _detectar_separador(arquivo: BinaryIO) -> str:
+    """Detecta o separador pelo cabeçalho (vírgula, ponto e vírgula ou tab)"""
+    posicao = arquivo.tell()
+    cabecalho = arquivo.readline().decode("utf-8-sig", errors="ignore")
+    arquivo.seek(posicao)
+    try:
+        return csv.Sniffer().sniff(cabecalho, delimiters=",;\t").delimiter
+    except csv.Error:
+        return ","
+
+
+def _validar_bloco(bloco: pd.DataFrame, limite_erros: int) -> Tuple[BlocoCenso, int]:
+    """Converte um bloco do pandas em BlocoCenso, validando de forma vetorizada"""
+    # Linhas totalmente vazias são ignoradas, sem contar como erro
+    preenchidas = (bloco != "").any(axis=1).to_numpy()
+    bloco = bloco[preenchidas]
+    # Cabeçalho é a linha 1; o índice do pandas é contínuo entre blocos
+    linhas = bloco.index.to_numpy() + 2
+
+    idades = pd.to_numeric(bloco["idade"].str.strip(), errors="coerce").to_numpy(dtype=float)
+    idade_valida = (
+        ~np.isnan(idades) & (idades == np.floor(idades)) & (idades >= 0) & (idades <= IDADE_MAXIMA)
+    )
+
+    if "vinculo" in bloco:
+        vinculos = pd.Categorical(
+            bloco["vinculo"].str.strip().str.upper(), categories=VINCULOS
+        ).codes.astype(np.intp)
+    else:
+        vinculos = np.zeros(len(bloco), dtype=np.intp)  # sem coluna: todos titulares
+    vinculo_valido = vinculos >= 0
+
+    valida = idade_valida & vinculo_valido
+    erros = []
+    for posicao in np.flatnonzero(~valida)[:limite_erros].tolist():
+        if not idade_valida[posicao]:
+            erros.append(
+                f"Linha {linhas[posicao]}: idade inválida {bloco['idade'].iat[posicao]!r} "
+                f"(deve estar entre 0 e {IDADE_MAXIMA})"
+            )
+        else:
+            erros.append(
+                f"Linha {linhas[posicao]}: vínculo inválido {bloco['vinculo'].iat[posicao]!r} "
+                f"(deve ser um de: {list(VINCULOS)})"
+            )
+
+    planos = None
+    if "plano" in bloco:
+        planos = bloco["plano"].str.strip().to_numpy(dtype=object)[valida]
+        planos[planos == ""] = None
+
+    resultado = BlocoCenso(
+        idades=idades[valida].astype(np.int64),
+        vinculos=vinculos[valida],
+        planos=planos,
+        linhas_invalidas=int((~valida).sum()),
+        erros=erros,
+    )
+    return resultado, len(erros)
+
+
+def ler_censo_em_blocos(
+    arquivo: BinaryIO,
+    tamanho_bloco: int = TAMANHO_BLOCO_CENSO,
+    limite_erros: int = 20
+) -> Iterator[BlocoCenso]:
+    """
+    Lê um censo CSV em blocos de tamanho fixo.
+
+    O arquivo nunca é carregado inteiro: cada bloco é lido, validado e
+    convertido em arrays antes do próximo, de modo que a memória usada
+    não depende do tamanho do censo.
+
+    Colunas: idade (obrigatória), vinculo/tipo_vinculo (TITULAR, DEPENDENTE
+    ou AGREGADO; se ausente, todos são titulares) e plano (opcional).
+    Separadores aceitos: vírgula, ponto e vírgula ou tab.
+
+    Args:
+        arquivo: Arquivo binário posicionado no início do CSV
+        tamanho_bloco: Quantidade de linhas por bloco
+        limite_erros: Quantidade máxima de mensagens de erro no total
+
+    Yields:
+        BlocoCenso: Linhas válidas do bloco e o resumo das inválidas
+    """
+    try:
+        leitor = pd.read_csv(
+            arquivo,
+            sep=_detectar_separador(arquivo),
+            encoding="utf-8-sig",
+            dtype=str,
+            keep_default_na=False,
+            skip_blank_lines=False,
+            chunksize=tamanho_bloco,
+        )
+    except pd.errors.EmptyDataError:
+        raise ValueError("Censo vazio")
+
+    with leitor:
+        for bloco in leitor:
+            bloco = bloco.fillna("")
+            colunas = {}
+            for coluna in bloco.columns:
+                nome = _COLUNAS.get(_normalizar_coluna(coluna))
+                if nome is not None and nome not in colunas.values():
+                    colunas[coluna] = nome
+            if "idade" not in colunas.values():
+                raise ValueError("Censo deve ter uma coluna 'idade'")
+
+            resultado, emitidos = _validar_bloco(bloco[list(colunas)].rename(columns=colunas), limite_erros)
+            limite_erros -= emitidos
+            yield resultado
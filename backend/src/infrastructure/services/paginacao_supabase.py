@@ -0,0 +1,32 @@
+"""
+Paginação de Consultas ao Supabase
+O PostgREST corta cada resposta em max-rows linhas (1000 por padrão) sem
+sinalizar o corte; as leituras de tabelas inteiras pedem página a página
+"""
+import os
+from typing import Any, Callable, Dict, List
+
+# Deve ser no máximo o max-rows do PostgREST: uma página menor que isso encerra a leitura
+TAMANHO_PAGINA_PADRAO = 1000
+
+
+def ler_todas_as_paginas(consulta: Callable[[], Any], tamanho_pagina: int = 0) -> List[Dict]:
+    """
+    Lê todas as linhas de uma consulta com .range(), até vir uma página incompleta
+
+    Args:
+        consulta: Cria a consulta (filtrada e ordenada por uma chave única,
+            para as páginas não se sobreporem); chamada uma vez por página
+        tamanho_pagina: Linhas por página (padrão: env SUPABASE_TAMANHO_PAGINA ou 1000)
+
+    Returns:
+        Todas as linhas, na ordem da consulta
+    """
+    tamanho_pagina = tamanho_pagina or int(os.getenv("SUPABASE_TAMANHO_PAGINA", str(TAMANHO_PAGINA_PADRAO)))
+    registros: List[Dict] = []
+    while True:
+        inicio = len(registros)
+        pagina = consulta().range(inicio, inicio + tamanho_pagina - 1).execute().data or []
+        registros.extend(pagina)
+        if len(pagina) < tamanho_pagina:
+            return registros
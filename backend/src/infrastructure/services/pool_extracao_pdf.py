@@ -0,0 +1,257 @@
+"""
+Pool de Extração de Texto de PDFs
+Extração com pypdf em processos separados, com fila limitada e reciclagem
+de workers
+"""
+import asyncio
+import io
+import itertools
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from pypdf import PdfReader
+
+# Separa as páginas no texto extraído (a quebra de página \f entre linhas)
+SEPARADOR_PAGINAS = "\n\f\n"
+
+# Bytes do PDF ou caminho de um arquivo com ele (upload grande, em arquivo temporário)
+OrigemPDF = Union[bytes, str]
+
+# Avaliado após cada página com as páginas lidas até ali: True encerra a leitura
+CriterioParada = Callable[[Sequence[str]], bool]
+
+
+def paginas_pdf(reader: PdfReader, max_paginas: int = 0) -> Iterator[str]:
+    """Texto de cada página com conteúdo, extraído só quando a página é pedida"""
+    for page in itertools.islice(reader.pages, max_paginas or None):
+        texto = page.extract_text()
+        if texto:
+            yield texto
+
+
+def extrair_texto_pdf(
+    file_bytes: OrigemPDF,
+    parada: Optional[CriterioParada] = None,
+    max_paginas: int = 0,
+    max_caracteres: int = 0
+) -> str:
+    """
+    Extrai texto de um arquivo PDF, página a página
+
+    A leitura termina antes do fim do documento quando `parada` indica que
+    os campos procurados já estão nas páginas lidas, ou ao atingir
+    `max_paginas` ou `max_caracteres`.
+
+    Args:
+        file_bytes: Bytes do arquivo PDF ou caminho do arquivo
+        parada: Critério de parada antecipada
+        max_paginas: Páginas do PDF lidas no máximo (0 = todas)
+        max_caracteres: Tamanho máximo do texto (0 = sem limite); a página
+            que passa do limite entra cortada
+
+    Returns:
+        str: Texto extraído do PDF
+    """
+    try:
+        if isinstance(file_bytes, str):
+            # Pelo caminho o pypdf copiaria o arquivo inteiro para a memória;
+            # pelo arquivo aberto, lê os objetos sob demanda
+            with open(file_bytes, "rb") as arquivo:
+                return _ler_paginas(PdfReader(arquivo), parada, max_paginas, max_caracteres)
+        return _ler_paginas(PdfReader(io.BytesIO(file_bytes)), parada, max_paginas, max_caracteres)
+
+    except Exception as e:
+        raise ValueError(f"Erro ao extrair texto do PDF: {str(e)}")
+
+
+def _ler_paginas(
+    reader: PdfReader,
+    parada: Optional[CriterioParada],
+    max_paginas: int,
+    max_caracteres: int
+) -> str:
+    texto_completo: List[str] = []
+    tamanho = 0
+    for texto in paginas_pdf(reader, max_paginas):
+        if max_caracteres and tamanho + len(texto) > max_caracteres:
+            texto_completo.append(texto[:max(max_caracteres - tamanho, 0)])
+            break
+        texto_completo.append(texto)
+        tamanho += len(texto) + len(SEPARADOR_PAGINAS)
+        if parada is not None and parada(texto_completo):
+            break
+    return SEPARADOR_PAGINAS.join(texto_completo)
+
+
+def _executar_medindo(funcao: Callable[[OrigemPDF], str], file_bytes: OrigemPDF) -> Tuple[str, float]:
+    """Executa a extração no worker e devolve também o tempo gasto nela"""
+    inicio = time.perf_counter()
+    return funcao(file_bytes), time.perf_counter() - inicio
+
+
+def _aquecer():
+    """Tarefa vazia: sobe o worker (e importa o pypdf) antes da primeira extração"""
+    return None
+
+
+class ExtracaoSaturadaError(Exception):
+    """Pool e fila de extração cheios; o cliente deve tentar de novo após retry_after segundos"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Extração de PDFs sobrecarregada. Tente novamente em {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PoolExtracaoPDF:
+    """
+    Extração de texto em um pool de processos limitado.
+
+    O pypdf é Python puro e segura o GIL durante toda a extração; em uma
+    thread, PDFs grandes ainda disputam a CPU com o event loop e com os
+    outros PDFs. Em processos, a vazão escala com os núcleos.
+
+    Admissão: até `workers` extrações em execução e `fila_maxima`
+    aguardando. Acima disso a requisição é recusada na hora com
+    ExtracaoSaturadaError, com uma estimativa de espera baseada no tempo
+    médio das extrações recentes. A contagem só é liberada quando o worker
+    termina de fato (uma extração que excedeu o timeout continua ocupando
+    a vaga até acabar).
+
+    Cada worker é substituído após `tarefas_por_worker` extrações, para que
+    a memória retida pelo pypdf não cresça indefinidamente.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        fila_maxima: Optional[int] = None,
+        tarefas_por_worker: Optional[int] = None,
+        funcao: Callable[[OrigemPDF], str] = extrair_texto_pdf
+    ):
+        """
+        Args:
+            workers: Processos do pool (padrão: env PDF_WORKERS ou núcleos)
+            fila_maxima: Extrações aguardando worker antes de recusar
+                (padrão: env PDF_FILA_MAXIMA ou 2 x workers)
+            tarefas_por_worker: Extrações por processo antes de reciclá-lo
+                (padrão: env PDF_TAREFAS_POR_WORKER ou 50)
+            funcao: Função de extração (de nível de módulo, para ser
+                enviada aos processos)
+        """
+        self.workers = workers or int(os.getenv("PDF_WORKERS", "0")) or os.cpu_count() or 1
+        if fila_maxima is None:
+            fila_maxima = int(os.getenv("PDF_FILA_MAXIMA", str(2 * self.workers)))
+        self.fila_maxima = fila_maxima
+        self.tarefas_por_worker = tarefas_por_worker or int(os.getenv("PDF_TAREFAS_POR_WORKER", "50"))
+        self._funcao = funcao
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        # Média móvel do tempo de uma extração (segundos), para o Retry-After
+        self._tempo_medio = 1.0
+        self.concluidas = 0
+        self.recusadas = 0
+
+    @property
+    def capacidade(self) -> int:
+        """Extrações aceitas ao mesmo tempo (em execução + na fila)"""
+        return self.workers + self.fila_maxima
+
+    def _obter_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # max_tasks_per_child exige spawn (fork é incompatível com a reciclagem)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context("spawn"),
+                max_tasks_per_child=self.tarefas_por_worker
+            )
+        return self._executor
+
+    def iniciar(self):
+        """Sobe os workers antecipadamente, tirando o custo do spawn da primeira requisição"""
+        with self._lock:
+            executor = self._obter_executor()
+        for _ in range(self.workers):
+            executor.submit(_aquecer)
+
+    def encerrar(self):
+        """Encerra os workers, cancelando as extrações que ainda não começaram"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def estimar_espera(self) -> int:
+        """Segundos estimados até abrir uma vaga, arredondados para cima"""
+        return max(1, math.ceil(self._tempo_medio * (self._pendentes - self.workers + 1) / self.workers))
+
+    def _concluir(self, futuro: Future):
+        """Callback (thread do executor) ao fim de cada extração"""
+        with self._lock:
+            self._pendentes -= 1
+            if futuro.cancelled():
+                return
+            self.concluidas += 1
+            if futuro.exception() is None:
+                self._tempo_medio = 0.8 * self._tempo_medio + 0.2 * futuro.result()[1]
+
+    async def extrair(self, file_bytes: OrigemPDF, timeout: Optional[float] = None) -> str:
+        """
+        Extrai o texto do PDF em um worker do pool
+
+        Args:
+            file_bytes: Bytes do arquivo PDF ou caminho do arquivo (só o
+                caminho é enviado ao worker)
+            timeout: Limite em segundos, incluindo a espera na fila
+
+        Returns:
+            str: Texto extraído
+
+        Raises:
+            ExtracaoSaturadaError: Pool e fila cheios
+            asyncio.TimeoutError: Extração excedeu o timeout
+            ValueError: PDF inválido
+        """
+        with self._lock:
+            if self._pendentes >= self.capacidade:
+                self.recusadas += 1
+                raise ExtracaoSaturadaError(self.estimar_espera())
+            self._pendentes += 1
+            executor = self._obter_executor()
+
+        try:
+            futuro = executor.submit(_executar_medindo, self._funcao, file_bytes)
+        except BaseException:
+            with self._lock:
+                self._pendentes -= 1
+            raise
+        futuro.add_done_callback(self._concluir)
+
+        try:
+            # Cancelar a espera (timeout/desconexão) tira da fila o que ainda não começou
+            texto, _ = await asyncio.wait_for(asyncio.wrap_future(futuro), timeout)
+        except BrokenProcessPool:
+            # Um worker morreu (ex.: falta de memória); o próximo pedido recria o pool
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise RuntimeError("Worker de extração de PDF encerrado inesperadamente")
+        return texto
+
+    def estatisticas(self) -> Dict:
+        """Ocupação do pool e contadores"""
+        return {
+            "workers": self.workers,
+            "fila_maxima": self.fila_maxima,
+            "em_andamento": self._pendentes,
+            "concluidas": self.concluidas,
+            "recusadas": self.recusadas,
+            "tempo_medio_s": round(self._tempo_medio, 3)
+        }
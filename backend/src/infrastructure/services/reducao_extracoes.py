@@ -0,0 +1,89 @@
+"""
+Redução de Extrações
+Junta, de forma determinística, as extrações parciais das janelas de um
+documento grande em um único resultado
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .extratores_layout import normalizar_texto
+
+# Incrementar ao mudar as regras da redução: invalida as extrações em cache
+VERSAO_REDUCAO = 1
+
+
+def _chave_nome(nome: str) -> str:
+    """Nome comparável: sem acentos, minúsculas e espaços simples"""
+    return " ".join(normalizar_texto(nome).split())
+
+
+def _votar(valores: Sequence) -> Optional[object]:
+    """Valor mais frequente entre os não nulos; empate fica com o que apareceu primeiro"""
+    presentes = [valor for valor in valores if valor is not None]
+    if not presentes:
+        return None
+    contagem = Counter(presentes)
+    return max(contagem, key=lambda valor: (contagem[valor], -presentes.index(valor)))
+
+
+def _beneficiarios(parciais: Sequence[Dict]) -> List[Tuple[Optional[str], Optional[int]]]:
+    """
+    Pares (nome, idade) de todas as janelas, sem repetir nomes
+
+    Uma janela com tantos nomes quanto idades é lida aos pares (o prompt
+    pede a mesma ordem nas duas listas); nas demais, nomes e idades entram
+    separados. Idades sem nome não têm como ser deduplicadas e entram
+    todas: a sobreposição entre janelas é evitada no prompt.
+    """
+    beneficiarios = []
+    vistos = set()
+    for parcial in parciais:
+        nomes, idades = parcial["nome_beneficiarios"], parcial["idades"]
+        if nomes and len(nomes) == len(idades):
+            pares = list(zip(nomes, idades))
+        else:
+            pares = [(nome, None) for nome in nomes] + [(None, idade) for idade in idades]
+        for nome, idade in pares:
+            if nome:
+                chave = _chave_nome(nome)
+                if chave in vistos:
+                    continue
+                vistos.add(chave)
+            beneficiarios.append((nome, idade))
+    return beneficiarios
+
+
+def reduzir_extracoes(parciais: Sequence[Dict]) -> Dict:
+    """
+    Junta as extrações das janelas (já validadas, na ordem do documento)
+
+    - idades e nomes: concatenados, sem beneficiários repetidos pelo nome;
+    - operadora e tipo de plano: o mais citado entre as janelas;
+    - valor: o mais frequente; valores divergentes ficam registrados em
+      observacoes.
+
+    Returns:
+        Dict: Dados no formato de AIService._validar_dados_extraidos, sem
+            `confianca` (o caminho é marcado por AIService._processar_pdf)
+    """
+    beneficiarios = _beneficiarios(parciais)
+
+    valores = [parcial["valor_atual"] for parcial in parciais]
+    valor = _votar(valores)
+    observacoes = []
+    for parcial in parciais:
+        if parcial["observacoes"] and parcial["observacoes"] not in observacoes:
+            observacoes.append(parcial["observacoes"])
+    divergentes = sorted({v for v in valores if v is not None})
+    if len(divergentes) > 1:
+        listados = ", ".join(f"R$ {v:.2f}" for v in divergentes)
+        observacoes.append(f"Valores divergentes entre partes do documento ({listados}); usado R$ {valor:.2f}")
+
+    return {
+        "idades": [idade for _, idade in beneficiarios if idade is not None],
+        "operadora": _votar([parcial["operadora"] for parcial in parciais]),
+        "valor_atual": valor,
+        "tipo_plano": _votar([parcial["tipo_plano"] for parcial in parciais]),
+        "nome_beneficiarios": [nome for nome, _ in beneficiarios if nome],
+        "observacoes": "; ".join(observacoes) or None
+    }
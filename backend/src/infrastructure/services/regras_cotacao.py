@@ -0,0 +1,356 @@
+"""
+Regras de Cotação
+Tabela declarativa de descontos, observações e faixas etárias, compilada
+em arrays de consulta e predicados
+"""
+import hashlib
+import json
+import logging
+import operator
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ...domain.entities.cotacao import IDADE_IDOSO, IDADE_MAIORIDADE, IDADE_MAXIMA, TIPOS_CONTRATACAO
+from ...domain.value_objects.centavos import para_pontos_base
+from .paginacao_supabase import ler_todas_as_paginas
+
+logger = logging.getLogger(__name__)
+
+# Regras em vigor antes da tabela declarativa; usadas quando não há outra fonte
+REGRAS_PADRAO = {
+    "faixas_etarias": [
+        {"inicio": 0, "rotulo": "0-17 anos"},
+        {"inicio": 18, "rotulo": "18-29 anos"},
+        {"inicio": 30, "rotulo": "30-39 anos"},
+        {"inicio": 40, "rotulo": "40-49 anos"},
+        {"inicio": 50, "rotulo": "50-59 anos"},
+        {"inicio": 60, "rotulo": "60+ anos"},
+    ],
+    # Avaliados em ordem: vale a primeira regra que se aplica
+    "descontos": [
+        {"minimo_vidas": 5, "taxa": "0.10", "observacao": "Desconto de 10% aplicado por família numerosa"},
+        {"minimo_vidas": 3, "taxa": "0.05", "observacao": "Desconto de 5% aplicado"},
+    ],
+    "observacoes": [
+        {
+            "campo": "idade_maxima", "operador": ">=", "valor": IDADE_IDOSO,
+            "texto": "Cotação inclui beneficiário(s) idoso(s) - pode requerer carência"
+        },
+        {
+            "campo": "idade_minima", "operador": "<", "valor": IDADE_MAIORIDADE,
+            "texto": "Cotação inclui criança(s) - verificar cobertura pediátrica"
+        },
+    ],
+}
+
+_OPERADORES = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "==": operator.eq,
+}
+_CAMPOS = ("idade_minima", "idade_maxima", "quantidade_vidas")
+
+
+class RegrasCotacao:
+    """
+    Regras de negócio da cotação compiladas a partir de uma tabela declarativa.
+
+    - Faixas etárias: rótulo e índice da faixa pré-calculados por idade (0-120).
+    - Descontos: a primeira regra aplicável (por quantidade de vidas,
+      operadora e tipo) vira um array de consulta
+      [tipo, operadora, quantidade de vidas] -> índice da regra, de modo que
+      escolher o desconto é um acesso O(1), ou um gather para um lote.
+    - Observações: cada regra vira um predicado (closure) sobre os agregados
+      da cotação, que funciona tanto com escalares quanto com arrays.
+
+    Operadoras e tipos que nenhuma regra cita caem em uma posição "demais".
+    """
+
+    def __init__(self, definicao: Dict):
+        """
+        Args:
+            definicao: Tabela no formato de REGRAS_PADRAO
+        """
+        self.definicao = json.loads(json.dumps(definicao, default=str))
+        self._compilar_faixas(self.definicao.get("faixas_etarias") or REGRAS_PADRAO["faixas_etarias"])
+
+        descontos = self.definicao.get("descontos") or []
+        observacoes = self.definicao.get("observacoes") or []
+        citadas = {
+            op.upper() for regra in descontos + observacoes for op in regra.get("operadoras") or []
+        }
+        self.indice_operadora = {op: i for i, op in enumerate(sorted(citadas))}
+        self.indice_tipo = {tipo: i for i, tipo in enumerate(TIPOS_CONTRATACAO)}
+
+        self._compilar_descontos(descontos)
+        self._compilar_observacoes(observacoes)
+
+        conteudo = json.dumps(self.definicao, sort_keys=True).encode()
+        self.versao = hashlib.sha256(conteudo).hexdigest()[:12]
+
+    def _compilar_faixas(self, faixas: List[Dict]):
+        """Rótulo e índice da faixa de cada idade"""
+        faixas = sorted(faixas, key=lambda f: int(f["inicio"]))
+        inicios = [int(f["inicio"]) for f in faixas]
+        if not inicios or inicios[0] != 0 or len(set(inicios)) != len(inicios):
+            raise ValueError("Faixas etárias devem começar em 0 e ter inícios distintos")
+
+        self.inicios_faixa = np.array(inicios, dtype=np.intp)
+        self.rotulos_faixa = [str(f["rotulo"]) for f in faixas]
+        self.indice_faixa_por_idade = np.searchsorted(
+            self.inicios_faixa, np.arange(IDADE_MAXIMA + 1), side="right"
+        ) - 1
+        self.indice_faixa_por_idade.setflags(write=False)
+        self.rotulo_faixa_por_idade = [
+            self.rotulos_faixa[i] for i in self.indice_faixa_por_idade.tolist()
+        ]
+
+    def _mascara(self, valores: Optional[Sequence[str]], indice: Dict[str, int]) -> Optional[np.ndarray]:
+        """Máscara booleana (com a posição "demais" no fim) dos valores citados"""
+        if not valores:
+            return None
+        mascara = np.zeros(len(indice) + 1, dtype=bool)
+        for valor in valores:
+            posicao = indice.get(valor.upper())
+            if posicao is None:
+                raise ValueError(f"Valor desconhecido em regra de cotação: {valor}")
+            mascara[posicao] = True
+        return mascara
+
+    def _compilar_descontos(self, descontos: List[Dict]):
+        """Array de consulta [tipo, operadora, vidas] -> primeira regra aplicável"""
+        limites = [1]
+        for regra in descontos:
+            limites.append(int(regra.get("minimo_vidas", 1)))
+            if regra.get("maximo_vidas") is not None:
+                limites.append(int(regra["maximo_vidas"]) + 1)
+        # Quantidades a partir de limite_vidas se comportam todas igual
+        self.limite_vidas = max(limites)
+
+        pontos = []
+        self.observacao_desconto: List[Optional[str]] = []
+        tabela = np.full(
+            (len(self.indice_tipo) + 1, len(self.indice_operadora) + 1, self.limite_vidas + 1),
+            -1,
+            dtype=np.int16
+        )
+        vidas = np.arange(self.limite_vidas + 1)
+        mascaras = []
+        for regra in descontos:
+            pontos.append(para_pontos_base(str(regra["taxa"])))
+            self.observacao_desconto.append(regra.get("observacao"))
+            por_vidas = vidas >= int(regra.get("minimo_vidas", 1))
+            if regra.get("maximo_vidas") is not None:
+                por_vidas &= vidas <= int(regra["maximo_vidas"])
+            por_tipo = self._mascara(regra.get("tipos"), self.indice_tipo)
+            por_operadora = self._mascara(regra.get("operadoras"), self.indice_operadora)
+            mascaras.append((
+                np.ones(tabela.shape[0], dtype=bool) if por_tipo is None else por_tipo,
+                np.ones(tabela.shape[1], dtype=bool) if por_operadora is None else por_operadora,
+                por_vidas
+            ))
+
+        # Da última para a primeira: a primeira regra aplicável prevalece
+        for indice in reversed(range(len(descontos))):
+            por_tipo, por_operadora, por_vidas = mascaras[indice]
+            aplica = por_tipo[:, None, None] & por_operadora[None, :, None] & por_vidas[None, None, :]
+            tabela[aplica] = indice
+
+        tabela.setflags(write=False)
+        self._tabela_desconto = tabela
+        # Posição extra no fim: índice -1 (nenhuma regra) -> 0 pontos-base
+        self.pontos_desconto = np.array(pontos + [0], dtype=np.int64)
+        self.pontos_desconto.setflags(write=False)
+        self.observacao_desconto.append(None)
+
+    def _compilar_observacoes(self, observacoes: List[Dict]):
+        """Um predicado por regra de observação"""
+        self._observacoes: List[tuple] = []
+        limites_idade = set()
+        for regra in observacoes:
+            campo, simbolo, valor = regra["campo"], regra["operador"], int(regra["valor"])
+            if campo not in _CAMPOS or simbolo not in _OPERADORES:
+                raise ValueError(f"Regra de observação inválida: {regra}")
+            if campo != "quantidade_vidas":
+                # Idades em que o predicado pode mudar de resultado
+                limites_idade.update({
+                    ">=": [valor], "<": [valor], ">": [valor + 1], "<=": [valor + 1], "==": [valor, valor + 1]
+                }[simbolo])
+            predicado = self._compilar_predicado(
+                campo,
+                _OPERADORES[simbolo],
+                valor,
+                self._mascara(regra.get("tipos"), self.indice_tipo),
+                self._mascara(regra.get("operadoras"), self.indice_operadora)
+            )
+            self._observacoes.append((predicado, regra["texto"]))
+
+        self.limites_idade = sorted(i for i in limites_idade if 0 < i <= IDADE_MAXIMA)
+
+    @staticmethod
+    def _compilar_predicado(
+        campo: str,
+        comparar: Callable,
+        valor: int,
+        por_tipo: Optional[np.ndarray],
+        por_operadora: Optional[np.ndarray]
+    ) -> Callable[[Dict], object]:
+        """Closure sobre os agregados; aceita escalares ou arrays (lote)"""
+        def predicado(contexto: Dict):
+            resultado = comparar(contexto[campo], valor)
+            if por_tipo is not None:
+                resultado = resultado & por_tipo[contexto["tipo"]]
+            if por_operadora is not None:
+                resultado = resultado & por_operadora[contexto["operadora"]]
+            return resultado
+        return predicado
+
+    def posicao_tipo(self, tipo: Optional[str]) -> int:
+        """Posição do tipo de contratação nas tabelas (demais = última)"""
+        return self.indice_tipo.get((tipo or "").upper(), len(self.indice_tipo))
+
+    def posicao_operadora(self, operadora: Optional[str]) -> int:
+        """Posição da operadora nas tabelas (demais = última)"""
+        return self.indice_operadora.get((operadora or "").upper(), len(self.indice_operadora))
+
+    def regra_desconto(self, tipo: Optional[str], operadora: Optional[str], quantidade_vidas: int) -> int:
+        """Índice da regra de desconto aplicável (-1 se nenhuma)"""
+        return int(self._tabela_desconto[
+            self.posicao_tipo(tipo),
+            self.posicao_operadora(operadora),
+            min(quantidade_vidas, self.limite_vidas)
+        ])
+
+    def regras_desconto(
+        self,
+        posicoes_tipo: np.ndarray,
+        posicoes_operadora: np.ndarray,
+        quantidades: np.ndarray
+    ) -> np.ndarray:
+        """Versão vetorizada de regra_desconto (posições já resolvidas)"""
+        return self._tabela_desconto[
+            posicoes_tipo, posicoes_operadora, np.minimum(quantidades, self.limite_vidas)
+        ].astype(np.intp)
+
+    def tabela_desconto(self, tipos: Sequence[str], operadoras: Sequence[str]) -> np.ndarray:
+        """
+        Recorte do array de consulta para os tipos e operadoras informados
+
+        Returns:
+            np.ndarray: Regra de desconto (int16, -1 = nenhuma) no formato
+            tipos x operadoras x (limite_vidas + 1)
+        """
+        posicoes_tipo = [self.posicao_tipo(tipo) for tipo in tipos]
+        posicoes_operadora = [self.posicao_operadora(operadora) for operadora in operadoras]
+        return self._tabela_desconto[np.ix_(posicoes_tipo, posicoes_operadora)]
+
+    def observacoes(
+        self,
+        tipo: Optional[str],
+        operadora: Optional[str],
+        quantidade_vidas: int,
+        idade_minima: int,
+        idade_maxima: int,
+        regra_desconto: int
+    ) -> List[str]:
+        """Observações de uma cotação (regras de observação e a do desconto)"""
+        contexto = {
+            "tipo": self.posicao_tipo(tipo),
+            "operadora": self.posicao_operadora(operadora),
+            "quantidade_vidas": quantidade_vidas,
+            "idade_minima": idade_minima,
+            "idade_maxima": idade_maxima,
+        }
+        observacoes = [texto for predicado, texto in self._observacoes if predicado(contexto)]
+        if self.observacao_desconto[regra_desconto]:
+            observacoes.append(self.observacao_desconto[regra_desconto])
+        return observacoes
+
+    def observacoes_lote(
+        self,
+        posicoes_tipo: np.ndarray,
+        posicoes_operadora: np.ndarray,
+        quantidades: np.ndarray,
+        idades_minimas: np.ndarray,
+        idades_maximas: np.ndarray,
+        regras_desconto: np.ndarray
+    ) -> List[List[str]]:
+        """Versão vetorizada de observacoes: cada predicado é avaliado uma vez para o lote"""
+        contexto = {
+            "tipo": posicoes_tipo,
+            "operadora": posicoes_operadora,
+            "quantidade_vidas": quantidades,
+            "idade_minima": idades_minimas,
+            "idade_maxima": idades_maximas,
+        }
+        aplicaveis = [
+            (np.broadcast_to(predicado(contexto), quantidades.shape).tolist(), texto)
+            for predicado, texto in self._observacoes
+        ]
+        observacoes = [
+            [texto for marcadas, texto in aplicaveis if marcadas[k]] for k in range(len(quantidades))
+        ]
+        for lista, regra in zip(observacoes, regras_desconto.tolist()):
+            if self.observacao_desconto[regra]:
+                lista.append(self.observacao_desconto[regra])
+        return observacoes
+
+
+def _agrupar_registros(registros: List[Dict]) -> Dict:
+    """Converte linhas da tabela regras_cotacao (categoria, ordem, definicao) na tabela declarativa"""
+    definicao: Dict[str, List[Dict]] = {"faixas_etarias": [], "descontos": [], "observacoes": []}
+    for registro in sorted(registros, key=lambda r: int(r.get("ordem") or 0)):
+        if registro.get("ativo", True) is False:
+            continue
+        categoria = registro["categoria"]
+        if categoria not in definicao:
+            raise ValueError(f"Categoria de regra desconhecida: {categoria}")
+        definicao[categoria].append(registro["definicao"])
+    return definicao
+
+
+def carregar_regras_cotacao(
+    supabase_client=None,
+    caminho_arquivo: Optional[str] = None
+) -> RegrasCotacao:
+    """
+    Carrega e compila as regras de cotação: do banco (tabela regras_cotacao)
+    quando há conexão com o Supabase e regras cadastradas, senão do arquivo
+    JSON em REGRAS_COTACAO_ARQUIVO, senão REGRAS_PADRAO.
+
+    Returns:
+        RegrasCotacao compilado
+    """
+    if supabase_client is not None:
+        try:
+            registros = ler_todas_as_paginas(
+                lambda: supabase_client.table("regras_cotacao")
+                .select("categoria, ordem, definicao, ativo")
+                .eq("ativo", True)
+                .order("id")
+            )
+            if registros:
+                regras = RegrasCotacao(_agrupar_registros(registros))
+                logger.info(
+                    f"✅ Regras de cotação carregadas do banco: {len(registros)} regras, versão {regras.versao}"
+                )
+                return regras
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar regras de cotação do banco: {e}")
+
+    caminho = caminho_arquivo or os.getenv("REGRAS_COTACAO_ARQUIVO")
+    if caminho:
+        try:
+            with open(Path(caminho), encoding="utf-8") as arquivo:
+                regras = RegrasCotacao(json.load(arquivo))
+            logger.info(f"✅ Regras de cotação carregadas de {caminho}: versão {regras.versao}")
+            return regras
+        except Exception as e:
+            logger.error(f"❌ Erro ao ler regras de cotação de {caminho}, usando padrão: {e}")
+
+    return RegrasCotacao(REGRAS_PADRAO)
@@ -0,0 +1,251 @@
+"""
+Seleção de Trechos
+Divide o texto do PDF em trechos (páginas e seções), pontua cada um com um
+índice léxico barato e monta o documento do prompt dentro de um orçamento
+de tokens, ou as janelas do processamento em partes (map-reduce)
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .pool_extracao_pdf import SEPARADOR_PAGINAS
+
+# Incrementar ao mudar a divisão ou a pontuação: invalida as extrações em cache
+VERSAO_SELECAO = 2
+
+# Estimativa de tokens sem tokenizador: textos em português ficam perto de
+# 4 caracteres por token no tokenizador dos modelos GPT-4o
+CARACTERES_POR_TOKEN = 4
+
+# Tamanho máximo de um trecho (uma página maior que isso é dividida em seções)
+TAMANHO_TRECHO = 2000
+
+# Termos que indicam os campos extraídos: padrões (sobre o texto em
+# minúsculas) e peso. Cada padrão começa por um literal, o que deixa a busca
+# do `re` rápida; uma alternação única com IGNORECASE é ~5x mais lenta
+TERMOS_RELEVANTES = {
+    "idade": ((r"idades?\b",), 3.0),
+    "nascimento": ((r"nascimento", r"dt\.? ?nasc"), 3.0),
+    "valor": ((r"mensalidade", r"prêmio", r"premio", r"valor (?:total|mensal)", r"total a pagar"), 3.0),
+    "moeda": ((r"r\$ ?\d",), 2.0),
+    "beneficiario": ((r"beneficiári", r"beneficiari", r"titular\b", r"dependentes?\b"), 2.0),
+    "operadora": (
+        (r"amil\b", r"bradesco", r"sul ?américa", r"sul ?america", r"unimed", r"notre ?dame", r"hapvida",
+         r"operadora"),
+        2.0
+    ),
+    "data": ((r"/\d{2}/\d{4}",), 1.0),
+    "tipo_plano": ((r"adesão", r"adesao", r"pme\b", r"empresarial", r"coletivo"), 1.5),
+}
+
+# Termos que indicam dados de beneficiários no trecho
+TERMOS_DADOS = ("idade", "nascimento", "beneficiario")
+
+# Separa, na janela, o trecho seguinte incluído só como continuação
+MARCADOR_CONTEXTO = "=== CONTEXTO ==="
+
+# Bônus da primeira página: o cabeçalho costuma trazer operadora e tipo
+BONUS_PRIMEIRA_PAGINA = 2.0
+
+_INDICE = [
+    (nome, peso, [re.compile(padrao) for padrao in padroes])
+    for nome, (padroes, peso) in TERMOS_RELEVANTES.items()
+]
+# Título de seção: linha curta em maiúsculas
+_TITULO = re.compile(r"^[^a-z\n]{4,80}$")
+
+
+def estimar_tokens(texto: str) -> int:
+    """Tokens aproximados do texto"""
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+@dataclass
+class Trecho:
+    """Parte contígua de uma página"""
+    pagina: int  # a partir de 1
+    texto: str
+    pontuacao: float = 0.0
+    tem_dados: bool = False  # cita idades, nascimentos ou beneficiários
+
+
+@dataclass
+class SelecaoTrechos:
+    """Documento montado para o prompt e o que ficou de fora"""
+    texto: str
+    tokens_originais: int
+    tokens_selecionados: int
+    trechos_usados: int
+    trechos_total: int
+    trechos_com_dados_descartados: int = 0
+
+    @property
+    def tokens_economizados(self) -> int:
+        return self.tokens_originais - self.tokens_selecionados
+
+
+def dividir_em_trechos(texto: str, tamanho_maximo: int = TAMANHO_TRECHO) -> List[Trecho]:
+    """
+    Um trecho por página; páginas maiores que `tamanho_maximo` são divididas
+    nas linhas em branco e nos títulos de seção (ou, na falta deles, onde
+    o tamanho estoura)
+    """
+    trechos = []
+    for numero, pagina in enumerate(texto.split(SEPARADOR_PAGINAS), start=1):
+        pagina = pagina.strip()
+        if len(pagina) <= tamanho_maximo:
+            if pagina:
+                trechos.append(Trecho(numero, pagina))
+            continue
+
+        atual: List[str] = []
+        tamanho = 0
+        for linha in pagina.split("\n"):
+            quebra_natural = not linha.strip() or _TITULO.match(linha.strip())
+            if atual and (tamanho + len(linha) > tamanho_maximo or (quebra_natural and tamanho >= tamanho_maximo // 4)):
+                trechos.append(Trecho(numero, "\n".join(atual).strip()))
+                atual, tamanho = [], 0
+            atual.append(linha)
+            tamanho += len(linha) + 1
+        if "".join(atual).strip():
+            trechos.append(Trecho(numero, "\n".join(atual).strip()))
+    return trechos
+
+
+def pontuar(trecho: Trecho) -> float:
+    """
+    Preenche `pontuacao` (soma dos pesos dos termos relevantes, com retorno
+    decrescente por repetição) e `tem_dados` do trecho
+    """
+    texto = trecho.texto.lower()
+    trecho.pontuacao = 0.0
+    trecho.tem_dados = False
+    for termo, peso, padroes in _INDICE:
+        quantidade = sum(len(padrao.findall(texto)) for padrao in padroes)
+        if quantidade:
+            trecho.pontuacao += peso * (1 + math.log(quantidade))
+            trecho.tem_dados = trecho.tem_dados or termo in TERMOS_DADOS
+    if trecho.pagina == 1:
+        trecho.pontuacao += BONUS_PRIMEIRA_PAGINA
+    return trecho.pontuacao
+
+
+def _montar(trechos: List[Trecho]) -> str:
+    """Texto dos trechos com o marcador de cada página"""
+    partes = []
+    for indice, trecho in enumerate(trechos):
+        if indice == 0 or trecho.pagina != trechos[indice - 1].pagina:
+            partes.append(f"--- página {trecho.pagina} ---")
+        partes.append(trecho.texto)
+    return "\n".join(partes)
+
+
+def selecionar_trechos(texto: str, orcamento_tokens: int) -> SelecaoTrechos:
+    """
+    Monta o documento do prompt com os trechos mais relevantes que cabem no
+    orçamento, na ordem original e identificados pela página
+
+    Um texto que já cabe no orçamento é usado inteiro.
+
+    Args:
+        texto: Texto extraído do PDF (páginas separadas por SEPARADOR_PAGINAS)
+        orcamento_tokens: Tokens disponíveis para o documento no prompt
+
+    Returns:
+        SelecaoTrechos
+    """
+    tokens_originais = estimar_tokens(texto)
+    trechos = dividir_em_trechos(texto)
+    if tokens_originais <= orcamento_tokens:
+        return SelecaoTrechos(texto, tokens_originais, tokens_originais, len(trechos), len(trechos))
+
+    for trecho in trechos:
+        pontuar(trecho)
+
+    # Guloso pela pontuação; um trecho que não cabe dá lugar aos menores seguintes
+    escolhidos = set()
+    restante = orcamento_tokens
+    ordem = sorted(range(len(trechos)), key=lambda i: trechos[i].pontuacao, reverse=True)
+    for indice in ordem:
+        custo = estimar_tokens(trechos[indice].texto) + 4  # + marcador de página
+        if custo <= restante:
+            escolhidos.add(indice)
+            restante -= custo
+
+    partes = []
+    anterior = None
+    for indice in sorted(escolhidos):
+        trecho = trechos[indice]
+        if anterior is not None and indice != anterior + 1:
+            partes.append("[...]")
+        if anterior is None or trecho.pagina != trechos[anterior].pagina:
+            partes.append(f"--- página {trecho.pagina} ---")
+        partes.append(trecho.texto)
+        anterior = indice
+    documento = "\n".join(partes)
+    descartados = sum(1 for indice, trecho in enumerate(trechos) if trecho.tem_dados and indice not in escolhidos)
+    return SelecaoTrechos(
+        documento, tokens_originais, estimar_tokens(documento), len(escolhidos), len(trechos), descartados
+    )
+
+
+@dataclass
+class Janela:
+    """Trechos consecutivos analisados em uma chamada do processamento em partes"""
+    texto: str
+    primeira_pagina: int
+    ultima_pagina: int
+    pontuacao: float
+    tem_dados: bool
+
+
+def dividir_em_janelas(texto: str, orcamento_tokens: int, max_janelas: Optional[int] = None) -> List[Janela]:
+    """
+    Divide o documento em janelas de trechos consecutivos que cabem no
+    orçamento, para análise em paralelo
+
+    Cada janela termina com o trecho seguinte após MARCADOR_CONTEXTO
+    (sobreposição): um beneficiário que começa no fim da janela aparece
+    inteiro nela, e a janela seguinte, que também o vê no começo, não deve
+    extraí-lo. Janelas sem nenhum termo relevante são descartadas, exceto
+    a primeira (cabeçalho com operadora e tipo de contrato).
+
+    Args:
+        texto: Texto extraído do PDF
+        orcamento_tokens: Tokens por janela, incluindo a sobreposição
+        max_janelas: Mantém só as janelas de maior pontuação (além da primeira)
+
+    Returns:
+        Janelas na ordem do documento
+    """
+    trechos = dividir_em_trechos(texto)
+    for trecho in trechos:
+        pontuar(trecho)
+    # Reserva espaço para o trecho de contexto (no máximo TAMANHO_TRECHO)
+    orcamento_principal = max(orcamento_tokens - estimar_tokens("x" * TAMANHO_TRECHO), 1)
+
+    janelas = []
+    inicio = 0
+    while inicio < len(trechos):
+        fim = inicio + 1
+        custo = estimar_tokens(trechos[inicio].texto)
+        while fim < len(trechos) and custo + estimar_tokens(trechos[fim].texto) + 4 <= orcamento_principal:
+            custo += estimar_tokens(trechos[fim].texto) + 4
+            fim += 1
+        principais = trechos[inicio:fim]
+        pontuacao = sum(trecho.pontuacao for trecho in principais)
+        if inicio == 0 or pontuacao > 0:
+            documento = _montar(principais)
+            if fim < len(trechos):
+                documento += f"\n{MARCADOR_CONTEXTO}\n{trechos[fim].texto}"
+            janelas.append(Janela(
+                documento, principais[0].pagina, principais[-1].pagina, pontuacao,
+                any(trecho.tem_dados for trecho in principais)
+            ))
+        inicio = fim
+
+    if max_janelas and len(janelas) > max_janelas:
+        mantidas = sorted(range(1, len(janelas)), key=lambda i: janelas[i].pontuacao, reverse=True)
+        janelas = [janelas[0]] + [janelas[i] for i in sorted(mantidas[:max_janelas - 1])]
+    return janelas
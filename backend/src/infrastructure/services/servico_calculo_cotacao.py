@@ -2,26 +2,75 @@
 Serviço de Cálculo de Cotação
 Implementa a lógica de cálculo de valores de planos de saúde
 """
+import asyncio
+import logging
+import threading
+import numpy as np
 import pandas as pd
 from decimal import Decimal
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Tuple
 from ...domain.entities.cotacao import Cotacao
+from ...domain.value_objects.centavos import aplicar_taxa_array, para_decimal
+from .catalogo_precos import CatalogoPrecos, carregar_catalogo_precos
+from .regras_cotacao import RegrasCotacao, carregar_regras_cotacao
+from .snapshot_precos import IDADE_MAXIMA, SnapshotPrecos
+
+logger = logging.getLogger(__name__)
 
 
 class ServicoCalculoCotacao:
     """
     Serviço responsável por calcular valores de cotações.
-    Utiliza tabelas de preços (pandas) para cálculos complexos.
+    As tabelas de preços (pandas) são apenas o formato de origem: na carga
+    elas são compiladas em arrays densos indexados por idade (0-120), um por
+    par (tipo_contratacao, operadora), com o multiplicador já aplicado.
+    
+    Quando a cotação informa um plano existente no catálogo real
+    (planos_operadora/precos_faixa), o preço vem do CatalogoPrecos
+    compilado em memória, sem consultas ao banco por requisição.
+    
+    Todo o cálculo é feito em centavos inteiros (int64 nos arrays); a
+    conversão para Decimal fica a cargo de quem monta os DTOs.
+    
+    As tabelas compiladas ficam em um SnapshotPrecos imutável e versionado.
+    A recarga monta um snapshot novo fora do caminho das cotações e troca a
+    referência de uma vez; cada cálculo lê a referência uma única vez e usa
+    a mesma versão do início ao fim, sem locks.
     """
     
-    def __init__(self):
-        """Inicializa o serviço com tabelas de preços"""
-        self._carregar_tabelas_precos()
+    def __init__(
+        self,
+        catalogo: Optional[CatalogoPrecos] = None,
+        fonte_catalogo: Optional[Callable[[], Optional[CatalogoPrecos]]] = None,
+        fonte_regras: Optional[Callable[[], RegrasCotacao]] = None
+    ):
+        """
+        Inicializa o serviço com tabelas de preços
+        
+        Args:
+            catalogo: Catálogo de planos já carregado; se omitido, é lido
+                da fonte_catalogo
+            fonte_catalogo: Função que lê o catálogo (banco ou snapshot local),
+                usada na carga inicial e nas recargas
+            fonte_regras: Função que lê e compila as regras de desconto e
+                observação; recarregadas junto com as tabelas
+        """
+        self._fonte_catalogo = fonte_catalogo or carregar_catalogo_precos
+        self._fonte_regras = fonte_regras or carregar_regras_cotacao
+        self._lock_recarga = threading.Lock()
+        self._tarefa_atualizacao: Optional[asyncio.Task] = None
+        
+        if catalogo is None:
+            catalogo = self._fonte_catalogo()
+        tabela_precos, multiplicadores = self._carregar_tabelas_precos()
+        self._snapshot = SnapshotPrecos(
+            tabela_precos, multiplicadores, catalogo, regras=self._fonte_regras()
+        )
     
-    def _carregar_tabelas_precos(self):
+    def _carregar_tabelas_precos(self) -> Tuple[pd.DataFrame, Dict[str, float]]:
         """Carrega tabelas de preços fictícias (futuramente pode vir de CSV/DB)"""
         # Tabela de preços base por faixa etária
-        self.tabela_precos = pd.DataFrame({
+        tabela_precos = pd.DataFrame({
             'faixa_inicio': [0, 18, 30, 40, 50, 60],
             'faixa_fim': [17, 29, 39, 49, 59, 120],
             'valor_base_adesao': [150.00, 250.00, 350.00, 450.00, 600.00, 850.00],
@@ -30,7 +79,7 @@ class ServicoCalculoCotacao:
         })
         
         # Multiplicadores por operadora
-        self.multiplicadores_operadora = {
+        multiplicadores_operadora = {
             'AMIL': 1.15,
             'BRADESCO': 1.10,
             'SULAMERICA': 1.20,
@@ -38,6 +87,102 @@ class ServicoCalculoCotacao:
             'NOTREDAME': 1.18,
             'HAPVIDA': 1.00
         }
+        
+        return tabela_precos, multiplicadores_operadora
+    
+    @property
+    def snapshot(self) -> SnapshotPrecos:
+        """Snapshot de preços vigente"""
+        return self._snapshot
+    
+    @property
+    def versao_tabela(self) -> str:
+        """Versão da tabela de preços vigente"""
+        return self._snapshot.versao
+    
+    @property
+    def tabela_precos(self) -> pd.DataFrame:
+        """Tabela de preços de origem do snapshot vigente"""
+        return self._snapshot.tabela_precos
+    
+    @property
+    def multiplicadores_operadora(self) -> Dict[str, float]:
+        """Multiplicadores por operadora do snapshot vigente"""
+        return self._snapshot.multiplicadores_operadora
+    
+    @property
+    def catalogo(self) -> Optional[CatalogoPrecos]:
+        """Catálogo de planos do snapshot vigente"""
+        return self._snapshot.catalogo
+    
+    @property
+    def regras(self) -> RegrasCotacao:
+        """Regras de cotação do snapshot vigente"""
+        return self._snapshot.regras
+    
+    def recarregar(self) -> Dict:
+        """
+        Monta um novo snapshot de preços e o publica atomicamente.
+        
+        Executa fora do caminho das cotações (thread do admin ou da tarefa
+        periódica). O lock serializa apenas recargas concorrentes; cálculos
+        em andamento seguem com a versão que já leram.
+        
+        Returns:
+            Dict com versao_anterior, versao_atual e se houve alteração
+        """
+        with self._lock_recarga:
+            anterior = self._snapshot
+            tabela_precos, multiplicadores = self._carregar_tabelas_precos()
+            novo = SnapshotPrecos(
+                tabela_precos,
+                multiplicadores,
+                self._fonte_catalogo(),
+                sequencia=anterior.sequencia + 1,
+                regras=self._fonte_regras()
+            )
+            
+            alterada = novo.versao != anterior.versao
+            if alterada:
+                # Troca de referência: atômica para os leitores
+                self._snapshot = novo
+                logger.info(f"✅ Tabela de preços atualizada: {anterior.versao} -> {novo.versao}")
+        
+        return {
+            "versao_anterior": anterior.versao,
+            "versao_atual": self._snapshot.versao,
+            "alterada": alterada,
+            "snapshot": self._snapshot.resumo()
+        }
+    
+    async def recarregar_async(self) -> Dict:
+        """Executa recarregar() em uma thread, sem bloquear o event loop"""
+        return await asyncio.to_thread(self.recarregar)
+    
+    def iniciar_atualizacao_periodica(self, intervalo_segundos: float) -> asyncio.Task:
+        """
+        Inicia uma tarefa que recarrega as tabelas de preços periodicamente
+        
+        Args:
+            intervalo_segundos: Intervalo entre recargas
+        """
+        async def _atualizar():
+            while True:
+                await asyncio.sleep(intervalo_segundos)
+                try:
+                    await self.recarregar_async()
+                except Exception as e:
+                    logger.error(f"❌ Erro ao recarregar tabela de preços: {e}")
+        
+        self.parar_atualizacao_periodica()
+        self._tarefa_atualizacao = asyncio.create_task(_atualizar())
+        return self._tarefa_atualizacao
+    
+    def parar_atualizacao_periodica(self):
+        """Cancela a tarefa de atualização periódica, se houver"""
+        if self._tarefa_atualizacao is not None:
+            self._tarefa_atualizacao.cancel()
+            self._tarefa_atualizacao = None
     
     async def calcular(self, cotacao: Cotacao) -> Dict:
         """
@@ -47,24 +192,349 @@ class ServicoCalculoCotacao:
             cotacao: Entidade de domínio Cotacao
             
         Returns:
-            Dict com valores_individuais e valor_total
+            Dict com valores_individuais_centavos (List[int]),
+            valor_total_centavos, versao_tabela e regras (RegrasCotacao
+            do mesmo snapshot)
+        """
+        snapshot = self._snapshot
+        
+        # Um único gather por família
+        idades = cotacao.idades
+        
+        indice_plano = snapshot.indice_plano_catalogo(cotacao.operadora, cotacao.plano)
+        if indice_plano is not None:
+            centavos = snapshot.catalogo.calcular_centavos(indice_plano, idades)
+        else:
+            tabela = snapshot.tabela_por_idade(cotacao.tipo_contratacao, cotacao.operadora)
+            centavos = tabela[idades]
+        
+        valores_individuais = centavos.tolist()
+        return {
+            'valores_individuais_centavos': valores_individuais,
+            'valor_total_centavos': sum(valores_individuais),
+            'versao_tabela': snapshot.versao,
+            'regras': snapshot.regras
+        }
+    
+    def calcular_lote(
+        self,
+        idades: np.ndarray,
+        familia: np.ndarray,
+        tipos: List[str],
+        operadoras: List[str],
+        planos: Optional[List[Optional[str]]] = None
+    ) -> Dict:
+        """
+        Calcula várias cotações em uma única passada vetorizada
+        
+        Args:
+            idades: Idades de todos os beneficiários, concatenadas por cotação
+            familia: Índice da cotação de cada beneficiário (mesmo tamanho de idades)
+            tipos: Tipo de contratação de cada cotação
+            operadoras: Operadora de cada cotação
+            planos: Plano de cada cotação (opcional); planos do catálogo
+                são precificados pelo CatalogoPrecos
+            
+        Returns:
+            Dict com valores_individuais_centavos (int64, alinhado a idades),
+            valores_totais_centavos (int64, um por cotação) e erros
+            (mensagem por índice das cotações que não puderam ser calculadas),
+            além de versao_tabela
         """
-        valores_individuais = []
+        snapshot = self._snapshot
+        indices_tipo = np.array([snapshot.indice_tipo[t] for t in tipos], dtype=np.intp)
+        indices_operadora = np.array(
+            [snapshot.indice_operadora.get(op, snapshot.operadora_padrao) for op in operadoras],
+            dtype=np.intp
+        )
         
-        # Calcular valor para cada beneficiário
-        for beneficiario in cotacao.beneficiarios:
-            valor = self._calcular_valor_beneficiario(
-                idade=beneficiario.idade,
-                tipo_contratacao=cotacao.tipo_contratacao,
-                operadora=cotacao.operadora
+        valores = snapshot.precos_por_idade_centavos[
+            indices_tipo[familia], indices_operadora[familia], idades
+        ]
+        erros = {}
+        
+        if planos is not None and snapshot.catalogo is not None:
+            indices_plano = np.full(len(tipos), -1, dtype=np.intp)
+            for k, (operadora, plano) in enumerate(zip(operadoras, planos)):
+                indice = snapshot.indice_plano_catalogo(operadora, plano)
+                if indice is not None:
+                    indices_plano[k] = indice
+            plano_por_vida = indices_plano[familia]
+            do_catalogo = plano_por_vida >= 0
+            if do_catalogo.any():
+                valores = valores.copy()
+                centavos_catalogo = snapshot.catalogo.precos_por_idade_centavos[
+                    plano_por_vida[do_catalogo], idades[do_catalogo]
+                ]
+                valores[do_catalogo] = centavos_catalogo
+                
+                sem_preco = np.zeros(len(idades), dtype=bool)
+                sem_preco[do_catalogo] = centavos_catalogo < 0
+                for k in np.unique(familia[sem_preco]).tolist():
+                    idade = int(idades[sem_preco & (familia == k)][0])
+                    erros[k] = f"Plano {planos[k]} não possui preço para a idade {idade}"
+                valores[sem_preco] = 0
+        
+        totais = np.zeros(len(tipos), dtype=np.int64)
+        np.add.at(totais, familia, valores)
+        
+        return {
+            'valores_individuais_centavos': valores,
+            'valores_totais_centavos': totais,
+            'erros': erros,
+            'versao_tabela': snapshot.versao,
+            'regras': snapshot.regras
+        }
+    
+    def calcular_matriz(self, idades: List[int]) -> Dict:
+        """
+        Calcula o valor total da família para todas as operadoras e tipos
+        de contratação em uma única passada
+        
+        Args:
+            idades: Idades dos beneficiários
+            
+        Returns:
+            Dict com tipos, operadoras, valores_totais_centavos
+            (int64, formato tipos x operadoras) e versao_tabela
+        """
+        snapshot = self._snapshot
+        indices = np.asarray(idades, dtype=np.intp)
+        # Exclui a linha de fallback (operadoras desconhecidas)
+        valores = snapshot.precos_por_idade_centavos[:, :snapshot.operadora_padrao, indices]
+        totais = valores.sum(axis=2)
+        
+        return {
+            'tipos': list(snapshot.indice_tipo),
+            'operadoras': list(snapshot.indice_operadora),
+            'valores_totais_centavos': totais,
+            'versao_tabela': snapshot.versao,
+            'regras': snapshot.regras
+        }
+    
+    def calcular_grade(self) -> Dict:
+        """
+        Grade completa de preços por idade, operadora e tipo de contratação
+        
+        Returns:
+            Dict com tipos, operadoras, precos_por_idade_centavos (int64,
+            tipos x operadoras x idades, sem a linha de fallback),
+            versao_tabela e regras
+        """
+        snapshot = self._snapshot
+        return {
+            'tipos': list(snapshot.indice_tipo),
+            'operadoras': list(snapshot.indice_operadora),
+            'precos_por_idade_centavos': snapshot.precos_por_idade_centavos[:, :snapshot.operadora_padrao],
+            'versao_tabela': snapshot.versao,
+            'regras': snapshot.regras
+        }
+    
+    def calcular_projecao(
+        self,
+        idades: List[int],
+        tipo_contratacao: str,
+        operadoras: List[str],
+        anos: int
+    ) -> Dict:
+        """
+        Calcula o valor total da família ano a ano, com todos envelhecendo
+        juntos, para várias operadoras em uma única passada
+        
+        Os valores são os da tabela vigente (sem reajuste): a cada ano muda
+        apenas a faixa de preço de cada beneficiário.
+        
+        Args:
+            idades: Idades atuais dos beneficiários
+            tipo_contratacao: Tipo de contratação
+            operadoras: Operadoras a projetar
+            anos: Quantidade de anos além do atual
+            
+        Returns:
+            Dict com idades_por_ano (anos+1 x beneficiários),
+            valores_totais_centavos (int64, operadoras x anos+1) e
+            versao_tabela
+        """
+        snapshot = self._snapshot
+        indice_tipo = snapshot.indice_tipo.get(tipo_contratacao)
+        if indice_tipo is None:
+            raise ValueError(f"Tipo de contratação inválido: {tipo_contratacao}")
+        indices_operadora = [
+            snapshot.indice_operadora.get(op, snapshot.operadora_padrao) for op in operadoras
+        ]
+        
+        deslocamentos = np.arange(anos + 1)
+        idades_por_ano = np.minimum(
+            np.asarray(idades, dtype=np.intp)[None, :] + deslocamentos[:, None], IDADE_MAXIMA
+        )
+        # Histograma de idades de cada ano em um único bincount
+        contagens = np.bincount(
+            (idades_por_ano + deslocamentos[:, None] * (IDADE_MAXIMA + 1)).ravel(),
+            minlength=(anos + 1) * (IDADE_MAXIMA + 1)
+        ).reshape(anos + 1, IDADE_MAXIMA + 1)
+        tabelas = snapshot.precos_por_idade_centavos[indice_tipo, indices_operadora]
+        
+        return {
+            'idades_por_ano': idades_por_ano,
+            'valores_totais_centavos': tabelas @ contagens.T,
+            'versao_tabela': snapshot.versao,
+            'regras': snapshot.regras
+        }
+    
+    def buscar_planos(self, idades: List[int], limite: int, **restricoes) -> Dict:
+        """
+        Busca os planos do catálogo mais baratos para a família
+        
+        Os planos elegíveis saem dos índices de bitsets do snapshot; todos
+        são precificados em uma única passada, recebem o desconto das regras
+        de cotação (que pode variar por operadora e modalidade) e só os
+        `limite` de menor valor final são ordenados.
+        
+        Args:
+            idades: Idades dos beneficiários
+            limite: Quantidade de planos retornados
+            **restricoes: Filtros de IndiceBuscaPlanos.filtrar (operadoras,
+                modalidade, acomodacao, coparticipacao, abrangencia, hospitais)
+            
+        Returns:
+            Dict com planos (PlanoCatalogo), valores_totais_centavos e
+            descontos_centavos (List[int], alinhados a planos), elegiveis,
+            sem_preco e versao_tabela
+        """
+        snapshot = self._snapshot
+        if snapshot.busca_planos is None or not len(snapshot.catalogo):
+            raise ValueError("Catálogo de planos indisponível")
+        
+        contagem = np.bincount(np.asarray(idades, dtype=np.intp), minlength=IDADE_MAXIMA + 1)
+        indices = snapshot.busca_planos.filtrar(len(idades), **restricoes)
+        totais = snapshot.busca_planos.precificar(indices, contagem)
+        
+        com_preco = totais >= 0
+        indices, totais = indices[com_preco], totais[com_preco]
+        descontos = self._descontos_catalogo(snapshot, indices, totais, len(idades))
+        finais = totais - descontos
+        if len(finais) > limite:
+            menores = np.argpartition(finais, limite - 1)[:limite]
+            indices, totais, descontos, finais = (
+                indices[menores], totais[menores], descontos[menores], finais[menores]
             )
-            valores_individuais.append(valor)
+        ordem = np.lexsort((indices, finais))
         
-        valor_total = sum(valores_individuais)
+        return {
+            'planos': [snapshot.catalogo.planos[i] for i in indices[ordem].tolist()],
+            'valores_totais_centavos': totais[ordem].tolist(),
+            'descontos_centavos': descontos[ordem].tolist(),
+            'elegiveis': int(com_preco.size),
+            'sem_preco': int((~com_preco).sum()),
+            'versao_tabela': snapshot.versao,
+            'regras': snapshot.regras
+        }
+    
+    def precificar_planos(self, idades: List[int], planos: List[str]) -> Dict:
+        """
+        Precifica planos específicos do catálogo para a família
+        
+        Args:
+            idades: Idades dos beneficiários
+            planos: Ids dos planos no catálogo
+            
+        Returns:
+            Dict com planos (PlanoCatalogo), valores_totais_centavos e
+            descontos_centavos (np.ndarray, alinhados a planos) e versao_tabela
+            
+        Raises:
+            ValueError: Plano inexistente ou sem preço para alguma idade
+        """
+        snapshot = self._snapshot
+        if snapshot.busca_planos is None or not len(snapshot.catalogo):
+            raise ValueError("Catálogo de planos indisponível")
+        
+        indices = []
+        for plano_id in planos:
+            indice = snapshot.catalogo.indice_por_id(plano_id)
+            if indice is None:
+                raise ValueError(f"Plano não encontrado no catálogo: {plano_id}")
+            indices.append(indice)
+        indices = np.asarray(indices, dtype=np.intp)
+        
+        contagem = np.bincount(np.asarray(idades, dtype=np.intp), minlength=IDADE_MAXIMA + 1)
+        totais = snapshot.busca_planos.precificar(indices, contagem)
+        sem_preco = np.flatnonzero(totais < 0)
+        if sem_preco.size:
+            raise ValueError(
+                f"Plano sem preço para as idades informadas: {planos[int(sem_preco[0])]}"
+            )
         
         return {
-            'valores_individuais': valores_individuais,
-            'valor_total': Decimal(str(valor_total))
+            'planos': [snapshot.catalogo.planos[i] for i in indices.tolist()],
+            'valores_totais_centavos': totais,
+            'descontos_centavos': self._descontos_catalogo(snapshot, indices, totais, len(idades)),
+            'versao_tabela': snapshot.versao,
+            'regras': snapshot.regras
+        }
+    
+    @staticmethod
+    def _descontos_catalogo(
+        snapshot: SnapshotPrecos,
+        indices: np.ndarray,
+        totais: np.ndarray,
+        quantidade_vidas: int
+    ) -> np.ndarray:
+        """Desconto das regras de cotação para planos do catálogo (por operadora e modalidade)"""
+        regras = snapshot.regras
+        posicoes_tipo, posicoes_operadora = snapshot.posicoes_regras_catalogo
+        regra_desconto = regras.regras_desconto(
+            posicoes_tipo[indices], posicoes_operadora[indices], quantidade_vidas
+        )
+        return aplicar_taxa_array(totais, regras.pontos_desconto[regra_desconto])
+    
+    def calcular_censo(
+        self,
+        contagens_por_plano: Dict[Optional[str], np.ndarray],
+        tipo_contratacao: str,
+        operadoras: List[str]
+    ) -> Dict:
+        """
+        Precifica um censo agregado por idade para várias operadoras
+        
+        O custo de um censo é linear nas contagens por idade, então basta o
+        histograma (0-120) de cada plano informado: o cálculo não depende do
+        número de vidas.
+        
+        Args:
+            contagens_por_plano: Quantidade de vidas por idade (int64, 121
+                posições) para cada plano do censo; None = plano padrão
+            tipo_contratacao: Tipo de contratação
+            operadoras: Operadoras a precificar
+        
+        Returns:
+            Dict com valores_por_idade_centavos (int64, operadoras x idades:
+            soma paga pelas vidas de cada idade), erros (mensagem por índice
+            das operadoras que não puderam ser calculadas) e versao_tabela
+        """
+        snapshot = self._snapshot
+        valores = np.zeros((len(operadoras), IDADE_MAXIMA + 1), dtype=np.int64)
+        erros = {}
+        
+        for j, operadora in enumerate(operadoras):
+            for plano, contagem in contagens_por_plano.items():
+                indice_plano = snapshot.indice_plano_catalogo(operadora, plano)
+                if indice_plano is None:
+                    precos = snapshot.tabela_por_idade(tipo_contratacao, operadora)
+                else:
+                    precos = snapshot.catalogo.precos_por_idade_centavos[indice_plano]
+                    sem_preco = (precos < 0) & (contagem > 0)
+                    if sem_preco.any():
+                        idade = int(np.flatnonzero(sem_preco)[0])
+                        erros[j] = f"Plano {plano} não possui preço para a idade {idade}"
+                        continue
+                valores[j] += contagem * precos
+        
+        return {
+            'valores_por_idade_centavos': valores,
+            'erros': erros,
+            'versao_tabela': snapshot.versao,
+            'regras': snapshot.regras
         }
     
     def _calcular_valor_beneficiario(
@@ -84,29 +554,16 @@ class ServicoCalculoCotacao:
         Returns:
             Decimal: Valor calculado
         """
-        # Encontrar faixa etária
-        faixa = self.tabela_precos[
-            (self.tabela_precos['faixa_inicio'] <= idade) & 
-            (self.tabela_precos['faixa_fim'] >= idade)
-        ]
-        
-        if faixa.empty:
+        if idade < 0 or idade > IDADE_MAXIMA:
             raise ValueError(f"Faixa etária não encontrada para idade {idade}")
         
-        # Obter valor base
-        coluna_tipo = f'valor_base_{tipo_contratacao.lower()}'
-        valor_base = float(faixa.iloc[0][coluna_tipo])
-        
-        # Aplicar multiplicador da operadora
-        multiplicador = self.multiplicadores_operadora.get(operadora, 1.0)
-        valor_final = valor_base * multiplicador
-        
-        return Decimal(str(round(valor_final, 2)))
+        centavos = self._snapshot.tabela_por_idade(tipo_contratacao, operadora)[idade]
+        return para_decimal(centavos)
     
     def obter_faixas_etarias(self) -> pd.DataFrame:
         """Retorna as faixas etárias disponíveis"""
-        return self.tabela_precos[['faixa_inicio', 'faixa_fim']].copy()
+        return self._snapshot.tabela_precos[['faixa_inicio', 'faixa_fim']].copy()
     
     def obter_operadoras_disponiveis(self) -> List[str]:
         """Retorna lista de operadoras disponíveis"""
-        return list(self.multiplicadores_operadora.keys())
+        return list(self._snapshot.multiplicadores_operadora.keys())
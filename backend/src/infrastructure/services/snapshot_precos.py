@@ -0,0 +1,182 @@
+"""
+Snapshot de Preços
+Conjunto imutável e versionado das tabelas de preços compiladas
+"""
+import hashlib
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ...domain.entities.cotacao import TIPOS_CONTRATACAO
+from ...domain.value_objects.centavos import multiplicar_centavos
+from .busca_planos import IndiceBuscaPlanos, normalizar_termo
+from .catalogo_precos import CatalogoPrecos
+from .regras_cotacao import REGRAS_PADRAO, RegrasCotacao
+
+IDADE_MAXIMA = 120
+
+
+def classes_por_idade(assinatura: np.ndarray) -> np.ndarray:
+    """
+    Numera faixas de idades consecutivas com a mesma assinatura
+
+    Args:
+        assinatura: Matriz (n, 121); cada coluna descreve uma idade
+
+    Returns:
+        np.ndarray: Classe de cada idade (0-120), começando em 0
+    """
+    mudou = np.any(assinatura[:, 1:] != assinatura[:, :-1], axis=0)
+    classes = np.concatenate(([0], np.cumsum(mudou)))
+    classes.setflags(write=False)
+    return classes
+
+
+class SnapshotPrecos:
+    """
+    Versão imutável das tabelas de preços usadas no cálculo.
+
+    Um snapshot é montado inteiro fora do caminho das requisições e nunca é
+    alterado depois: o serviço de cálculo apenas troca a referência para um
+    snapshot novo. Quem já leu a referência continua usando a mesma versão
+    até o fim do cálculo.
+    """
+
+    def __init__(
+        self,
+        tabela_precos: pd.DataFrame,
+        multiplicadores_operadora: Dict[str, float],
+        catalogo: Optional[CatalogoPrecos] = None,
+        sequencia: int = 1,
+        regras: Optional[RegrasCotacao] = None
+    ):
+        """
+        Args:
+            tabela_precos: Tabela de origem (faixa_inicio, faixa_fim, valor_base_<tipo>)
+            multiplicadores_operadora: Multiplicador de preço por operadora
+            catalogo: Catálogo de planos reais compilado
+            sequencia: Número sequencial da carga no processo
+            regras: Regras de desconto/observação compiladas; padrão REGRAS_PADRAO
+        """
+        self.tabela_precos = tabela_precos
+        self.multiplicadores_operadora = dict(multiplicadores_operadora)
+        self.catalogo = catalogo
+        self.sequencia = sequencia
+        self.regras = regras if regras is not None else RegrasCotacao(REGRAS_PADRAO)
+        self.carregado_em = datetime.now()
+        self._compilar()
+        self.busca_planos = IndiceBuscaPlanos(catalogo) if catalogo is not None else None
+        self.posicoes_regras_catalogo = self._posicionar_catalogo_nas_regras()
+        self.classe_preco_por_idade = self._calcular_classes_preco()
+        self.versao = self._calcular_versao()
+
+    def _compilar(self):
+        """
+        Compila a tabela de preços em um tensor int64 de centavos
+        (tipo, operadora, idade).
+
+        Cada preço é o produto decimal exato valor_base x multiplicador,
+        arredondado para o centavo (ver domain.value_objects.centavos).
+
+        A última linha de operadora usa multiplicador 1.0 e atende operadoras
+        desconhecidas, preservando o comportamento anterior do `.get(..., 1.0)`.
+        """
+        self.indice_tipo = {tipo: i for i, tipo in enumerate(TIPOS_CONTRATACAO)}
+        self.indice_operadora = {
+            operadora: i for i, operadora in enumerate(self.multiplicadores_operadora)
+        }
+        self.operadora_padrao = len(self.indice_operadora)
+
+        idades = np.arange(IDADE_MAXIMA + 1)
+        posicao_faixa = np.searchsorted(
+            self.tabela_precos['faixa_fim'].to_numpy(), idades, side='left'
+        )
+        if (self.tabela_precos['faixa_inicio'].to_numpy()[posicao_faixa] > idades).any():
+            raise ValueError("Tabela de preços não cobre todas as idades de 0 a 120")
+
+        multiplicadores = list(self.multiplicadores_operadora.values()) + [1.0]
+        tabela = np.empty(
+            (len(TIPOS_CONTRATACAO), len(multiplicadores), IDADE_MAXIMA + 1), dtype=np.int64
+        )
+        for tipo, i in self.indice_tipo.items():
+            valores_base = self.tabela_precos[f'valor_base_{tipo.lower()}'].to_numpy(dtype=float)
+            for j, multiplicador in enumerate(multiplicadores):
+                # Um preço por faixa; o produto é exato e arredondado uma única vez
+                por_faixa = np.array(
+                    [multiplicar_centavos(float(v), float(multiplicador)) for v in valores_base],
+                    dtype=np.int64
+                )
+                tabela[i, j] = por_faixa[posicao_faixa]
+
+        tabela.setflags(write=False)
+        self.precos_por_idade_centavos = tabela
+
+    def _posicionar_catalogo_nas_regras(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Posição de cada plano do catálogo nas tabelas das regras de cotação:
+        tipo (pela modalidade do plano) e operadora (pelo nome ou id)
+        """
+        planos = self.catalogo.planos if self.catalogo is not None else []
+        tipos = np.array(
+            [self.regras.posicao_tipo(normalizar_termo(p.modalidade).upper()) for p in planos],
+            dtype=np.intp
+        )
+        # Operadoras sem regra ficam na última posição: min() prefere a que tem regra
+        operadoras = np.array(
+            [
+                min(self.regras.posicao_operadora(p.operadora_nome), self.regras.posicao_operadora(p.operadora_id))
+                for p in planos
+            ],
+            dtype=np.intp
+        )
+        return tipos, operadoras
+
+    def _calcular_classes_preco(self) -> np.ndarray:
+        """
+        Agrupa idades consecutivas que têm o mesmo preço em todas as tabelas
+        (tipo x operadora e planos do catálogo). Duas famílias com o mesmo
+        histograma de classes custam o mesmo em qualquer tabela.
+        """
+        linhas = [self.precos_por_idade_centavos.reshape(-1, IDADE_MAXIMA + 1)]
+        if self.catalogo is not None and len(self.catalogo):
+            linhas.append(self.catalogo.precos_por_idade_centavos)
+        return classes_por_idade(np.vstack(linhas))
+
+    def _calcular_versao(self) -> str:
+        """Versão derivada do conteúdo: mesmas tabelas geram a mesma versão"""
+        digest = hashlib.sha256()
+        digest.update(self.precos_por_idade_centavos.tobytes())
+        digest.update("|".join(self.multiplicadores_operadora).encode())
+        digest.update(self.regras.versao.encode())
+        if self.catalogo is not None:
+            digest.update(self.catalogo.precos_faixa_centavos.tobytes())
+            digest.update(self.catalogo.limites_faixa.tobytes())
+            digest.update("|".join(p.id for p in self.catalogo.planos).encode())
+        return digest.hexdigest()[:12]
+
+    def tabela_por_idade(self, tipo_contratacao: str, operadora: str) -> np.ndarray:
+        """Retorna o array de preços (centavos) por idade do par (tipo, operadora)"""
+        i = self.indice_tipo.get(tipo_contratacao)
+        if i is None:
+            raise ValueError(f"Tipo de contratação inválido: {tipo_contratacao}")
+        j = self.indice_operadora.get(operadora, self.operadora_padrao)
+        return self.precos_por_idade_centavos[i, j]
+
+    def indice_plano_catalogo(self, operadora: str, plano: Optional[str]) -> Optional[int]:
+        """Índice do plano no catálogo, ou None se a cotação usa a tabela padrão"""
+        if self.catalogo is None:
+            return None
+        return self.catalogo.indice_plano(operadora, plano)
+
+    def resumo(self) -> Dict:
+        """Metadados da versão para exibição"""
+        return {
+            "versao": self.versao,
+            "sequencia": self.sequencia,
+            "carregado_em": self.carregado_em.isoformat(),
+            "operadoras": len(self.indice_operadora),
+            "versao_regras": self.regras.versao,
+            "planos_catalogo": len(self.catalogo) if self.catalogo is not None else 0
+        }
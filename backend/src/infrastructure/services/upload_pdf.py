@@ -0,0 +1,292 @@
+"""
+Upload de PDFs
+Leitura do corpo multipart à medida que os bytes chegam: o limite de
+tamanho e o cabeçalho %PDF são verificados no caminho, e o conteúdo acima
+de um limiar vai para um arquivo temporário em vez da memória
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+import weakref
+from typing import IO, AsyncIterator, List, Mapping, Optional, Tuple, Union
+
+import multipart
+from multipart.multipart import parse_options_header
+
+from .pool_extracao_pdf import OrigemPDF
+
+logger = logging.getLogger(__name__)
+
+# Todo arquivo PDF começa por esses bytes
+CABECALHO_PDF = b"%PDF"
+
+# Bytes do corpo multipart além do arquivo (boundaries e cabeçalhos das partes)
+FOLGA_MULTIPART = 64 * 1024
+
+# Diretório só dos uploads em arquivo temporário (limpo no início da aplicação)
+DIRETORIO_PADRAO = os.path.join(tempfile.gettempdir(), "uploads_pdf")
+PREFIXO_ARQUIVO = "upload_"
+
+
+class ArquivoMuitoGrandeError(Exception):
+    """Upload acima do limite; recusado sem ler o restante do corpo"""
+
+    def __init__(self, tamanho_maximo: int):
+        super().__init__(f"Arquivo muito grande. Máximo: {tamanho_maximo // (1024 * 1024)}MB")
+        self.tamanho_maximo = tamanho_maximo
+
+
+def diretorio_uploads() -> str:
+    """Diretório dos arquivos temporários (env PDF_UPLOAD_DIR)"""
+    return os.getenv("PDF_UPLOAD_DIR") or DIRETORIO_PADRAO
+
+
+def limpar_uploads_orfaos(idade_minima_segundos: float = 3600, diretorio: Optional[str] = None) -> int:
+    """
+    Remove arquivos temporários deixados por um processo que caiu no meio
+    de um upload
+
+    Só saem os mais antigos que `idade_minima_segundos`: com vários workers
+    do servidor no mesmo diretório, os uploads em andamento dos outros
+    processos ficam.
+
+    Returns:
+        int: Arquivos removidos
+    """
+    diretorio = diretorio or diretorio_uploads()
+    limite = time.time() - idade_minima_segundos
+    removidos = 0
+    try:
+        entradas = list(os.scandir(diretorio))
+    except FileNotFoundError:
+        return 0
+    for entrada in entradas:
+        try:
+            if entrada.name.startswith(PREFIXO_ARQUIVO) and entrada.stat().st_mtime < limite:
+                os.unlink(entrada.path)
+                removidos += 1
+        except FileNotFoundError:
+            continue
+    if removidos:
+        logger.info(f"🧹 {removidos} upload(s) de PDF temporário(s) órfão(s) removido(s)")
+    return removidos
+
+
+def _remover_arquivo(caminho: str):
+    try:
+        os.unlink(caminho)
+    except FileNotFoundError:
+        pass
+
+
+class PDFRecebido:
+    """
+    PDF recebido no upload: em memória até `limiar_memoria` bytes e, acima
+    disso, em um arquivo temporário que o worker de extração lê direto do
+    disco (sem passar os bytes pelo processo da API).
+
+    O SHA-256 é calculado durante o recebimento (chave do cache de
+    extrações). O arquivo temporário tem contagem de referências: quem
+    recebe o PDF chama `descartar` ao terminar, e uma extração compartilhada
+    pelo cache chama `reter` e o libera só ao concluir, então continua com o
+    arquivo mesmo que a requisição que o enviou desista. O arquivo sai
+    quando a última referência é liberada, quando o objeto deixa de ser
+    referenciado ou, após uma queda do processo, em limpar_uploads_orfaos.
+    """
+
+    def __init__(self, arquivo: str, limiar_memoria: int, diretorio: Optional[str] = None):
+        """
+        Args:
+            arquivo: Nome do arquivo enviado
+            limiar_memoria: Bytes mantidos em memória antes de ir para o disco
+            diretorio: Diretório do arquivo temporário (padrão: diretorio_uploads())
+        """
+        self.arquivo = arquivo
+        self.limiar_memoria = limiar_memoria
+        self.diretorio = diretorio or diretorio_uploads()
+        self.tamanho = 0
+        self.caminho: Optional[str] = None
+        self._memoria = bytearray()
+        self._disco: Optional[IO[bytes]] = None
+        self._resumo = hashlib.sha256()
+        self._remover: Optional[weakref.finalize] = None
+        self._referencias = 1
+
+    @property
+    def em_disco(self) -> bool:
+        return self.caminho is not None
+
+    def excede_memoria(self, tamanho: int) -> bool:
+        """Se escrever mais `tamanho` bytes usa o disco (e deve ir para uma thread)"""
+        return self.em_disco or self.tamanho + tamanho > self.limiar_memoria
+
+    def escrever(self, dados: bytes):
+        """Acrescenta bytes ao PDF, passando para o disco ao atingir o limiar"""
+        self._resumo.update(dados)
+        self.tamanho += len(dados)
+        if self._disco is None and self.tamanho > self.limiar_memoria:
+            os.makedirs(self.diretorio, exist_ok=True)
+            self._disco = tempfile.NamedTemporaryFile(
+                prefix=PREFIXO_ARQUIVO, suffix=".pdf", dir=self.diretorio, delete=False
+            )
+            self.caminho = self._disco.name
+            self._remover = weakref.finalize(self, _remover_arquivo, self.caminho)
+            self._disco.write(self._memoria)
+            self._memoria = bytearray()
+        if self._disco is None:
+            self._memoria += dados
+        else:
+            self._disco.write(dados)
+
+    def finalizar(self):
+        """Fecha o arquivo temporário para a leitura pelo worker"""
+        if self._disco is not None:
+            self._disco.close()
+
+    def reter(self):
+        """Acrescenta uma referência ao arquivo temporário (liberada com `descartar`)"""
+        self._referencias += 1
+
+    def descartar(self):
+        """Libera uma referência; a última remove o arquivo temporário (se houver)"""
+        self._referencias -= 1
+        if self._referencias > 0:
+            return
+        if self._disco is not None:
+            self._disco.close()
+        if self._remover is not None:
+            self._remover()
+
+    @property
+    def sha256(self) -> str:
+        return self._resumo.hexdigest()
+
+    @property
+    def origem(self) -> OrigemPDF:
+        """O que vai para o worker de extração: os bytes ou o caminho do arquivo"""
+        return self.caminho if self.em_disco else bytes(self._memoria)
+
+
+# O pipeline aceita os bytes (lote, jobs) ou o PDF recebido em partes
+ConteudoPDF = Union[bytes, PDFRecebido]
+
+
+async def receber_pdf(
+    headers: Mapping[str, str],
+    corpo: AsyncIterator[bytes],
+    tamanho_maximo: int,
+    campo: str = "file",
+    limiar_memoria: Optional[int] = None
+) -> PDFRecebido:
+    """
+    Lê o PDF do campo `campo` de um corpo multipart/form-data à medida que
+    ele chega, sem manter o corpo inteiro em memória
+
+    A leitura para assim que o Content-Length ou os bytes recebidos passam
+    do limite, ou que o início do arquivo mostra que ele não é um PDF.
+    Outros campos do formulário são ignorados.
+
+    Args:
+        headers: Cabeçalhos da requisição
+        corpo: Blocos do corpo (Request.stream())
+        tamanho_maximo: Bytes aceitos no arquivo
+        campo: Campo do formulário com o PDF
+        limiar_memoria: Bytes mantidos em memória antes de ir para um
+            arquivo temporário (padrão: env PDF_UPLOAD_MEMORIA_KB ou 1024 KB)
+
+    Returns:
+        PDFRecebido
+
+    Raises:
+        ArquivoMuitoGrandeError: Corpo ou arquivo acima do limite
+        ValueError: Corpo não multipart, campo ausente ou arquivo que não é PDF
+    """
+    limiar_memoria = limiar_memoria or int(os.getenv("PDF_UPLOAD_MEMORIA_KB", "1024")) * 1024
+    limite_corpo = tamanho_maximo + FOLGA_MULTIPART
+    if int(headers.get("content-length") or 0) > limite_corpo:
+        raise ArquivoMuitoGrandeError(tamanho_maximo)
+
+    _, parametros = parse_options_header(headers.get("content-type", ""))
+    boundary = parametros.get(b"boundary")
+    if not boundary:
+        raise ValueError("Envie o PDF como multipart/form-data")
+
+    # Os callbacks do parser só registram; o processamento (que pode ir ao disco) é assíncrono
+    eventos: List[Tuple[str, bytes]] = []
+    cabecalho = {"nome": b"", "valor": b""}
+
+    def on_header_field(data: bytes, start: int, end: int):
+        cabecalho["nome"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        cabecalho["valor"] += data[start:end]
+
+    def on_header_end():
+        if cabecalho["nome"].lower() == b"content-disposition":
+            eventos.append(("disposicao", cabecalho["valor"]))
+        cabecalho["nome"] = cabecalho["valor"] = b""
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": lambda: eventos.append(("inicio", b"")),
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_part_data": lambda data, start, end: eventos.append(("dados", data[start:end])),
+        "on_part_end": lambda: eventos.append(("fim", b"")),
+    })
+
+    pdf: Optional[PDFRecebido] = None
+    lendo_pdf = False
+    completo = False
+    inicio = b""
+    recebidos = 0
+    try:
+        async for bloco in corpo:
+            recebidos += len(bloco)
+            if recebidos > limite_corpo:
+                raise ArquivoMuitoGrandeError(tamanho_maximo)
+            try:
+                parser.write(bloco)
+            except Exception as e:
+                raise ValueError(f"Corpo multipart inválido: {e}")
+
+            for evento, dados in eventos:
+                if evento == "inicio":
+                    lendo_pdf = False
+                elif evento == "disposicao":
+                    _, opcoes = parse_options_header(dados)
+                    if pdf is None and opcoes.get(b"name", b"").decode("latin-1") == campo:
+                        nome = opcoes.get(b"filename", b"").decode("utf-8", "replace")
+                        if not nome.lower().endswith(".pdf"):
+                            raise ValueError("Apenas arquivos PDF são aceitos")
+                        pdf = PDFRecebido(nome, limiar_memoria)
+                        lendo_pdf = True
+                elif evento == "dados" and lendo_pdf:
+                    if len(inicio) < len(CABECALHO_PDF):
+                        inicio += dados[:len(CABECALHO_PDF) - len(inicio)]
+                        if inicio != CABECALHO_PDF[:len(inicio)]:
+                            raise ValueError("O arquivo enviado não é um PDF válido")
+                    if pdf.tamanho + len(dados) > tamanho_maximo:
+                        raise ArquivoMuitoGrandeError(tamanho_maximo)
+                    if pdf.excede_memoria(len(dados)):
+                        await asyncio.to_thread(pdf.escrever, dados)
+                    else:
+                        pdf.escrever(dados)
+                elif evento == "fim" and lendo_pdf:
+                    lendo_pdf = False
+                    completo = True
+            eventos.clear()
+
+        if pdf is None or not completo:
+            raise ValueError(f"Envie o PDF no campo '{campo}' do formulário")
+        if inicio != CABECALHO_PDF:
+            raise ValueError("O arquivo enviado não é um PDF válido")
+        pdf.finalizar()
+        return pdf
+    except BaseException:
+        if pdf is not None:
+            pdf.descartar()
+        raise
@@ -2,10 +2,44 @@
 Controller de Cotação
 Gerencia as requisições relacionadas a cotações
 """
-from fastapi import HTTPException
+import json
+import os
+import struct
+from typing import BinaryIO, Dict, Optional, Tuple
+import numpy as np
+from fastapi import HTTPException, Response
+from pydantic import ValidationError
 from ...application.use_cases.calcular_cotacao_use_case import CalcularCotacaoUseCase
-from ...application.dtos.cotacao_dto import CotacaoInputDTO, CotacaoOutputDTO
+from ...application.use_cases.cache_cotacao import CacheCotacao
+from ...application.dtos.cotacao_dto import (
+    CotacaoInputDTO,
+    CotacaoOutputDTO,
+    CotacaoLoteInputDTO,
+    CotacaoLoteItemDTO,
+    CotacaoLoteOutputDTO,
+    ComparacaoInputDTO,
+    ComparacaoOutputDTO,
+    CensoInputDTO,
+    CensoOutputDTO,
+    ProjecaoInputDTO,
+    ProjecaoOutputDTO,
+    BuscaPlanosInputDTO,
+    BuscaPlanosOutputDTO,
+    GradePrecosDTO,
+    SimulacaoCoparticipacaoInputDTO,
+    SimulacaoCoparticipacaoOutputDTO,
+)
 from ...infrastructure.services.servico_calculo_cotacao import ServicoCalculoCotacao
+from ...infrastructure.services.catalogo_precos import carregar_catalogo_precos
+from ...infrastructure.services.regras_cotacao import carregar_regras_cotacao
+from ...infrastructure.services.cache_lru import CacheLRU
+from ...infrastructure.services.leitor_censo import ler_censo_em_blocos
+from ...infrastructure.services.supabase_service import supabase_service
+
+# Formato binário da grade: "GRD1", uint32 LE com o tamanho do cabeçalho
+# JSON e, após o cabeçalho, os blocos descritos nele (alinhados em 4 bytes)
+MAGICA_GRADE = b"GRD1"
+TIPOS_GRADE = {"json": "application/json", "binario": "application/octet-stream"}
 
 
 class CotacaoController:
@@ -13,8 +47,22 @@ class CotacaoController:
     
     def __init__(self):
         """Inicializa o controller com suas dependências"""
-        self.servico_calculo = ServicoCalculoCotacao()
+        # Catálogo e regras lidos na inicialização e nas recargas (banco ou arquivo local)
+        self.servico_calculo = ServicoCalculoCotacao(
+            fonte_catalogo=lambda: carregar_catalogo_precos(supabase_service.client),
+            fonte_regras=lambda: carregar_regras_cotacao(supabase_service.client)
+        )
         self.use_case = CalcularCotacaoUseCase(self.servico_calculo)
+        # Grade codificada por formato: (versão, corpo)
+        self._grade_codificada: Dict[str, Tuple[str, bytes]] = {}
+        self.cache = CacheCotacao(
+            self.use_case,
+            self.servico_calculo,
+            CacheLRU(
+                tamanho_maximo=int(os.getenv("COTACAO_CACHE_TAMANHO", "10000")),
+                ttl_segundos=float(os.getenv("COTACAO_CACHE_TTL", "300"))
+            )
+        )
     
     async def calcular_cotacao(self, input_dto: CotacaoInputDTO) -> CotacaoOutputDTO:
         """
@@ -27,13 +75,259 @@ class CotacaoController:
             CotacaoOutputDTO: Resultado do cálculo
         """
         try:
-            resultado = await self.use_case.execute(input_dto)
+            resultado = await self.cache.execute(input_dto)
             return resultado
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao calcular cotação: {str(e)}")
     
+    async def calcular_cotacao_lote(self, input_dto: CotacaoLoteInputDTO) -> CotacaoLoteOutputDTO:
+        """
+        Endpoint para calcular várias cotações em lote
+        
+        Cada item é validado individualmente; itens inválidos são reportados
+        com seu erro e os demais são calculados em uma única passada.
+        
+        Args:
+            input_dto: Lista de cotações no formato de CotacaoInputDTO
+            
+        Returns:
+            CotacaoLoteOutputDTO: Um resultado por item, na ordem de entrada
+        """
+        resultados: list = [None] * len(input_dto.cotacoes)
+        validos = []
+        indices_validos = []
+        
+        for indice, item in enumerate(input_dto.cotacoes):
+            try:
+                validos.append(CotacaoInputDTO(**item))
+                indices_validos.append(indice)
+            except (ValidationError, TypeError) as e:
+                resultados[indice] = CotacaoLoteItemDTO(
+                    indice=indice,
+                    sucesso=False,
+                    erro=self._formatar_erro_validacao(e)
+                )
+        
+        try:
+            cotacoes = await self.use_case.execute_lote(validos)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao calcular lote: {str(e)}")
+        
+        sucessos = 0
+        for indice, cotacao in zip(indices_validos, cotacoes):
+            if isinstance(cotacao, ValueError):
+                resultados[indice] = CotacaoLoteItemDTO(indice=indice, sucesso=False, erro=str(cotacao))
+            else:
+                resultados[indice] = CotacaoLoteItemDTO(indice=indice, sucesso=True, cotacao=cotacao)
+                sucessos += 1
+        
+        return CotacaoLoteOutputDTO(
+            total=len(resultados),
+            sucessos=sucessos,
+            falhas=len(resultados) - sucessos,
+            resultados=resultados
+        )
+    
+    async def comparar_cotacoes(self, input_dto: ComparacaoInputDTO) -> ComparacaoOutputDTO:
+        """
+        Endpoint para comparar todas as operadoras e tipos de contratação
+        
+        Args:
+            input_dto: Idades da família
+            
+        Returns:
+            ComparacaoOutputDTO: Matriz de preços ordenada por valor_final
+        """
+        try:
+            return await self.use_case.comparar(input_dto)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao comparar cotações: {str(e)}")
+    
+    async def projetar_custos(self, input_dto: ProjecaoInputDTO) -> ProjecaoOutputDTO:
+        """
+        Endpoint para projetar o custo da família nos próximos anos
+        
+        Args:
+            input_dto: Idades, tipo, horizonte e reajustes por operadora
+            
+        Returns:
+            ProjecaoOutputDTO: Custos ano a ano por operadora
+        """
+        try:
+            return await self.use_case.projetar(input_dto)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao projetar custos: {str(e)}")
+    
+    async def buscar_planos(self, input_dto: BuscaPlanosInputDTO) -> BuscaPlanosOutputDTO:
+        """
+        Endpoint para buscar os planos mais baratos do catálogo
+        
+        Args:
+            input_dto: Idades e restrições da busca
+            
+        Returns:
+            BuscaPlanosOutputDTO: Planos ordenados por valor_final
+        """
+        try:
+            return await self.use_case.buscar_planos(input_dto)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao buscar planos: {str(e)}")
+    
+    async def simular_coparticipacao(
+        self,
+        input_dto: SimulacaoCoparticipacaoInputDTO
+    ) -> SimulacaoCoparticipacaoOutputDTO:
+        """
+        Endpoint para simular o custo anual com coparticipação
+        
+        Args:
+            input_dto: Família, planos candidatos e parâmetros de utilização
+            
+        Returns:
+            SimulacaoCoparticipacaoOutputDTO: Planos ordenados por custo médio
+        """
+        try:
+            return await self.use_case.simular_coparticipacao(input_dto)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao simular coparticipação: {str(e)}")
+    
+    async def cotar_censo(self, input_dto: CensoInputDTO, arquivo: BinaryIO) -> CensoOutputDTO:
+        """
+        Endpoint para cotar um censo de empresa enviado em CSV
+        
+        Args:
+            input_dto: Tipo de contratação e operadoras
+            arquivo: Arquivo CSV do censo (binário)
+            
+        Returns:
+            CensoOutputDTO: Cotação agregada por operadora e faixa etária
+        """
+        try:
+            return await self.use_case.execute_censo(input_dto, ler_censo_em_blocos(arquivo))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao cotar censo: {str(e)}")
+    
+    @staticmethod
+    def _formatar_erro_validacao(erro: Exception) -> str:
+        """Resume um erro de validação em uma mensagem legível"""
+        if isinstance(erro, ValidationError):
+            return "; ".join(
+                f"{'.'.join(str(p) for p in e['loc']) or 'cotacao'}: {e['msg']}"
+                for e in erro.errors()
+            )
+        return str(erro)
+    
+    async def grade_precos(self, formato: str = "json", if_none_match: Optional[str] = None) -> Response:
+        """
+        Endpoint para exportar a grade de preços com GET condicional
+        
+        O ETag é forte e derivado da versão da tabela de preços (que inclui
+        as regras), de modo que navegadores e CDNs podem guardar a grade e
+        revalidá-la com If-None-Match; enquanto a versão não muda a
+        resposta é 304 sem corpo. A grade codificada é guardada por versão.
+        
+        Args:
+            formato: json (colunas) ou binario (arrays tipados)
+            if_none_match: Header If-None-Match da requisição
+            
+        Returns:
+            Response: 200 com a grade ou 304
+        """
+        if formato not in TIPOS_GRADE:
+            raise HTTPException(status_code=400, detail=f"Formato deve ser um de: {list(TIPOS_GRADE)}")
+        
+        cabecalhos = {"Cache-Control": f"public, max-age={int(os.getenv('GRADE_PRECOS_MAX_AGE', '300'))}"}
+        etag = f'"{self.servico_calculo.versao_tabela}-{formato}"'
+        if self._etag_confere(if_none_match, etag):
+            return Response(status_code=304, headers={**cabecalhos, "ETag": etag})
+        
+        try:
+            versao, corpo = self._grade_codificada.get(formato, (None, None))
+            if versao != self.servico_calculo.versao_tabela:
+                grade = await self.use_case.exportar_grade()
+                versao, corpo = grade.versao_tabela, self._codificar_grade(grade, formato)
+                self._grade_codificada[formato] = (versao, corpo)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao exportar grade de preços: {str(e)}")
+        
+        return Response(
+            content=corpo,
+            media_type=TIPOS_GRADE[formato],
+            headers={**cabecalhos, "ETag": f'"{versao}-{formato}"'}
+        )
+    
+    @staticmethod
+    def _etag_confere(if_none_match: Optional[str], etag: str) -> bool:
+        """Comparação fraca do If-None-Match (RFC 9110), que aceita lista e *"""
+        if not if_none_match:
+            return False
+        candidatos = [c.strip() for c in if_none_match.split(",")]
+        return "*" in candidatos or etag in (c[2:] if c.startswith("W/") else c for c in candidatos)
+    
+    @staticmethod
+    def _codificar_grade(grade: GradePrecosDTO, formato: str) -> bytes:
+        """
+        Codifica a grade em JSON compacto ou no formato binário: cabeçalho
+        JSON com os metadados e, em "blocos", nome/tipo/forma/posição de
+        cada array (precos_centavos em int32 e regra_por_vidas em int16,
+        little-endian), prontos para Int32Array/Int16Array no navegador
+        """
+        dados = grade.dict()
+        if formato == "json":
+            return json.dumps(dados, separators=(",", ":"), ensure_ascii=False).encode()
+        
+        forma = [len(grade.tipos), len(grade.operadoras)]
+        arrays = [
+            ("precos_centavos", np.array(dados.pop("precos_centavos"), dtype="<i4"),
+             forma + [grade.idade_maxima + 1]),
+            ("regra_por_vidas", np.array(dados["descontos"].pop("regra_por_vidas"), dtype="<i2"),
+             forma + [grade.descontos.limite_vidas + 1]),
+        ]
+        if grade.precos_centavos and max(grade.precos_centavos) >= 2 ** 31:
+            raise ValueError("Preço excede o limite do formato binário (int32)")
+        
+        blocos, posicao = [], 0
+        for nome, array, forma_array in arrays:
+            blocos.append({"nome": nome, "tipo": array.dtype.name, "forma": forma_array, "posicao": posicao})
+            posicao += -(-array.nbytes // 4) * 4
+        dados["blocos"] = blocos
+        
+        cabecalho = json.dumps(dados, separators=(",", ":"), ensure_ascii=False).encode()
+        cabecalho += b" " * (-(len(MAGICA_GRADE) + 4 + len(cabecalho)) % 4)
+        partes = [MAGICA_GRADE, struct.pack("<I", len(cabecalho)), cabecalho]
+        for _, array, _ in arrays:
+            partes.append(array.tobytes() + b"\0" * (-array.nbytes % 4))
+        return b"".join(partes)
+    
+    async def estatisticas_cache(self):
+        """Retorna os contadores do cache de cotações"""
+        return self.cache.estatisticas()
+    
+    async def versao_tabela_precos(self):
+        """Retorna metadados da versão vigente da tabela de preços"""
+        return self.servico_calculo.snapshot.resumo()
+    
+    async def recarregar_tabela_precos(self):
+        """Recarrega as tabelas de preços e publica a nova versão"""
+        try:
+            return await self.servico_calculo.recarregar_async()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao recarregar tabela de preços: {str(e)}")
+    
     async def listar_operadoras(self):
         """Lista operadoras disponíveis"""
         try:
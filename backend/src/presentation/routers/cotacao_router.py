@@ -2,9 +2,31 @@
 Router de Cotação
 Define as rotas da API relacionadas a cotações
 """
-from fastapi import APIRouter, status
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, File, Form, Header, HTTPException, Query, UploadFile, status
+from pydantic import ValidationError
 from ..controllers.cotacao_controller import CotacaoController
-from ...application.dtos.cotacao_dto import CotacaoInputDTO, CotacaoOutputDTO
+from ...application.dtos.cotacao_dto import (
+    CotacaoInputDTO,
+    CotacaoOutputDTO,
+    CotacaoLoteInputDTO,
+    CotacaoLoteOutputDTO,
+    MAX_COTACOES_LOTE,
+    ComparacaoInputDTO,
+    ComparacaoOutputDTO,
+    CensoInputDTO,
+    CensoOutputDTO,
+    ProjecaoInputDTO,
+    ProjecaoOutputDTO,
+    MAX_ANOS_PROJECAO,
+    BuscaPlanosInputDTO,
+    BuscaPlanosOutputDTO,
+    SimulacaoCoparticipacaoInputDTO,
+    SimulacaoCoparticipacaoOutputDTO,
+    MAX_SIMULACOES,
+)
 
 # Criar router
 router = APIRouter(
@@ -46,6 +68,238 @@ async def calcular_cotacao(input_dto: CotacaoInputDTO):
     return await cotacao_controller.calcular_cotacao(input_dto)
 
 
+@router.post(
+    "/calcular-lote",
+    response_model=CotacaoLoteOutputDTO,
+    status_code=status.HTTP_200_OK,
+    summary="Calcular Cotações em Lote",
+    description=f"""
+    Calcula até {MAX_COTACOES_LOTE} cotações em uma única chamada, em uma
+    passada vetorizada sobre todos os beneficiários.
+    
+    Retorna um resultado por item, na ordem de entrada. Itens inválidos
+    são reportados individualmente sem falhar o lote inteiro.
+    """
+)
+async def calcular_cotacao_lote(input_dto: CotacaoLoteInputDTO):
+    """
+    Endpoint POST /cotacao/calcular-lote
+    
+    Body exemplo:
+    ```json
+    {
+        "cotacoes": [
+            {"idades": [30, 5], "tipo": "ADESAO", "operadora": "AMIL"},
+            {"idades": [45, 42, 12], "tipo": "PME", "operadora": "BRADESCO"}
+        ]
+    }
+    ```
+    """
+    return await cotacao_controller.calcular_cotacao_lote(input_dto)
+
+
+@router.post(
+    "/comparar",
+    response_model=ComparacaoOutputDTO,
+    status_code=status.HTTP_200_OK,
+    summary="Comparar Operadoras e Tipos de Contratação",
+    description="""
+    Calcula, em uma única chamada, o valor da família para todas as
+    operadoras e todos os tipos de contratação (ADESAO, PME, EMPRESARIAL),
+    com descontos aplicados.
+    
+    Retorna as combinações ordenadas por valor_final.
+    """
+)
+async def comparar_cotacoes(input_dto: ComparacaoInputDTO):
+    """
+    Endpoint POST /cotacao/comparar
+    
+    Body exemplo:
+    ```json
+    {
+        "idades": [30, 5]
+    }
+    ```
+    """
+    return await cotacao_controller.comparar_cotacoes(input_dto)
+
+
+@router.post(
+    "/buscar-planos",
+    response_model=BuscaPlanosOutputDTO,
+    status_code=status.HTTP_200_OK,
+    summary="Buscar Planos Mais Baratos no Catálogo",
+    description="""
+    Filtra os planos do catálogo pelas restrições informadas (operadoras,
+    modalidade, acomodação, coparticipação, abrangência e hospitais da
+    rede) e pela quantidade de vidas da família (vidas_min/vidas_max),
+    precifica todos os elegíveis para a família e retorna os mais baratos.
+    
+    Nomes de hospitais são comparados sem acentos, pontuação ou caixa
+    ("Barra D'Or" equivale a "Barra DOr").
+    """
+)
+async def buscar_planos(input_dto: BuscaPlanosInputDTO):
+    """
+    Endpoint POST /cotacao/buscar-planos
+    
+    Body exemplo:
+    ```json
+    {
+        "idades": [38, 35, 8],
+        "acomodacao": "Apartamento",
+        "coparticipacao": false,
+        "hospitais": ["Copa D'Or"],
+        "limite": 3
+    }
+    ```
+    """
+    return await cotacao_controller.buscar_planos(input_dto)
+
+
+@router.post(
+    "/simular-coparticipacao",
+    response_model=SimulacaoCoparticipacaoOutputDTO,
+    status_code=status.HTTP_200_OK,
+    summary="Simular Custo Anual com Coparticipação",
+    description=f"""
+    Estima, por Monte Carlo, o custo anual da família (mensalidades +
+    coparticipação) em cada plano candidato do catálogo.
+    
+    A utilização (consultas, exames e internações) é sorteada por pessoa a
+    partir do perfil da sua faixa etária, com variação individual (mistura
+    Gamma-Poisson); os mesmos anos simulados valem para todos os planos.
+    Retorna custo médio, percentis (p10, p50, p90, p99) e a probabilidade
+    de cada plano ser o mais barato. Até {MAX_SIMULACOES} anos simulados.
+    """
+)
+async def simular_coparticipacao(input_dto: SimulacaoCoparticipacaoInputDTO):
+    """
+    Endpoint POST /cotacao/simular-coparticipacao
+    
+    Body exemplo:
+    ```json
+    {
+        "idades": [38, 35, 8],
+        "planos": ["amil-pme-amil-bronze-rj", "bradesco-pme-flex", "porto-pme-bronze-pro-copar"],
+        "teto_por_evento": 150.00,
+        "semente": 42
+    }
+    ```
+    """
+    return await cotacao_controller.simular_coparticipacao(input_dto)
+
+
+@router.post(
+    "/projetar",
+    response_model=ProjecaoOutputDTO,
+    status_code=status.HTTP_200_OK,
+    summary="Projetar Custo da Família nos Próximos Anos",
+    description=f"""
+    Projeta, ano a ano (até {MAX_ANOS_PROJECAO} anos), o valor da família em
+    cada operadora: todos os beneficiários envelhecem juntos e o reajuste
+    anual de cada operadora é aplicado de forma composta.
+    
+    Retorna os valores por ano e por operadora (ordenados pelo último ano)
+    e os anos em que algum beneficiário muda de faixa etária.
+    """
+)
+async def projetar_custos(input_dto: ProjecaoInputDTO):
+    """
+    Endpoint POST /cotacao/projetar
+    
+    Body exemplo:
+    ```json
+    {
+        "idades": [38, 35, 8],
+        "tipo": "PME",
+        "anos": 10,
+        "reajustes": {"AMIL": 0.12, "BRADESCO": 0.09},
+        "reajuste_padrao": 0.10
+    }
+    ```
+    """
+    return await cotacao_controller.projetar_custos(input_dto)
+
+
+@router.post(
+    "/censo",
+    response_model=CensoOutputDTO,
+    status_code=status.HTTP_200_OK,
+    summary="Cotar Censo de Empresa (CSV)",
+    description="""
+    Cota um censo de funcionários (PME/EMPRESARIAL) enviado como CSV, com
+    as colunas idade, vinculo (TITULAR, DEPENDENTE ou AGREGADO) e plano
+    (opcional). O arquivo é lido em blocos e agregado por idade, sem montar
+    um objeto por vida.
+    
+    Retorna, por operadora, o total com descontos e o valor por faixa
+    etária, além da contagem de vidas por faixa e por vínculo. Linhas
+    inválidas são contadas e descritas sem derrubar o censo.
+    """
+)
+async def cotar_censo(
+    arquivo: UploadFile = File(..., description="CSV do censo (idade, vinculo, plano)"),
+    tipo: str = Form(..., description="PME ou EMPRESARIAL"),
+    operadoras: Optional[str] = Form(None, description="Operadoras separadas por vírgula (padrão: todas)")
+):
+    """
+    Endpoint POST /cotacao/censo (multipart/form-data)
+    
+    CSV exemplo:
+    ```
+    idade;vinculo;plano
+    34;TITULAR;
+    8;DEPENDENTE;
+    ```
+    """
+    if not arquivo.filename.lower().endswith('.csv'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Apenas arquivos CSV são aceitos"
+        )
+    
+    try:
+        input_dto = CensoInputDTO(
+            tipo=tipo,
+            operadoras=operadoras.split(",") if operadoras else None
+        )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=cotacao_controller._formatar_erro_validacao(e)
+        )
+    
+    return await cotacao_controller.cotar_censo(input_dto, arquivo.file)
+
+
+@router.get(
+    "/grade",
+    status_code=status.HTTP_200_OK,
+    summary="Grade de Preços para Cotação no Cliente",
+    description="""
+    Retorna a grade completa de preços (idade 0-120 x operadora x tipo de
+    contratação) com as regras de desconto e observação, para que o
+    frontend cote localmente enquanto o usuário digita as idades.
+    
+    - formato=json: colunas em JSON (arrays achatados)
+    - formato=binario: arrays tipados (ver CotacaoController._codificar_grade)
+    
+    A resposta tem ETag forte ligado à versão da tabela de preços e aceita
+    GET condicional (If-None-Match -> 304).
+    """
+)
+async def grade_precos(
+    formato: str = Query("json", description="json ou binario"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Endpoint GET /cotacao/grade
+    """
+    return await cotacao_controller.grade_precos(formato, if_none_match)
+
+
 @router.get(
     "/operadoras",
     status_code=status.HTTP_200_OK,
@@ -59,6 +313,56 @@ async def listar_operadoras():
     return await cotacao_controller.listar_operadoras()
 
 
+@router.get(
+    "/cache",
+    status_code=status.HTTP_200_OK,
+    summary="Estatísticas do Cache de Cotações",
+    description="Retorna acertos, falhas, remoções e invalidações do cache de cotações"
+)
+async def estatisticas_cache():
+    """
+    Endpoint GET /cotacao/cache
+    """
+    return await cotacao_controller.estatisticas_cache()
+
+
+@router.get(
+    "/tabela-precos",
+    status_code=status.HTTP_200_OK,
+    summary="Versão da Tabela de Preços",
+    description="Retorna a versão vigente da tabela de preços e quando foi carregada"
+)
+async def versao_tabela_precos():
+    """
+    Endpoint GET /cotacao/tabela-precos
+    """
+    return await cotacao_controller.versao_tabela_precos()
+
+
+@router.post(
+    "/tabela-precos/recarregar",
+    status_code=status.HTTP_200_OK,
+    summary="Recarregar Tabela de Preços",
+    description="""
+    Recarrega tabelas de preços e catálogo sem reiniciar o processo.
+    A nova versão é montada fora do caminho das cotações e publicada de
+    uma vez; cotações em andamento terminam com a versão anterior.
+    
+    Exige o header X-Admin-Token igual a ADMIN_TOKEN; sem ADMIN_TOKEN
+    configurado, a rota responde 403.
+    """
+)
+async def recarregar_tabela_precos(x_admin_token: Optional[str] = Header(None)):
+    """
+    Endpoint POST /cotacao/tabela-precos/recarregar
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    # Sem token configurado a rota fica fechada; comparação em tempo constante
+    if not token or not hmac.compare_digest((x_admin_token or "").encode(), token.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token de administração inválido")
+    return await cotacao_controller.recarregar_tabela_precos()
+
+
 @router.get(
     "/health",
     status_code=status.HTTP_200_OK,
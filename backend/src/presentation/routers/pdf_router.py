@@ -1,9 +1,57 @@
 """
 Router para processamento de PDFs
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
-from ...application.dtos.pdf_dto import PDFExtraidoDTO
+import asyncio
+from typing import AsyncIterator, Awaitable, Dict, List, Tuple, TypeVar
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from ...application.dtos.pdf_dto import PDFExtraidoDTO, PDFJobDTO, PDFLoteItemDTO
 from ...infrastructure.services.ai_service import ai_service
+from ...infrastructure.services.fila_jobs_pdf import STATUS_PROCESSANDO, FilaJobsPDF
+from ...infrastructure.services.pool_extracao_pdf import ExtracaoSaturadaError
+from ...infrastructure.services.upload_pdf import (
+    CABECALHO_PDF,
+    ArquivoMuitoGrandeError,
+    PDFRecebido,
+    receber_pdf,
+)
+
+# Intervalo (segundos) entre as verificações de desconexão do cliente
+INTERVALO_DESCONEXAO = 0.5
+# Status (convenção do nginx) registrado quando o cliente desiste da requisição
+STATUS_CLIENTE_DESCONECTADO = 499
+# Tamanho máximo de cada PDF
+TAMANHO_MAXIMO_BYTES = 10 * 1024 * 1024  # 10MB
+# Blocos lidos de cada arquivo do lote e dos jobs
+TAMANHO_BLOCO_LEITURA = 64 * 1024
+# Arquivos aceitos em um lote
+MAX_ARQUIVOS_LOTE = 20
+# Intervalo (segundos) dos comentários que mantêm o stream SSE aberto no balanceador
+INTERVALO_HEARTBEAT_SSE = 15
+
+T = TypeVar("T")
+
+# Corpo de /pdf/extrair na documentação (a rota lê o multipart em partes, sem UploadFile)
+CORPO_UPLOAD_PDF = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {
+                            "type": "string",
+                            "format": "binary",
+                            "description": "Arquivo PDF da apólice ou proposta"
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
 
 # Criar router
 router = APIRouter(
@@ -11,12 +59,120 @@ router = APIRouter(
     tags=["PDF"]
 )
 
+# Fila de extrações assíncronas (workers iniciados no startup da aplicação)
+fila_jobs = FilaJobsPDF.do_ambiente(ai_service.processar_pdf_completo)
+
+
+async def executar_enquanto_conectado(
+    request: Request,
+    corrotina: Awaitable[T],
+    intervalo: float = INTERVALO_DESCONEXAO
+) -> T:
+    """
+    Executa a corrotina e a cancela se o cliente desconectar antes do fim,
+    liberando a vaga no pipeline e a chamada à OpenAI em andamento
+    
+    Raises:
+        HTTPException: 499 se o cliente desconectou
+    """
+    tarefa = asyncio.ensure_future(corrotina)
+    try:
+        while True:
+            concluidas, _ = await asyncio.wait({tarefa}, timeout=intervalo)
+            if concluidas:
+                return tarefa.result()
+            if await request.is_disconnected():
+                break
+    finally:
+        if not tarefa.done():
+            tarefa.cancel()
+    
+    raise HTTPException(status_code=STATUS_CLIENTE_DESCONECTADO, detail="Cliente desconectado")
+
+
+async def receber_upload(request: Request) -> PDFRecebido:
+    """
+    Lê o PDF do corpo multipart à medida que chega (campo `file`)
+    
+    Raises:
+        HTTPException: 400 se não for PDF, 413 se exceder TAMANHO_MAXIMO_BYTES
+            (antes de receber o restante do corpo)
+    """
+    try:
+        return await receber_pdf(request.headers, request.stream(), TAMANHO_MAXIMO_BYTES)
+    except (ArquivoMuitoGrandeError, ValueError) as e:
+        raise erro_http(e)
+
+
+async def ler_pdf(file: UploadFile) -> bytes:
+    """
+    Lê o upload em blocos validando extensão, cabeçalho %PDF e tamanho
+    
+    Raises:
+        HTTPException: 400 se não for PDF, 413 se exceder TAMANHO_MAXIMO_BYTES
+    """
+    # Validar tipo de arquivo
+    if not (file.filename or "").lower().endswith('.pdf'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Apenas arquivos PDF são aceitos"
+        )
+    
+    # Validar cabeçalho no primeiro bloco e tamanho (máximo 10MB) a cada bloco
+    blocos = []
+    tamanho = 0
+    while bloco := await file.read(TAMANHO_BLOCO_LEITURA):
+        if not blocos and not bloco.startswith(CABECALHO_PDF):
+            break
+        tamanho += len(bloco)
+        if tamanho > TAMANHO_MAXIMO_BYTES:
+            raise erro_http(ArquivoMuitoGrandeError(TAMANHO_MAXIMO_BYTES))
+        blocos.append(bloco)
+    if not blocos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="O arquivo enviado não é um PDF válido"
+        )
+    return b"".join(blocos)
+
+
+def erro_http(e: Exception) -> HTTPException:
+    """Converte um erro do pipeline de PDF na HTTPException correspondente"""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, ArquivoMuitoGrandeError):
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    if isinstance(e, ExtracaoSaturadaError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    if isinstance(e, TimeoutError):
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
+    if isinstance(e, ValueError):
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Erro ao processar PDF: {str(e)}"
+    )
+
 
 @router.post(
     "/extrair",
     response_model=PDFExtraidoDTO,
     status_code=status.HTTP_200_OK,
     summary="Extrair Dados de PDF",
+    openapi_extra=CORPO_UPLOAD_PDF,
     description="""
     Faz upload de um PDF de apólice ou proposta de plano de saúde
     e extrai automaticamente:
@@ -27,47 +183,218 @@ router = APIRouter(
     - Nomes dos beneficiários
     
     Utiliza IA (GPT-4) para análise inteligente do documento.
+    
+    O processamento não bloqueia as demais rotas: o texto é extraído em um
+    pool de processos (PDF_WORKERS) com fila limitada (PDF_FILA_MAXIMA) e,
+    com o pool saturado, a resposta é 503 com Retry-After. Até
+    PDF_MAX_CONCORRENCIA análises com IA rodam ao mesmo tempo, cada etapa
+    tem timeout (504 ao exceder) e o processamento é cancelado se o
+    cliente desconectar.
+    
+    O upload é lido em partes: um arquivo acima de 10MB é recusado (413)
+    assim que passa do limite, e um que não começa por %PDF, no primeiro
+    bloco (400). Acima de PDF_UPLOAD_MEMORIA_KB o PDF vai para um arquivo
+    temporário, lido pelo worker de extração direto do disco.
     """
 )
-async def extrair_dados_pdf(
-    file: UploadFile = File(..., description="Arquivo PDF da apólice ou proposta")
-):
+async def extrair_dados_pdf(request: Request):
     """
     Endpoint POST /api/v1/pdf/extrair
     
-    Aceita upload de arquivo PDF e retorna dados extraídos.
+    Aceita upload de arquivo PDF (campo multipart `file`) e retorna dados extraídos.
     """
-    # Validar tipo de arquivo
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Apenas arquivos PDF são aceitos"
-        )
-    
-    # Validar tamanho (máximo 10MB)
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:  # 10MB
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="Arquivo muito grande. Máximo: 10MB"
-        )
+    content = await receber_upload(request)
     
     try:
         # Processar PDF com IA
-        dados_extraidos = await ai_service.processar_pdf_completo(content)
+        dados_extraidos = await executar_enquanto_conectado(
+            request, ai_service.processar_pdf_completo(content)
+        )
         
         return PDFExtraidoDTO(**dados_extraidos)
     
-    except ValueError as e:
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise erro_http(e)
+    finally:
+        # Libera o arquivo temporário de um upload grande (uma extração compartilhada o mantém até terminar)
+        content.descartar()
+
+
+@router.post(
+    "/extrair-lote",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    summary="Extrair Dados de Vários PDFs",
+    description=f"""
+    Recebe até {MAX_ARQUIVOS_LOTE} PDFs e processa todos ao mesmo tempo,
+    devolvendo NDJSON (application/x-ndjson): uma linha PDFLoteItemDTO por
+    arquivo, enviada assim que aquele arquivo termina, na ordem de
+    conclusão (use `indice` para associar ao arquivo enviado).
+    
+    As etapas são limitadas: PDF_LOTE_EXTRACOES_PARALELAS arquivos do lote
+    na extração de texto (padrão: PDF_WORKERS) e PDF_MAX_CONCORRENCIA
+    análises com IA; enquanto um arquivo está na IA, o próximo já está
+    sendo extraído. Um arquivo inválido ou com erro não interrompe o lote:
+    vira uma linha com `sucesso: false` e o `status` que a rota
+    /pdf/extrair devolveria. Se o cliente desconectar, os arquivos
+    pendentes são cancelados.
+    """
+)
+async def extrair_dados_pdf_lote(
+    files: List[UploadFile] = File(..., description="Arquivos PDF das apólices ou propostas")
+):
+    """
+    Endpoint POST /api/v1/pdf/extrair-lote
+    
+    Aceita upload de vários PDFs e transmite os dados extraídos de cada um.
+    """
+    if len(files) > MAX_ARQUIVOS_LOTE:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
+            detail=f"Máximo de {MAX_ARQUIVOS_LOTE} arquivos por lote"
         )
-    except Exception as e:
+    
+    # Arquivos inválidos saem já na primeira linha; os demais vão para o pipeline
+    invalidos: List[PDFLoteItemDTO] = []
+    validos: List[Tuple[int, bytes]] = []
+    for indice, file in enumerate(files):
+        try:
+            validos.append((indice, await ler_pdf(file)))
+        except HTTPException as e:
+            invalidos.append(PDFLoteItemDTO(
+                indice=indice, arquivo=file.filename, sucesso=False, status=e.status_code, erro=e.detail
+            ))
+    
+    async def linhas() -> AsyncIterator[str]:
+        for item in invalidos:
+            yield item.json() + "\n"
+        
+        resultados = ai_service.processar_lote([content for _, content in validos])
+        try:
+            async for posicao, resultado in resultados:
+                indice = validos[posicao][0]
+                arquivo = files[indice].filename
+                if isinstance(resultado, Exception):
+                    erro = erro_http(resultado)
+                    item = PDFLoteItemDTO(
+                        indice=indice, arquivo=arquivo, sucesso=False, status=erro.status_code, erro=erro.detail
+                    )
+                else:
+                    item = PDFLoteItemDTO(
+                        indice=indice, arquivo=arquivo, sucesso=True, status=status.HTTP_200_OK,
+                        dados=PDFExtraidoDTO(**resultado)
+                    )
+                yield item.json() + "\n"
+        finally:
+            # Fecha o gerador mesmo se a resposta for interrompida, cancelando os pendentes
+            await resultados.aclose()
+    
+    return StreamingResponse(linhas(), media_type="application/x-ndjson")
+
+
+def job_dto(job: Dict) -> PDFJobDTO:
+    """Converte o job da fila no DTO de resposta"""
+    campos = {chave: valor for chave, valor in job.items() if chave != "resultado"}
+    return PDFJobDTO(**campos, dados=job["resultado"])
+
+
+async def obter_job(job_id: str) -> Dict:
+    """
+    Raises:
+        HTTPException: 404 se o job não existe ou já expirou
+    """
+    job = await fila_jobs.obter(job_id)
+    if job is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Erro ao processar PDF: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} não encontrado"
         )
+    return job
+
+
+@router.post(
+    "/jobs",
+    response_model=PDFJobDTO,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Enfileirar Extração de PDF",
+    description="""
+    Recebe o PDF e responde na hora (202) com o id do job, sem manter a
+    conexão aberta durante a análise com IA. Acompanhe por
+    GET /pdf/jobs/{id} (polling) ou GET /pdf/jobs/{id}/eventos (SSE).
+    
+    Status: pendente → processando → concluido | erro. Em processamento, a
+    etapa avança por texto_extraido → ia_concluida → validado. Os jobs
+    ficam em SQLite: um reinício do servidor devolve à fila os que estavam
+    em andamento.
+    """
+)
+async def enfileirar_pdf(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(..., description="Arquivo PDF da apólice ou proposta")
+):
+    """
+    Endpoint POST /api/v1/pdf/jobs
+    
+    Enfileira o PDF e retorna o job criado.
+    """
+    content = await ler_pdf(file)
+    job = await fila_jobs.enviar(content, file.filename)
+    response.headers["Location"] = f"{request.url.path}/{job['id']}"
+    return job_dto(job)
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=PDFJobDTO,
+    status_code=status.HTTP_200_OK,
+    summary="Consultar Job de PDF"
+)
+async def consultar_job_pdf(job_id: str):
+    """
+    Endpoint GET /api/v1/pdf/jobs/{job_id}
+    
+    Retorna status, etapa e, ao concluir, os dados extraídos.
+    """
+    return job_dto(await obter_job(job_id))
+
+
+@router.get(
+    "/jobs/{job_id}/eventos",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    summary="Acompanhar Job de PDF (SSE)",
+    description="""
+    Server-Sent Events com o estado do job: um evento com o estado atual e
+    um a cada mudança, até concluido ou erro (quando o stream termina). O
+    nome do evento é a etapa (texto_extraido, ia_concluida, validado)
+    durante o processamento e o status nos demais casos; `data` é o
+    PDFJobDTO em JSON.
+    """
+)
+async def acompanhar_job_pdf(job_id: str):
+    """
+    Endpoint GET /api/v1/pdf/jobs/{job_id}/eventos
+    
+    Transmite o progresso do job como text/event-stream.
+    """
+    await obter_job(job_id)
+    
+    async def eventos() -> AsyncIterator[str]:
+        async for job in fila_jobs.eventos(job_id, INTERVALO_HEARTBEAT_SSE):
+            if job is None:
+                yield ": heartbeat\n\n"
+                continue
+            nome = job["etapa"] if job["status"] == STATUS_PROCESSANDO and job["etapa"] else job["status"]
+            yield f"event: {nome}\ndata: {job_dto(job).json()}\n\n"
+    
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get(
@@ -81,5 +408,7 @@ async def health_check_pdf():
         "status": "healthy",
         "service": "pdf-extraction",
         "ai_model": "gpt-4o-mini",
-        "max_file_size": "10MB"
+        "max_file_size": "10MB",
+        "pipeline": ai_service.estatisticas(),
+        "jobs": fila_jobs.estatisticas()
     }
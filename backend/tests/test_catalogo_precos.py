@@ -0,0 +1,217 @@
+"""
+Testes para o catálogo de preços compilado
+"""
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.infrastructure.services.catalogo_precos import (
+    CatalogoPrecos,
+    carregar_catalogo_precos,
+    interpretar_faixa_etaria,
+    ler_snapshot,
+)
+
+client = TestClient(app)
+
+
+def criar_registro(plano_id, faixas, **extras):
+    """Cria um registro no formato de planos_operadora com precos_faixa"""
+    registro = {
+        "id": plano_id,
+        "operadora_id": "amil",
+        "plano_nome": f"Plano {plano_id}",
+        "modalidade": "PME",
+        "acomodacao": "Apartamento",
+        "coparticipacao": False,
+        "precos_faixa": [
+            {"faixa_etaria": rotulo, "faixa_ordem": ordem, "valor": valor}
+            for ordem, (rotulo, valor) in enumerate(faixas, start=1)
+        ],
+    }
+    registro.update(extras)
+    return registro
+
+
+def test_interpretar_faixa_etaria():
+    """Testa conversão dos rótulos ANS em limites de idade"""
+    assert interpretar_faixa_etaria("0-18") == (0, 18)
+    assert interpretar_faixa_etaria("59+") == (59, 120)
+    
+    with pytest.raises(ValueError):
+        interpretar_faixa_etaria("idoso")
+
+
+def test_tabela_de_limites_e_busca_binaria():
+    """Testa a tabela de limites de faixa e a busca binária por idade"""
+    catalogo = CatalogoPrecos.de_registros([
+        criar_registro("a", [("0-18", 100.00), ("19-58", 200.00), ("59+", 300.50)])
+    ])
+    
+    assert catalogo.limites_faixa.tolist() == [0, 19, 59]
+    assert catalogo.rotulos_faixa == ["0-18", "19-58", "59+"]
+    assert catalogo.faixas_das_idades(np.array([0, 18, 19, 58, 59, 120])).tolist() == [0, 0, 1, 1, 2, 2]
+    assert catalogo.calcular_centavos(0, np.array([18, 19, 80])).tolist() == [10000, 20000, 30050]
+
+
+def test_faixa_ausente_no_plano():
+    """Testa plano sem preço para algumas faixas (ex.: planos 44+)"""
+    catalogo = CatalogoPrecos.de_registros([
+        criar_registro("senior", [("44-48", 1000.00), ("49-53", 1100.00), ("54-58", 1200.00), ("59+", 1500.00)]),
+        criar_registro("inativo", [("0-18", 1.00)], ativo=False),
+    ])
+    
+    assert len(catalogo) == 1
+    assert catalogo.calcular_centavos(0, np.array([60])).tolist() == [150000]
+    with pytest.raises(ValueError):
+        catalogo.calcular_centavos(0, np.array([60, 30]))
+
+
+def test_snapshot_padrao_e_indice():
+    """Testa carga do snapshot local e busca pela chave do índice"""
+    catalogo = carregar_catalogo_precos()
+    
+    assert catalogo is not None
+    assert len(catalogo) == 14
+    
+    indices = catalogo.buscar("bradesco", "PME", "Apartamento", True)
+    assert [catalogo.planos[i].plano_nome for i in indices] == ["FLEX"]
+    assert len(catalogo.buscar(modalidade="PF")) == 5
+
+
+def test_snapshot_csv(tmp_path):
+    """Testa snapshot CSV no formato de linhas do RPC get_precos_operadora"""
+    caminho = tmp_path / "catalogo.csv"
+    caminho.write_text(
+        "plano_id,operadora_id,plano_nome,modalidade,acomodacao,coparticipacao,"
+        "rede_hospitalar,faixa_etaria,faixa_ordem,valor\n"
+        "p1,unimed,Prime,PME,Apartamento,false,Hospital A|Hospital B,0-18,1,150.10\n"
+        "p1,unimed,Prime,PME,Apartamento,false,Hospital A|Hospital B,19+,2,250.20\n",
+        encoding="utf-8"
+    )
+    
+    catalogo = CatalogoPrecos.de_registros(ler_snapshot(caminho))
+    
+    assert catalogo.planos[0].rede_hospitalar == ("Hospital A", "Hospital B")
+    assert catalogo.calcular_centavos(0, np.array([10, 40])).tolist() == [15010, 25020]
+
+
+def test_calcular_cotacao_com_plano_do_catalogo():
+    """Testa cotação de um plano real do catálogo pelo endpoint"""
+    response = client.post(
+        "/api/v1/cotacao/calcular",
+        json={"idades": [30, 5], "tipo": "PME", "operadora": "AMIL", "plano": "Amil Bronze RJ"}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [float(v["valor"]) for v in data["valores_individuais"]] == [416.90, 243.39]
+    assert float(data["valor_total"]) == 660.29
+
+
+def test_calcular_cotacao_plano_sem_faixa():
+    """Testa erro de cotação para idade sem preço no plano"""
+    response = client.post(
+        "/api/v1/cotacao/calcular",
+        json={"idades": [30], "tipo": "PME", "operadora": "MEDSENIOR", "plano": "Black"}
+    )
+    
+    assert response.status_code == 400
+    
+    response = client.post(
+        "/api/v1/cotacao/calcular-lote",
+        json={"cotacoes": [
+            {"idades": [30], "tipo": "PME", "operadora": "MEDSENIOR", "plano": "Black"},
+            {"idades": [30, 5], "tipo": "PME", "operadora": "AMIL", "plano": "Amil Bronze RJ"},
+        ]}
+    )
+    
+    data = response.json()
+    assert data["resultados"][0]["sucesso"] is False
+    assert float(data["resultados"][1]["cotacao"]["valor_total"]) == 660.29
+
+
+def test_indice_busca_planos_filtra_por_bitsets():
+    """Testa filtros combinados (rede, acomodação, coparticipação, vidas) e a precificação dos elegíveis"""
+    from src.infrastructure.services.busca_planos import IndiceBuscaPlanos
+    
+    catalogo = CatalogoPrecos.de_registros([
+        criar_registro("a", [("0+", 100)], rede_hospitalar=["Copa D'Or", "Samaritano"]),
+        criar_registro("b", [("0+", 80)], rede_hospitalar=["Copa DOr"], coparticipacao=True),
+        criar_registro("c", [("0+", 90)], rede_hospitalar=["COPA DOR"], vidas_min=5),
+        criar_registro("d", [("0+", 70)], rede_hospitalar=["Copa DOr"], acomodacao="Enfermaria"),
+        criar_registro("e", [("0-18", 50)], rede_hospitalar=["Copa DOr"]),
+        criar_registro("f", [("0+", 60)], rede_hospitalar=["Samaritano"], operadora_id="bradesco"),
+    ])
+    indice = IndiceBuscaPlanos(catalogo)
+    
+    assert indice.filtrar(2, hospitais=["copa d’or"]).tolist() == [0, 1, 3, 4]
+    assert indice.filtrar(5, hospitais=["Copa Dor"], coparticipacao=False, acomodacao="apartamento").tolist() == [0, 2, 4]
+    assert indice.filtrar(2, hospitais=["Copa DOr", "Samaritano"]).tolist() == [0]
+    assert indice.filtrar(2, operadoras=["BRADESCO", "sulamerica"]).tolist() == [5]
+    assert indice.filtrar(2, hospitais=["Inexistente"]).tolist() == []
+    
+    contagem = np.bincount([30, 5], minlength=121)
+    assert indice.precificar(np.array([0, 4]), contagem).tolist() == [20000, -1]
+
+
+def test_buscar_planos_api():
+    """Testa a busca no catálogo padrão: restrições, ordenação e valor igual ao /calcular do plano"""
+    idades = [40, 38, 12, 9, 6]
+    response = client.post("/api/v1/cotacao/buscar-planos", json={
+        "idades": idades,
+        "hospitais": ["Copa D'Or"],
+        "coparticipacao": False,
+        "acomodacao": "Apartamento"
+    })
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["planos_elegiveis"] == 1
+    assert [r["plano_id"] for r in data["resultados"]] == ["sulamerica-pme-direto-rio-ii"]
+    
+    encontrado = data["resultados"][0]
+    cotacao = client.post("/api/v1/cotacao/calcular", json={
+        "idades": idades, "tipo": "PME", "operadora": "sulamerica", "plano": encontrado["plano"]
+    }).json()
+    assert float(encontrado["valor_final"]) == float(cotacao["valor_final"])
+    
+    todos = client.post("/api/v1/cotacao/buscar-planos", json={"idades": [30, 28], "limite": 3}).json()
+    valores = [float(r["valor_final"]) for r in todos["resultados"]]
+    assert len(valores) == 3 and valores == sorted(valores)
+
+
+def test_simular_coparticipacao_api():
+    """Testa a simulação: plano sem coparticipação tem custo fixo e a média bate com a esperança analítica"""
+    corpo = {
+        "idades": [38, 35, 8],
+        "planos": ["amil-pme-amil-bronze-rj", "bradesco-pme-flex"],
+        "simulacoes": 20000,
+        "semente": 7
+    }
+    response = client.post("/api/v1/cotacao/simular-coparticipacao", json=corpo)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data == client.post("/api/v1/cotacao/simular-coparticipacao", json=corpo).json()
+    por_id = {r["plano_id"]: r for r in data["resultados"]}
+    
+    sem_copart = por_id["amil-pme-amil-bronze-rj"]
+    cotacao = client.post("/api/v1/cotacao/calcular", json={
+        "idades": corpo["idades"], "tipo": "PME", "operadora": "amil", "plano": sem_copart["plano"]
+    }).json()
+    assert float(sem_copart["mensalidade"]) == float(cotacao["valor_final"])
+    assert float(sem_copart["coparticipacao_media_anual"]) == 0
+    assert set(sem_copart["percentis"].values()) == {sem_copart["custo_mensalidades_anual"]}
+    
+    # Perfis padrão: 11 consultas (R$ 180), 26 exames (R$ 60) e 0,19 internação (R$ 9.000) por ano, a 30%
+    com_copart = por_id["bradesco-pme-flex"]
+    esperado = 0.30 * (11 * 180 + 26 * 60 + 0.19 * 9000)
+    assert float(com_copart["coparticipacao_media_anual"]) == pytest.approx(esperado, rel=0.03)
+    assert data["eventos_medios"]["consulta"] == pytest.approx(11, rel=0.02)
+    percentis = [float(v) for v in com_copart["percentis"].values()]
+    assert percentis == sorted(percentis)
+    assert sum(r["probabilidade_menor_custo"] for r in data["resultados"]) == pytest.approx(1)
+    
+    response = client.post("/api/v1/cotacao/simular-coparticipacao", json={**corpo, "planos": ["inexistente"]})
+    assert response.status_code == 400
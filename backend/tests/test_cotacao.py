@@ -89,3 +89,645 @@ def test_root_endpoint():
     
     assert "message" in data
     assert "version" in data
+
+
+def test_tabela_compilada_equivale_a_tabela_pandas():
+    """Testa que o array compilado por idade reproduz a tabela pandas de origem"""
+    from decimal import Decimal
+    from src.infrastructure.services.servico_calculo_cotacao import ServicoCalculoCotacao
+    
+    servico = ServicoCalculoCotacao()
+    tabela = servico.tabela_precos
+    
+    for operadora, multiplicador in servico.multiplicadores_operadora.items():
+        for idade in (0, 17, 18, 29, 30, 59, 60, 120):
+            faixa = tabela[(tabela['faixa_inicio'] <= idade) & (tabela['faixa_fim'] >= idade)]
+            esperado = Decimal(str(round(float(faixa.iloc[0]['valor_base_pme']) * multiplicador, 2)))
+            assert servico._calcular_valor_beneficiario(idade, "PME", operadora) == esperado
+
+
+def test_calcular_cotacao_valores_por_faixa():
+    """Testa valores individuais e total para uma família"""
+    response = client.post(
+        "/api/v1/cotacao/calcular",
+        json={
+            "idades": [30, 5],
+            "tipo": "ADESAO",
+            "operadora": "AMIL"
+        }
+    )
+    
+    data = response.json()
+    
+    assert [float(v["valor"]) for v in data["valores_individuais"]] == [402.5, 172.5]
+    assert float(data["valor_total"]) == 575.0
+
+
+def test_centavos_equivalem_ao_calculo_decimal_anterior():
+    """Propriedade: o núcleo em centavos difere do cálculo Decimal anterior em no máximo meio centavo"""
+    import asyncio
+    from decimal import Decimal
+    from hypothesis import given, settings, strategies as st
+    from src.application.dtos.cotacao_dto import CotacaoInputDTO
+    from src.application.use_cases.calcular_cotacao_use_case import CalcularCotacaoUseCase
+    from src.infrastructure.services.servico_calculo_cotacao import ServicoCalculoCotacao
+    
+    servico = ServicoCalculoCotacao()
+    use_case = CalcularCotacaoUseCase(servico)
+    tabela = servico.tabela_precos
+    meio_centavo = Decimal("0.005")
+    
+    def referencia(idades, tipo, operadora):
+        """Cálculo anterior: float arredondado por vida, soma e desconto em Decimal sem arredondar"""
+        multiplicador = servico.multiplicadores_operadora.get(operadora, 1.0)
+        valores = []
+        for idade in idades:
+            faixa = tabela[(tabela['faixa_inicio'] <= idade) & (tabela['faixa_fim'] >= idade)]
+            base = float(faixa.iloc[0][f'valor_base_{tipo.lower()}'])
+            valores.append(Decimal(str(round(base * multiplicador, 2))))
+        total = sum(valores)
+        taxa = Decimal("0.10") if len(idades) >= 5 else Decimal("0.05") if len(idades) >= 3 else 0
+        desconto = total * taxa
+        return valores, total, desconto, total - desconto
+    
+    @settings(max_examples=60, deadline=None)
+    @given(
+        idades=st.lists(st.integers(min_value=0, max_value=120), min_size=1, max_size=12),
+        tipo=st.sampled_from(["ADESAO", "PME", "EMPRESARIAL"]),
+        operadora=st.sampled_from(list(servico.multiplicadores_operadora) + ["DESCONHECIDA"])
+    )
+    def propriedade(idades, tipo, operadora):
+        resultado = asyncio.run(use_case.execute(
+            CotacaoInputDTO(idades=idades, tipo=tipo, operadora=operadora)
+        ))
+        valores, total, desconto, final = referencia(idades, tipo, operadora)
+        
+        for obtido, esperado in zip(resultado.valores_individuais, valores):
+            assert abs(obtido.valor - esperado) <= meio_centavo
+        assert abs(resultado.valor_total - total) <= meio_centavo
+        assert abs(resultado.desconto_aplicado - desconto) <= meio_centavo
+        assert abs(resultado.valor_final - final) <= meio_centavo
+        assert resultado.valor_final == resultado.valor_total - resultado.desconto_aplicado
+    
+    propriedade()
+
+
+def test_calcular_cotacao_lote_equivale_a_individual():
+    """Testa que o lote retorna, em ordem, os mesmos valores do cálculo individual"""
+    cotacoes = [
+        {"idades": [30, 5], "tipo": "ADESAO", "operadora": "AMIL"},
+        {"idades": [65, 40, 38, 10, 8], "tipo": "PME", "operadora": "BRADESCO"},
+        {"idades": [22, 19, 70], "tipo": "empresarial", "operadora": "UNIMED"},
+    ]
+    
+    response = client.post("/api/v1/cotacao/calcular-lote", json={"cotacoes": cotacoes})
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 3
+    assert data["sucessos"] == 3
+    
+    for item, cotacao in zip(data["resultados"], cotacoes):
+        individual = client.post("/api/v1/cotacao/calcular", json=cotacao).json()
+        lote = item["cotacao"]
+        
+        assert item["sucesso"] is True
+        for campo in ("valor_total", "desconto_aplicado", "valor_final"):
+            assert float(lote[campo]) == float(individual[campo])
+        assert lote["observacoes"] == individual["observacoes"]
+        assert [float(v["valor"]) for v in lote["valores_individuais"]] == \
+            [float(v["valor"]) for v in individual["valores_individuais"]]
+        assert [v["faixa_etaria"] for v in lote["valores_individuais"]] == \
+            [v["faixa_etaria"] for v in individual["valores_individuais"]]
+
+
+def test_calcular_cotacao_lote_erro_por_item():
+    """Testa que itens inválidos são reportados sem falhar o lote"""
+    response = client.post(
+        "/api/v1/cotacao/calcular-lote",
+        json={
+            "cotacoes": [
+                {"idades": [30], "tipo": "ADESAO", "operadora": "AMIL"},
+                {"idades": [150], "tipo": "ADESAO", "operadora": "AMIL"},
+                {"idades": [30], "tipo": "INVALIDO", "operadora": "AMIL"},
+            ]
+        }
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    
+    assert data["sucessos"] == 1
+    assert data["falhas"] == 2
+    assert [item["indice"] for item in data["resultados"]] == [0, 1, 2]
+    assert data["resultados"][0]["sucesso"] is True
+    assert data["resultados"][1]["sucesso"] is False
+    assert "idades" in data["resultados"][1]["erro"]
+    assert "tipo" in data["resultados"][2]["erro"]
+
+
+def test_comparar_cotacoes():
+    """Testa a matriz operadora x tipo de contratação ordenada por valor_final"""
+    response = client.post("/api/v1/cotacao/comparar", json={"idades": [30, 5, 8]})
+    
+    assert response.status_code == 200
+    data = response.json()
+    resultados = data["resultados"]
+    
+    assert data["quantidade_beneficiarios"] == 3
+    assert len(resultados) == 18
+    finais = [float(r["valor_final"]) for r in resultados]
+    assert finais == sorted(finais)
+    
+    individual = client.post(
+        "/api/v1/cotacao/calcular",
+        json={"idades": [30, 5, 8], "tipo": "PME", "operadora": "SULAMERICA"}
+    ).json()
+    celula = next(
+        r for r in resultados
+        if r["operadora"] == "SULAMERICA" and r["tipo_contratacao"] == "PME"
+    )
+    assert float(celula["valor_final"]) == float(individual["valor_final"])
+    assert float(celula["desconto_aplicado"]) == float(individual["desconto_aplicado"])
+
+
+def test_versao_tabela_na_cotacao():
+    """Testa que a cotação informa a versão da tabela de preços usada"""
+    versao = client.get("/api/v1/cotacao/tabela-precos").json()["versao"]
+    
+    response = client.post(
+        "/api/v1/cotacao/calcular",
+        json={"idades": [30], "tipo": "PME", "operadora": "AMIL"}
+    )
+    
+    assert response.json()["versao_tabela"] == versao
+
+
+def test_recarregar_tabela_precos_troca_versao():
+    """Testa recarga com troca atômica do snapshot e versão preservada no anterior"""
+    import asyncio
+    from src.domain.entities.cotacao import Beneficiario, Cotacao
+    from src.infrastructure.services.catalogo_precos import CatalogoPrecos
+    from src.infrastructure.services.servico_calculo_cotacao import ServicoCalculoCotacao
+    
+    valores = iter([100.00, 150.00])
+    
+    def fonte_catalogo():
+        return CatalogoPrecos.de_registros([{
+            "id": "p1", "operadora_id": "amil", "plano_nome": "Teste", "modalidade": "PME",
+            "precos_faixa": [{"faixa_etaria": "0+", "faixa_ordem": 1, "valor": next(valores)}],
+        }])
+    
+    servico = ServicoCalculoCotacao(fonte_catalogo=fonte_catalogo)
+    cotacao = Cotacao(
+        beneficiarios=[Beneficiario(idade=30, tipo_vinculo="TITULAR")],
+        tipo_contratacao="PME",
+        operadora="AMIL",
+        plano="Teste"
+    )
+    
+    snapshot_anterior = servico.snapshot
+    antes = asyncio.run(servico.calcular(cotacao))
+    resultado = servico.recarregar()
+    depois = asyncio.run(servico.calcular(cotacao))
+    
+    assert resultado["alterada"] is True
+    assert antes["versao_tabela"] == resultado["versao_anterior"] == snapshot_anterior.versao
+    assert depois["versao_tabela"] == resultado["versao_atual"] != antes["versao_tabela"]
+    assert antes["valor_total_centavos"] == 10000 and depois["valor_total_centavos"] == 15000
+    assert snapshot_anterior.catalogo.calcular_centavos(0, [30]).tolist() == [10000]
+
+
+
+def test_recarregar_tabela_precos_exige_token(monkeypatch):
+    """Testa que a recarga manual fica fechada sem ADMIN_TOKEN e exige o token certo"""
+    url = "/api/v1/cotacao/tabela-precos/recarregar"
+    
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.post(url).status_code == 403
+    assert client.post(url, headers={"X-Admin-Token": ""}).status_code == 403
+    
+    monkeypatch.setenv("ADMIN_TOKEN", "segredo")
+    assert client.post(url).status_code == 403
+    assert client.post(url, headers={"X-Admin-Token": "errado"}).status_code == 403
+
+
+def test_cache_cotacao_forma_canonica():
+    """Testa que famílias com as mesmas faixas compartilham a entrada do cache"""
+    import asyncio
+    from src.application.dtos.cotacao_dto import CotacaoInputDTO
+    from src.application.use_cases.cache_cotacao import CacheCotacao
+    from src.application.use_cases.calcular_cotacao_use_case import CalcularCotacaoUseCase
+    from src.infrastructure.services.servico_calculo_cotacao import ServicoCalculoCotacao
+    
+    servico = ServicoCalculoCotacao()
+    use_case = CalcularCotacaoUseCase(servico)
+    cache = CacheCotacao(use_case, servico)
+    
+    primeira = CotacaoInputDTO(idades=[30, 5], tipo="ADESAO", operadora="AMIL")
+    segunda = CotacaoInputDTO(idades=[5, 31], tipo="ADESAO", operadora="AMIL")
+    
+    asyncio.run(cache.execute(primeira))
+    resultado = asyncio.run(cache.execute(segunda))
+    esperado = asyncio.run(use_case.execute(segunda))
+    
+    assert cache.cache.acertos == 1
+    assert cache.cache.falhas == 1
+    assert [v.idade for v in resultado.valores_individuais] == [5, 31]
+    assert resultado.valores_individuais == esperado.valores_individuais
+    assert resultado.valor_final == esperado.valor_final
+    
+    # Idade 59 e 60 custam o mesmo em algumas tabelas, mas mudam as observações
+    asyncio.run(cache.execute(CotacaoInputDTO(idades=[59], tipo="PME", operadora="AMIL")))
+    idoso = asyncio.run(cache.execute(CotacaoInputDTO(idades=[60], tipo="PME", operadora="AMIL")))
+    assert cache.cache.acertos == 1
+    assert any("idoso" in o for o in idoso.observacoes)
+
+
+def test_cache_cotacao_invalidado_por_nova_versao():
+    """Testa que uma nova versão da tabela de preços invalida o cache"""
+    import asyncio
+    from src.application.dtos.cotacao_dto import CotacaoInputDTO
+    from src.application.use_cases.cache_cotacao import CacheCotacao
+    from src.application.use_cases.calcular_cotacao_use_case import CalcularCotacaoUseCase
+    from src.infrastructure.services.catalogo_precos import CatalogoPrecos
+    from src.infrastructure.services.servico_calculo_cotacao import ServicoCalculoCotacao
+    
+    valores = iter([100.00, 150.00])
+    servico = ServicoCalculoCotacao(fonte_catalogo=lambda: CatalogoPrecos.de_registros([{
+        "id": "p1", "operadora_id": "amil", "plano_nome": "Teste", "modalidade": "PME",
+        "precos_faixa": [{"faixa_etaria": "0+", "faixa_ordem": 1, "valor": next(valores)}],
+    }]))
+    cache = CacheCotacao(CalcularCotacaoUseCase(servico), servico)
+    input_dto = CotacaoInputDTO(idades=[30], tipo="PME", operadora="AMIL", plano="Teste")
+    
+    assert asyncio.run(cache.execute(input_dto)).valor_total == 100
+    assert asyncio.run(cache.execute(input_dto)).valor_total == 100
+    servico.recarregar()
+    assert asyncio.run(cache.execute(input_dto)).valor_total == 150
+    
+    estatisticas = cache.estatisticas()
+    assert estatisticas["acertos"] == 1
+    assert estatisticas["invalidacoes"] == 1
+    assert estatisticas["versao_tabela"] == servico.versao_tabela
+
+
+def test_cache_lru_remocao_e_expiracao():
+    """Testa remoção por capacidade e expiração por TTL do cache LRU"""
+    from src.infrastructure.services.cache_lru import CacheLRU
+    
+    agora = [0.0]
+    cache = CacheLRU(tamanho_maximo=2, ttl_segundos=10, relogio=lambda: agora[0])
+    
+    cache.armazenar("a", 1)
+    cache.armazenar("b", 2)
+    cache.obter("a")
+    cache.armazenar("c", 3)  # remove "b", o menos usado
+    
+    assert cache.obter("b") is None
+    assert cache.obter("a") == 1
+    
+    agora[0] = 11.0
+    assert cache.obter("c") is None
+    assert cache.estatisticas()["remocoes"] == 1
+    assert cache.estatisticas()["expiracoes"] == 1
+
+
+def test_cotar_censo_csv():
+    """Testa a cotação de censo: total por operadora igual ao /calcular e linhas inválidas reportadas"""
+    idades = [30, 5, 45, 61, 33, 18, 29, 70]
+    linhas = ["Idade;Vínculo"] + [f"{idade};{'TITULAR' if i % 2 == 0 else 'DEPENDENTE'}" for i, idade in enumerate(idades)]
+    linhas += ["abc;TITULAR", "", "40;PRIMO"]
+    
+    response = client.post(
+        "/api/v1/cotacao/censo",
+        files={"arquivo": ("censo.csv", "\n".join(linhas), "text/csv")},
+        data={"tipo": "PME", "operadoras": "amil, sulamerica"}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["quantidade_vidas"] == len(idades)
+    assert data["vidas_por_vinculo"] == {"TITULAR": 4, "DEPENDENTE": 4, "AGREGADO": 0}
+    assert data["linhas_invalidas"] == 2
+    assert data["erros"][0].startswith("Linha 10: idade inválida")
+    assert data["erros"][1].startswith("Linha 12: vínculo inválido")
+    assert [f["quantidade"] for f in data["faixas"]] == [1, 2, 2, 1, 0, 2]
+    assert [r["operadora"] for r in data["resultados"]] == ["AMIL", "SULAMERICA"]
+    
+    for resultado in data["resultados"]:
+        individual = client.post("/api/v1/cotacao/calcular", json={
+            "idades": idades, "tipo": "PME", "operadora": resultado["operadora"]
+        }).json()
+        assert float(resultado["valor_total"]) == float(individual["valor_total"])
+        assert float(resultado["valor_final"]) == float(individual["valor_final"])
+        assert sum(float(f["valor_total"]) for f in resultado["faixas"]) == float(resultado["valor_total"])
+
+
+def test_leitor_censo_em_blocos():
+    """Testa a leitura em blocos: plano opcional, numeração de linhas e censo sem coluna de idade"""
+    import io
+    from src.infrastructure.services.leitor_censo import ler_censo_em_blocos
+    
+    csv = "idade,vinculo,plano\n30,TITULAR,Amil Bronze RJ\n5,dependente,\n200,TITULAR,\n41,AGREGADO,\n"
+    blocos = list(ler_censo_em_blocos(io.BytesIO(csv.encode()), tamanho_bloco=2))
+    
+    assert len(blocos) == 2
+    assert blocos[0].idades.tolist() == [30, 5]
+    assert blocos[0].vinculos.tolist() == [0, 1]
+    assert blocos[0].planos.tolist() == ["Amil Bronze RJ", None]
+    assert blocos[1].idades.tolist() == [41]
+    assert blocos[1].linhas_invalidas == 1
+    assert blocos[1].erros == ["Linha 4: idade inválida '200' (deve estar entre 0 e 120)"]
+    
+    with pytest.raises(ValueError):
+        list(ler_censo_em_blocos(io.BytesIO(b"nome,vinculo\nAna,TITULAR\n")))
+
+
+def test_cotacao_compacta_compativel_com_lista_de_beneficiarios():
+    """Testa que a Cotacao em arrays mantém a API e a validação da lista de Beneficiario"""
+    import numpy as np
+    from src.domain.entities.cotacao import Beneficiario, Cotacao, GrupoBeneficiarios
+    
+    beneficiarios = [
+        Beneficiario(idade=45, tipo_vinculo="TITULAR"),
+        Beneficiario(idade=8, tipo_vinculo="DEPENDENTE"),
+        Beneficiario(idade=67, tipo_vinculo="AGREGADO"),
+    ]
+    da_lista = Cotacao(beneficiarios=beneficiarios, tipo_contratacao="EMPRESARIAL", operadora="AMIL")
+    das_idades = Cotacao.de_idades([45, 8, 67], "EMPRESARIAL", "AMIL", vinculos=[0, 1, 2])
+    
+    for cotacao in (da_lista, das_idades):
+        assert isinstance(cotacao.beneficiarios, GrupoBeneficiarios)
+        assert list(cotacao.beneficiarios) == beneficiarios
+        assert cotacao.beneficiarios[-1] == beneficiarios[-1]
+        assert cotacao.quantidade_beneficiarios == 3
+        assert cotacao.idade_media == 40
+        assert cotacao.possui_idoso and cotacao.possui_crianca
+    
+    assert [b.tipo_vinculo for b in Cotacao.de_idades([30, 5, 3], "PME", "AMIL").beneficiarios] == [
+        "TITULAR", "DEPENDENTE", "DEPENDENTE"
+    ]
+    
+    for idades in ([], [-1], [121], [30.5]):
+        with pytest.raises(ValueError):
+            Cotacao.de_idades(idades, "PME", "AMIL")
+    for vazio in ([], np.array([])):
+        with pytest.raises(ValueError, match="pelo menos um beneficiário"):
+            Cotacao.de_idades(vazio, "PME", "AMIL")
+    with pytest.raises(ValueError, match="pelo menos um beneficiário"):
+        Cotacao(beneficiarios=[], tipo_contratacao="PME", operadora="AMIL")
+    with pytest.raises(ValueError):
+        Cotacao.de_idades([30], "INDIVIDUAL", "AMIL")
+
+
+def test_projetar_custos_com_envelhecimento_e_reajuste():
+    """Testa a projeção: cada ano equivale ao /calcular com as idades envelhecidas e o reajuste composto"""
+    idades = [28, 16, 58]
+    response = client.post("/api/v1/cotacao/projetar", json={
+        "idades": idades,
+        "tipo": "PME",
+        "anos": 4,
+        "operadoras": ["amil", "hapvida"],
+        "reajustes": {"amil": 0.12},
+        "reajuste_padrao": 0.10
+    })
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["operadora"] for r in data["resultados"]] == ["HAPVIDA", "AMIL"]
+    
+    for resultado in data["resultados"]:
+        fator = 1.12 if resultado["operadora"] == "AMIL" else 1.10
+        assert len(resultado["anos"]) == 5
+        for projetado in resultado["anos"]:
+            ano = projetado["ano"]
+            atual = client.post("/api/v1/cotacao/calcular", json={
+                "idades": [idade + ano for idade in idades], "tipo": "PME", "operadora": resultado["operadora"]
+            }).json()
+            assert float(projetado["valor_total"]) == pytest.approx(atual["valor_total"] * fator ** ano, abs=0.005)
+            assert float(projetado["valor_final"]) == pytest.approx(
+                float(projetado["valor_total"]) * 0.95, abs=0.005
+            )
+    
+    assert data["anos_com_transicao"] == [2]
+    assert [(t["beneficiario"], t["faixa_nova"]) for t in data["transicoes"]] == [
+        (0, "30-39 anos"), (1, "18-29 anos"), (2, "60+ anos")
+    ]
+    
+    response = client.post("/api/v1/cotacao/projetar", json={
+        "idades": idades, "tipo": "PME", "anos": 31
+    })
+    assert response.status_code == 422
+
+
+def test_regras_cotacao_personalizadas(tmp_path):
+    """Testa regras declarativas de desconto/observação por operadora, tipo e vidas, individual e em lote"""
+    import asyncio
+    import json
+    from src.application.dtos.cotacao_dto import ComparacaoInputDTO, CotacaoInputDTO
+    from src.application.use_cases.calcular_cotacao_use_case import CalcularCotacaoUseCase
+    from src.infrastructure.services.regras_cotacao import (
+        REGRAS_PADRAO,
+        RegrasCotacao,
+        carregar_regras_cotacao,
+    )
+    from src.infrastructure.services.servico_calculo_cotacao import ServicoCalculoCotacao
+    
+    definicao = {
+        "faixas_etarias": [
+            {"inicio": 0, "rotulo": "menor"},
+            {"inicio": 18, "rotulo": "adulto"},
+            {"inicio": 65, "rotulo": "idoso"},
+        ],
+        "descontos": [
+            {"minimo_vidas": 2, "taxa": "0.08", "operadoras": ["amil"], "tipos": ["PME"], "observacao": "AMIL PME"},
+            {"minimo_vidas": 2, "maximo_vidas": 3, "taxa": "0.03", "tipos": ["ADESAO"]},
+            {"minimo_vidas": 4, "taxa": "0.06", "observacao": "Grupo"},
+        ],
+        "observacoes": [
+            {"campo": "idade_maxima", "operador": ">=", "valor": 65, "texto": "Idoso 65+"},
+            {"campo": "quantidade_vidas", "operador": "==", "valor": 1, "operadoras": ["BRADESCO"], "texto": "Individual"},
+        ],
+    }
+    arquivo = tmp_path / "regras.json"
+    arquivo.write_text(json.dumps(definicao), encoding="utf-8")
+    regras = carregar_regras_cotacao(caminho_arquivo=str(arquivo))
+    assert regras.versao == RegrasCotacao(definicao).versao != RegrasCotacao(REGRAS_PADRAO).versao
+    assert regras.limites_idade == [65]
+    
+    servico = ServicoCalculoCotacao(fonte_regras=lambda: regras)
+    use_case = CalcularCotacaoUseCase(servico)
+    
+    casos = [
+        (CotacaoInputDTO(idades=[30, 70], tipo="PME", operadora="AMIL"), 800, ["Idoso 65+", "AMIL PME"]),
+        (CotacaoInputDTO(idades=[30, 40], tipo="PME", operadora="UNIMED"), 0, []),
+        (CotacaoInputDTO(idades=[30, 5, 8], tipo="ADESAO", operadora="UNIMED"), 300, []),
+        (CotacaoInputDTO(idades=[30, 5, 8, 9], tipo="ADESAO", operadora="UNIMED"), 600, ["Grupo"]),
+        (CotacaoInputDTO(idades=[64], tipo="EMPRESARIAL", operadora="BRADESCO"), 0, ["Individual"]),
+    ]
+    lote = asyncio.run(use_case.execute_lote([entrada for entrada, _, _ in casos]))
+    for (entrada, pontos, observacoes), em_lote in zip(casos, lote):
+        individual = asyncio.run(use_case.execute(entrada))
+        assert individual.observacoes == observacoes
+        assert float(individual.desconto_aplicado) == pytest.approx(
+            float(individual.valor_total) * pontos / 10000, abs=0.005
+        )
+        assert em_lote == individual
+    assert [v.faixa_etaria for v in lote[0].valores_individuais] == ["adulto", "idoso"]
+    
+    # Comparação: o desconto varia por célula (operadora x tipo)
+    comparacao = asyncio.run(use_case.comparar(ComparacaoInputDTO(idades=[30, 40])))
+    descontos = {(r.operadora, r.tipo_contratacao): r.desconto_aplicado for r in comparacao.resultados}
+    assert descontos[("AMIL", "PME")] > 0
+    assert descontos[("UNIMED", "PME")] == 0
+    assert descontos[("UNIMED", "ADESAO")] > 0
+    
+    with pytest.raises(ValueError):
+        RegrasCotacao({"observacoes": [{"campo": "renda", "operador": ">", "valor": 1, "texto": "x"}]})
+
+
+def test_benchmark_cotacao_detecta_regressao():
+    """Testa a execução curta do benchmark e o limite de regressão contra o baseline"""
+    import asyncio
+    from benchmarks.cotacao import comparar, executar
+    
+    resultado = asyncio.run(executar(iteracoes=3, aquecimento=1, filtro="1_vidas/AMIL", rodadas=1))
+    assert set(resultado["cenarios"]) == {
+        "servico/1_vidas/AMIL", "use_case/1_vidas/AMIL",
+        "controller/frio/1_vidas/AMIL", "controller/quente/1_vidas/AMIL",
+        "asgi/frio/1_vidas/AMIL", "asgi/quente/1_vidas/AMIL",
+    }
+    for medido in resultado["cenarios"].values():
+        assert 0 < medido["p50_us"] <= medido["p99_us"]
+        assert medido["vazao_por_s"] > 0
+    
+    baseline = {"cenarios": {
+        "a": {"p50_us": 100.0, "p99_us": 200.0, "vazao_por_s": 10000.0},
+        "b": {"p50_us": 100.0, "p99_us": 200.0, "vazao_por_s": 10000.0},
+    }}
+    atual = {"cenarios": {
+        "a": {"p50_us": 120.0, "p99_us": 290.0, "vazao_por_s": 8500.0},
+        "b": {"p50_us": 130.0, "p99_us": 310.0, "vazao_por_s": 7600.0},
+        "novo": {"p50_us": 1.0, "p99_us": 1.0, "vazao_por_s": 1.0},
+    }}
+    regressoes = comparar(atual, baseline, tolerancia=0.25, tolerancia_p99=0.5)
+    assert len(regressoes) == 3
+    assert all(r.startswith("b:") for r in regressoes)
+
+
+def test_grade_precos_com_etag_e_formato_binario():
+    """Testa a grade exportada: equivale ao /calcular, responde 304 ao If-None-Match e decodifica o binário"""
+    import json
+    import struct
+    import numpy as np
+    
+    response = client.get("/api/v1/cotacao/grade")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and "W/" not in etag
+    assert "max-age" in response.headers["cache-control"]
+    grade = response.json()
+    
+    precos = np.array(grade["precos_centavos"]).reshape(
+        len(grade["tipos"]), len(grade["operadoras"]), grade["idade_maxima"] + 1
+    )
+    descontos = grade["descontos"]
+    regras = np.array(descontos["regra_por_vidas"]).reshape(
+        len(grade["tipos"]), len(grade["operadoras"]), descontos["limite_vidas"] + 1
+    )
+    for idades, tipo, operadora in (([30, 5], "ADESAO", "AMIL"), ([65, 40, 38, 10, 8], "PME", "UNIMED")):
+        i, j = grade["tipos"].index(tipo), grade["operadoras"].index(operadora)
+        total = int(precos[i, j, idades].sum())
+        regra = regras[i, j, min(len(idades), descontos["limite_vidas"])]
+        desconto = 0 if regra < 0 else (total * descontos["pontos_base"][regra] + 5000) // 10000
+        
+        cotacao = client.post("/api/v1/cotacao/calcular", json={
+            "idades": idades, "tipo": tipo, "operadora": operadora
+        }).json()
+        assert total / 100 == pytest.approx(cotacao["valor_total"])
+        assert (total - desconto) / 100 == pytest.approx(cotacao["valor_final"])
+    
+    revalidacao = client.get("/api/v1/cotacao/grade", headers={"If-None-Match": f'W/{etag}, "outro"'})
+    assert revalidacao.status_code == 304
+    assert revalidacao.content == b""
+    assert revalidacao.headers["etag"] == etag
+    
+    binario = client.get("/api/v1/cotacao/grade?formato=binario")
+    assert binario.status_code == 200
+    assert binario.headers["etag"] != etag
+    corpo = binario.content
+    assert corpo[:4] == b"GRD1"
+    (tamanho,) = struct.unpack("<I", corpo[4:8])
+    cabecalho = json.loads(corpo[8:8 + tamanho])
+    inicio = 8 + tamanho
+    assert inicio % 4 == 0
+    blocos = {b["nome"]: b for b in cabecalho["blocos"]}
+    bloco = blocos["precos_centavos"]
+    decodificado = np.frombuffer(
+        corpo, dtype="<" + {"int32": "i4", "int16": "i2"}[bloco["tipo"]],
+        count=int(np.prod(bloco["forma"])), offset=inicio + bloco["posicao"]
+    ).reshape(bloco["forma"])
+    assert (decodificado == precos).all()
+    assert cabecalho["versao_tabela"] == grade["versao_tabela"]
+    
+    assert client.get("/api/v1/cotacao/grade?formato=xml").status_code == 400
+
+
+class ConsultaSupabaseFalsa:
+    """Consulta do cliente Supabase de teste: corta cada resposta em `max_rows` linhas, como o PostgREST"""
+    
+    def __init__(self, linhas, max_rows):
+        self.linhas = linhas
+        self.max_rows = max_rows
+        self.intervalo = (0, len(linhas) - 1)
+        self.paginas_pedidas = 0
+    
+    def table(self, nome):
+        return self
+    
+    def select(self, colunas):
+        return self
+    
+    def eq(self, coluna, valor):
+        return self
+    
+    def order(self, coluna):
+        return self
+    
+    def range(self, inicio, fim):
+        self.intervalo = (inicio, fim)
+        return self
+    
+    def execute(self):
+        from types import SimpleNamespace
+        self.paginas_pedidas += 1
+        inicio, fim = self.intervalo
+        return SimpleNamespace(data=self.linhas[inicio:min(fim + 1, inicio + self.max_rows)])
+
+
+def test_carregamento_do_banco_pagina_alem_do_max_rows():
+    """Testa que catálogo e regras carregados do Supabase não são cortados no max-rows do PostgREST"""
+    from src.infrastructure.services.catalogo_precos import carregar_catalogo_precos
+    from src.infrastructure.services.regras_cotacao import carregar_regras_cotacao
+    
+    planos = [
+        {
+            "id": f"p{i:05d}", "operadora_id": "amil", "plano_nome": f"Plano {i}", "modalidade": "PME",
+            "precos_faixa": [{"faixa_etaria": "0+", "faixa_ordem": 1, "valor": 100 + i}],
+        }
+        for i in range(2500)
+    ]
+    cliente = ConsultaSupabaseFalsa(planos, max_rows=1000)
+    catalogo = carregar_catalogo_precos(supabase_client=cliente)
+    assert len(catalogo) == 2500
+    assert cliente.paginas_pedidas == 3
+    
+    regras = [
+        {"categoria": "faixas_etarias", "ordem": i, "definicao": {"inicio": i, "rotulo": f"{i}+"}, "ativo": True}
+        for i in range(1200)
+    ]
+    cliente = ConsultaSupabaseFalsa(regras, max_rows=1000)
+    carregadas = carregar_regras_cotacao(supabase_client=cliente)
+    assert cliente.paginas_pedidas == 2
+    assert carregadas.versao != carregar_regras_cotacao(supabase_client=ConsultaSupabaseFalsa(regras[:1000], 1000)).versao
@@ -1,10 +1,27 @@
 """
 Testes para o serviço de extração de PDF
 """
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from datetime import date
+from functools import partial
+from types import SimpleNamespace
 import pytest
 from src.infrastructure.services.ai_service import AIService
+from src.infrastructure.services.cache_extracao_pdf import CacheExtracaoPDF
+from src.infrastructure.services.extratores_layout import criar_registro_padrao
+from src.infrastructure.services.pool_extracao_pdf import SEPARADOR_PAGINAS
+from src.infrastructure.services.selecao_trechos import MARCADOR_CONTEXTO, estimar_tokens, selecionar_trechos
+from src.infrastructure.services.pool_extracao_pdf import ExtracaoSaturadaError, PoolExtracaoPDF, extrair_texto_pdf
+from src.infrastructure.services.upload_pdf import ArquivoMuitoGrandeError, limpar_uploads_orfaos, receber_pdf
 import io
 from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
 
 
 def criar_pdf_teste() -> bytes:
@@ -15,6 +32,152 @@ def criar_pdf_teste() -> bytes:
     return b"%PDF-1.4 test content"
 
 
+def criar_pdf_com_texto(paginas: list) -> bytes:
+    """PDF real com uma página (Helvetica, texto sem acentos) por item da lista"""
+    writer = PdfWriter()
+    fonte = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica")
+    }))
+    for texto in paginas:
+        texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+        linhas = " T* ".join(
+            "({}) Tj".format(linha.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)"))
+            for linha in texto.strip().split("\n")
+        )
+        conteudo = DecodedStreamObject()
+        conteudo.set_data(f"BT /F1 10 Tf 12 TL 40 800 Td {linhas} ET".encode())
+        pagina = writer.add_blank_page(width=595, height=842)
+        pagina[NameObject("/Contents")] = writer._add_object(conteudo)
+        pagina[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): fonte})
+        })
+    saida = io.BytesIO()
+    writer.write(saida)
+    return saida.getvalue()
+
+
+class ClienteIAFalso:
+    """Cliente assíncrono da OpenAI de teste: responde após `atraso` segundos"""
+    
+    def __init__(self, atraso: float):
+        self.atraso = atraso
+        self.simultaneas = 0
+        self.max_simultaneas = 0
+        self.canceladas = 0
+        self.chamadas = 0
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    async def create(self, **kwargs):
+        self.chamadas += 1
+        self.prompts.append(kwargs["messages"][-1]["content"])
+        self.simultaneas += 1
+        self.max_simultaneas = max(self.max_simultaneas, self.simultaneas)
+        try:
+            await asyncio.sleep(self.atraso)
+        except asyncio.CancelledError:
+            self.canceladas += 1
+            raise
+        finally:
+            self.simultaneas -= 1
+        conteudo = json.dumps(self.responder(kwargs["messages"][-1]["content"]))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=conteudo))])
+    
+    def responder(self, prompt: str) -> dict:
+        return {"idades": [30], "operadora": "amil"}
+
+
+class ClienteIALeitor(ClienteIAFalso):
+    """Cliente de teste que lê o documento do prompt (beneficiários inclusive do contexto)"""
+    
+    def responder(self, prompt: str) -> dict:
+        documento = prompt.split("DOCUMENTO:")[1]
+        principal = documento.split(MARCADOR_CONTEXTO)[0]
+        beneficiarios = re.findall(r"Beneficiário: (.+?) - idade (\d+)", documento)
+        valores = re.findall(r"Mensalidade total: R\$ ([\d.]+),(\d{2})", principal)
+        return {
+            "idades": [int(idade) for _, idade in beneficiarios],
+            "nome_beneficiarios": [nome for nome, _ in beneficiarios],
+            "operadora": "sulamerica" if "SULAMÉRICA" in principal else None,
+            "valor_atual": f"{valores[0][0].replace('.', '')}.{valores[0][1]}" if valores else None,
+            "tipo_plano": "empresarial"
+        }
+
+
+def extrair_texto_lento(file_bytes: bytes) -> str:
+    """Extração bloqueante, como a do pypdf em um PDF grande (executada no pool de processos)"""
+    time.sleep(0.2)
+    return "Proposta de adesão - titular com 30 anos de idade, operadora AMIL. " * 3
+
+
+def extrair_texto_lento_ou_vazio(file_bytes: bytes) -> str:
+    """Como extrair_texto_lento, mas sem texto para PDFs escaneados (conteúdo b"%PDF-scan")"""
+    if file_bytes == b"%PDF-scan":
+        return ""
+    return extrair_texto_lento(file_bytes)
+
+
+PROPOSTA_AMIL = """
+AMIL ASSISTÊNCIA MÉDICA INTERNACIONAL S.A.
+PROPOSTA DE ADESÃO - Coletivo por Adesão
+Data de emissão: 10/01/2025
+Beneficiário titular: JOÃO DA SILVA      Data de nascimento: 15/03/1985
+Dependente: MARIA DA SILVA      Data de nascimento: 20/07/2019
+Valor total da proposta: R$ 1.250,50
+"""
+
+
+def extrair_texto_proposta_amil(file_bytes: bytes) -> str:
+    """Texto de uma proposta AMIL no layout conhecido (executada no pool de processos)"""
+    return PROPOSTA_AMIL
+
+
+def extrair_texto_proposta_sem_emissao(file_bytes: bytes) -> str:
+    """Proposta AMIL sem a data de emissão (idades calculadas na data de hoje)"""
+    return PROPOSTA_AMIL.replace("Data de emissão: 10/01/2025\n", "")
+
+
+def contrato_longo(paginas: int = 40) -> str:
+    """Contrato com cláusulas genéricas e os dados dos beneficiários em uma única página"""
+    clausula = "Cláusula {n}. As partes acordam as condições gerais de cobertura e carência deste instrumento. "
+    textos = [(clausula.format(n=i) * 20).strip() for i in range(paginas)]
+    textos[0] = "CONTRATO COLETIVO - SULAMÉRICA SAÚDE\n" + textos[0]
+    textos[paginas // 2] = (
+        "QUADRO DE BENEFICIÁRIOS\n"
+        "Titular: Ana Souza - Data de nascimento: 02/05/1980 - idade 44\n"
+        "Dependente: Lucas Souza - Data de nascimento: 11/09/2012 - idade 12\n"
+        "Mensalidade total: R$ 2.310,00"
+    )
+    return SEPARADOR_PAGINAS.join(textos)
+
+
+def extrair_texto_contrato_longo(file_bytes: bytes) -> str:
+    """Texto de um contrato de 40 páginas (executada no pool de processos)"""
+    return contrato_longo()
+
+
+def contrato_empresarial(paginas: int = 12, por_pagina: int = 10) -> str:
+    """Contrato empresarial com a lista de beneficiários espalhada por todas as páginas"""
+    clausula = "Cláusula geral de cobertura assistencial e carências contratuais aplicáveis. "
+    textos = []
+    for pagina in range(paginas):
+        linhas = [clausula * 15]
+        for i in range(por_pagina):
+            numero = pagina * por_pagina + i
+            linhas.append(f"Beneficiário: Pessoa Exemplo {numero:03d} - idade {18 + numero % 50}")
+        textos.append("\n".join(linhas))
+    textos[0] = "CONTRATO COLETIVO EMPRESARIAL - SULAMÉRICA SAÚDE\nMensalidade total: R$ 45.000,00\n" + textos[0]
+    textos[6] += "\nMensalidade total: R$ 44.000,00"
+    return SEPARADOR_PAGINAS.join(textos)
+
+
+def extrair_texto_contrato_empresarial(file_bytes: bytes) -> str:
+    """Texto de um contrato empresarial com 120 vidas (executada no pool de processos)"""
+    return contrato_empresarial()
+
+
 def test_ai_service_inicializacao():
     """Testa inicialização do serviço de IA"""
     service = AIService()
@@ -39,7 +202,8 @@ def test_validar_dados_extraidos():
     assert resultado["operadora"] == "AMIL"
     assert resultado["valor_atual"] == 1250.50
     assert resultado["tipo_plano"] == "ADESAO"
-    assert resultado["confianca"] == "alta"
+    assert resultado["confianca"] == "ia"
+    assert service._validar_dados_extraidos(dados_brutos, "layout")["confianca"] == "layout"
 
 
 def test_validar_dados_invalidos():
@@ -57,3 +221,574 @@ def test_validar_dados_invalidos():
     assert resultado["idades"] == []
     assert resultado["operadora"] is None
     assert resultado["valor_atual"] is None
+
+
+def test_pipeline_pdf_nao_bloqueia_event_loop():
+    """Testa o pipeline assíncrono: loop livre durante o processamento, semáforo e cancelamento"""
+    pool = PoolExtracaoPDF(workers=2, funcao=extrair_texto_lento)
+    service = AIService(max_concorrencia=2, pool_extracao=pool)
+    service.client = ClienteIAFalso(atraso=0.2)
+    
+    async def cenario():
+        atrasos = []
+        
+        async def medir_loop():
+            while True:
+                inicio = time.perf_counter()
+                await asyncio.sleep(0.01)
+                atrasos.append(time.perf_counter() - inicio)
+        
+        medidor = asyncio.create_task(medir_loop())
+        resultados = await asyncio.gather(*(service.processar_pdf_completo(b"%PDF") for _ in range(4)))
+        
+        # Cancelada durante a chamada à IA
+        tarefa = asyncio.create_task(service.processar_pdf_completo(b"%PDF"))
+        while service.client.simultaneas == 0:
+            await asyncio.sleep(0.01)
+        tarefa.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tarefa
+        
+        medidor.cancel()
+        return resultados, max(atrasos)
+    
+    try:
+        resultados, maior_atraso = asyncio.run(cenario())
+    finally:
+        pool.encerrar()
+    
+    assert [r["operadora"] for r in resultados] == ["AMIL"] * 4
+    assert service.client.max_simultaneas == 2
+    assert service.client.canceladas == 1
+    assert service.estatisticas()["em_andamento"] == 0
+    assert maior_atraso < 0.1
+    
+    pool_lento = PoolExtracaoPDF(workers=1, funcao=extrair_texto_lento)
+    lento = AIService(timeout_extracao=0.05, pool_extracao=pool_lento)
+    try:
+        with pytest.raises(TimeoutError):
+            asyncio.run(lento.processar_pdf_completo(b"%PDF"))
+    finally:
+        pool_lento.encerrar()
+
+
+def test_pool_extracao_recusa_quando_saturado(monkeypatch):
+    """Testa a fila limitada do pool de extração e o 503 com Retry-After na API"""
+    pool = PoolExtracaoPDF(workers=1, fila_maxima=1, funcao=extrair_texto_lento)
+    
+    async def cenario():
+        return await asyncio.gather(
+            *(pool.extrair(b"%PDF") for _ in range(3)), return_exceptions=True
+        )
+    
+    try:
+        resultados = asyncio.run(cenario())
+        assert [type(r) for r in resultados] == [str, str, ExtracaoSaturadaError]
+        assert resultados[2].retry_after >= 1
+        assert pool.estatisticas()["em_andamento"] == 0
+        assert pool.estatisticas()["recusadas"] == 1
+        # Vagas liberadas ao fim das extrações
+        assert asyncio.run(pool.extrair(b"%PDF")).startswith("Proposta")
+    finally:
+        pool.encerrar()
+    
+    from fastapi.testclient import TestClient
+    from main import app
+    from src.presentation.routers.pdf_router import ai_service
+    
+    async def saturado(file_bytes, timeout=None):
+        raise ExtracaoSaturadaError(3)
+    
+    monkeypatch.setattr(ai_service.pool_extracao, "extrair", saturado)
+    response = TestClient(app).post(
+        "/api/v1/pdf/extrair", files={"file": ("proposta.pdf", b"%PDF", "application/pdf")}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+
+
+def test_cache_extracao_por_conteudo(monkeypatch, tmp_path):
+    """Testa o cache de extrações: single-flight, camadas memória/disco, versão, idades na data da entrega e limite do disco"""
+    caminho = str(tmp_path / "extracoes.sqlite3")
+    pool = PoolExtracaoPDF(workers=1, funcao=extrair_texto_lento)
+    service = AIService(pool_extracao=pool, cache_extracao=CacheExtracaoPDF(caminho=caminho))
+    service.client = ClienteIAFalso(atraso=0.1)
+    
+    async def enviar(*arquivos):
+        return await asyncio.gather(*(service.processar_pdf_completo(a) for a in arquivos))
+    
+    try:
+        # Três envios simultâneos do mesmo PDF: uma única extração
+        resultados = asyncio.run(enviar(b"%PDF-a", b"%PDF-a", b"%PDF-a"))
+        assert resultados[0] == resultados[1] == resultados[2]
+        assert service.client.chamadas == 1
+        assert service.cache_extracao.compartilhadas == 2
+        
+        asyncio.run(enviar(b"%PDF-a"))
+        assert service.client.chamadas == 1
+        assert service.cache_extracao.memoria.acertos == 1
+        
+        # Reinício: a camada em disco ainda tem a extração
+        service.cache_extracao = CacheExtracaoPDF(caminho=caminho)
+        assert asyncio.run(enviar(b"%PDF-a"))[0] == resultados[0]
+        assert service.client.chamadas == 1
+        assert service.cache_extracao.acertos_disco == 1
+        
+        # Outro modelo (ou prompt) é outra versão da extração
+        service.model = "outro-modelo"
+        asyncio.run(enviar(b"%PDF-a"))
+        assert service.client.chamadas == 2
+        
+        # Outro dia: a extração pela IA não depende da data e continua no cache
+        hoje = [date(2030, 1, 1)]
+        
+        class DataFalsa(date):
+            @classmethod
+            def today(cls):
+                return hoje[0]
+        
+        monkeypatch.setattr("src.infrastructure.services.ai_service.date", DataFalsa)
+        monkeypatch.setattr("src.infrastructure.services.extratores_layout.date", DataFalsa)
+        asyncio.run(enviar(b"%PDF-a"))
+        assert service.client.chamadas == 2
+    finally:
+        pool.encerrar()
+    
+    # Layout sem data de emissão: idades pelas datas de nascimento, recalculadas no dia da entrega
+    pool = PoolExtracaoPDF(workers=1, funcao=extrair_texto_proposta_sem_emissao)
+    service = AIService(pool_extracao=pool, cache_extracao=CacheExtracaoPDF(caminho=caminho))
+    try:
+        dados = asyncio.run(service.processar_pdf_completo(b"%PDF-b"))
+        assert dados["idades"] == [44, 10]
+        assert "datas_nascimento" not in dados
+        hoje[0] = date(2031, 1, 1)
+        service.cache_extracao = CacheExtracaoPDF(caminho=caminho)
+        assert asyncio.run(service.processar_pdf_completo(b"%PDF-b"))["idades"] == [45, 11]
+        assert service.cache_extracao.acertos_disco == 1
+        assert service.extracoes_layout == 1
+    finally:
+        pool.encerrar()
+    
+    async def extrair(file_bytes, progresso):
+        return {"conteudo": file_bytes.decode() * 20}
+    
+    pequeno = CacheExtracaoPDF(caminho=str(tmp_path / "pequeno.sqlite3"), tamanho_maximo_disco_bytes=250)
+    for arquivo in (b"aaaa", b"bbbb", b"cccc"):
+        asyncio.run(pequeno.obter_ou_calcular(arquivo, "v1", extrair))
+    estatisticas = pequeno.estatisticas()
+    assert estatisticas["bytes_disco"] <= 250
+    assert estatisticas["remocoes_disco"] == 1
+    assert pequeno._ler_disco(pequeno.chave(b"aaaa", "v1")) is None
+    assert pequeno._ler_disco(pequeno.chave(b"cccc", "v1")) is not None
+    
+    # Quem se junta a uma extração em andamento recebe todas as etapas dela
+    async def em_etapas(file_bytes, progresso):
+        progresso("texto_extraido")
+        await asyncio.sleep(0.05)
+        progresso("ia_concluida")
+        return {"conteudo": file_bytes.decode()}
+    
+    async def juntar():
+        cache = CacheExtracaoPDF(caminho=None)
+        primeiro, segundo = [], []
+        tarefa = asyncio.ensure_future(cache.obter_ou_calcular(b"dddd", "v1", em_etapas, primeiro.append))
+        await asyncio.sleep(0.01)
+        await cache.obter_ou_calcular(b"dddd", "v1", em_etapas, segundo.append)
+        await tarefa
+        assert primeiro == segundo == ["texto_extraido", "ia_concluida"]
+        assert cache.compartilhadas == 1
+    
+    asyncio.run(juntar())
+
+
+def test_extrair_lote_transmite_ndjson(monkeypatch):
+    """Testa o lote: uma linha NDJSON por arquivo, erros por arquivo e etapas limitadas"""
+    from fastapi.testclient import TestClient
+    from main import app
+    from src.presentation.routers.pdf_router import ai_service
+    
+    pool = PoolExtracaoPDF(workers=1, funcao=extrair_texto_lento_ou_vazio)
+    monkeypatch.setattr(ai_service, "cache_extracao", None)
+    monkeypatch.setattr(ai_service, "pool_extracao", pool)
+    monkeypatch.setattr(ai_service, "client", ClienteIAFalso(atraso=0.1))
+    
+    arquivos = [
+        ("files", ("a.pdf", b"%PDF-a", "application/pdf")),
+        ("files", ("notas.txt", b"texto", "text/plain")),
+        ("files", ("scan.pdf", b"%PDF-scan", "application/pdf")),
+        ("files", ("b.pdf", b"%PDF-b", "application/pdf")),
+        ("files", ("c.pdf", b"%PDF-c", "application/pdf")),
+    ]
+    try:
+        response = TestClient(app).post("/api/v1/pdf/extrair-lote", files=arquivos)
+    finally:
+        pool.encerrar()
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    linhas = [json.loads(linha) for linha in response.text.splitlines()]
+    assert sorted(linha["indice"] for linha in linhas) == [0, 1, 2, 3, 4]
+    por_arquivo = {linha["arquivo"]: linha for linha in linhas}
+    assert por_arquivo["notas.txt"]["status"] == 400
+    assert por_arquivo["scan.pdf"]["status"] == 400
+    assert not por_arquivo["scan.pdf"]["sucesso"]
+    for nome in ("a.pdf", "b.pdf", "c.pdf"):
+        assert por_arquivo[nome]["sucesso"]
+        assert por_arquivo[nome]["dados"]["operadora"] == "AMIL"
+    # Arquivo inválido não espera o pipeline
+    assert linhas[0]["arquivo"] == "notas.txt"
+    assert pool.estatisticas()["recusadas"] == 0
+
+
+def test_jobs_pdf_com_progresso_e_reinicio(monkeypatch, tmp_path):
+    """Testa os jobs assíncronos: 202 na hora, progresso por SSE, polling e recuperação após reinício"""
+    from fastapi.testclient import TestClient
+    from main import app
+    from src.presentation.routers import pdf_router
+    from src.infrastructure.services.fila_jobs_pdf import FilaJobsPDF
+    
+    caminho = str(tmp_path / "jobs.sqlite3")
+    ai_service = pdf_router.ai_service
+    monkeypatch.setattr(ai_service, "cache_extracao", None)
+    monkeypatch.setattr(ai_service, "pool_extracao", PoolExtracaoPDF(workers=1, funcao=extrair_texto_lento))
+    monkeypatch.setattr(ai_service, "client", ClienteIAFalso(atraso=0.1))
+    
+    # Job que estava em processamento quando o servidor parou
+    anterior = FilaJobsPDF(ai_service.processar_pdf_completo, caminho=caminho)
+    interrompido = asyncio.run(anterior.enviar(b"%PDF-interrompido", "interrompido.pdf"))
+    assert anterior._reservar()["id"] == interrompido["id"]
+    
+    monkeypatch.setattr(pdf_router, "fila_jobs", FilaJobsPDF(ai_service.processar_pdf_completo, caminho=caminho))
+    with TestClient(app) as client:
+        response = client.post("/api/v1/pdf/jobs", files={"file": ("a.pdf", b"%PDF-a", "application/pdf")})
+        assert response.status_code == 202
+        job = response.json()
+        assert job["status"] in ("pendente", "processando")
+        assert response.headers["Location"] == f"/api/v1/pdf/jobs/{job['id']}"
+        
+        eventos = client.get(f"/api/v1/pdf/jobs/{job['id']}/eventos")
+        assert eventos.headers["content-type"].startswith("text/event-stream")
+        nomes = [linha[len("event: "):] for linha in eventos.text.splitlines() if linha.startswith("event: ")]
+        ordem = ["pendente", "processando", "texto_extraido", "ia_concluida", "validado", "concluido"]
+        assert nomes == sorted(set(nomes), key=ordem.index)
+        assert nomes[-3:] == ["ia_concluida", "validado", "concluido"]
+        
+        concluido = client.get(f"/api/v1/pdf/jobs/{job['id']}").json()
+        assert concluido["status"] == "concluido"
+        assert concluido["dados"]["operadora"] == "AMIL"
+        
+        recuperado = client.get(f"/api/v1/pdf/jobs/{interrompido['id']}/eventos")
+        assert recuperado.text.rstrip().splitlines()[-2] == "event: concluido"
+        assert client.get(f"/api/v1/pdf/jobs/{interrompido['id']}").json()["tentativas"] == 2
+        
+        assert client.get("/api/v1/pdf/jobs/inexistente").status_code == 404
+
+
+
+def test_jobs_pdf_expiram_sem_reinicio(tmp_path):
+    """Testa a retenção dos jobs finalizados com o processo no ar: some da consulta e depois do banco"""
+    from src.infrastructure.services.fila_jobs_pdf import FilaJobsPDF
+    
+    async def processar(file_bytes, progresso=None):
+        return {"idades": [30]}
+    
+    fila = FilaJobsPDF(processar, caminho=str(tmp_path / "jobs.sqlite3"), retencao_segundos=0.3)
+    
+    async def cenario():
+        fila.iniciar()
+        try:
+            job = await fila.enviar(b"%PDF", "a.pdf")
+            async for estado in fila.eventos(job["id"]):
+                pass
+            assert estado["status"] == "concluido"
+            
+            await asyncio.sleep(0.4)
+            assert await fila.obter(job["id"]) is None
+            assert fila.estatisticas()["jobs"] == {"concluido": 1}
+            
+            # A limpeza periódica (a cada 1s com esta retenção) remove a linha
+            await asyncio.sleep(1.0)
+            assert fila.estatisticas()["jobs"] == {}
+        finally:
+            await fila.encerrar()
+    
+    asyncio.run(cenario())
+
+
+def test_extrator_layout_dispensa_ia():
+    """Testa o caminho rápido por layout: leitura determinística, confiança e fallback para a IA"""
+    registro = criar_registro_padrao()
+    
+    resultado = registro.extrair(PROPOSTA_AMIL)
+    assert resultado.operadora == "AMIL"
+    assert resultado.confianca == 1.0
+    assert resultado.dados["idades"] == [39, 5]
+    assert resultado.dados["valor_atual"] == 1250.50
+    assert resultado.dados["tipo_plano"] == "ADESAO"
+    assert resultado.dados["nome_beneficiarios"] == ["João Da Silva", "Maria Da Silva"]
+    
+    # "idade" dentro de outras palavras não é idade: valem as datas de nascimento ou as linhas "Idade:"
+    com_quantidade = PROPOSTA_AMIL + "Quantidade: 3\nValidade 12 meses\n"
+    assert registro.extrair(com_quantidade).dados["idades"] == [39, 5]
+    com_idades = com_quantidade + "Idade: 41\nIdade: 11\n"
+    assert registro.extrair(com_idades).dados["idades"] == [41, 11]
+    
+    # Sem valor mensal, ou citando outra operadora, a confiança cai abaixo do limiar
+    sem_valor = PROPOSTA_AMIL.replace("Valor total da proposta: R$ 1.250,50", "")
+    assert registro.extrair(sem_valor).confianca < 0.8
+    portabilidade = PROPOSTA_AMIL + "Portabilidade do plano anterior: Bradesco Saúde"
+    assert registro.extrair(portabilidade).confianca < 0.8
+    assert registro.extrair("Proposta de plano odontológico") is None
+    
+    pool = PoolExtracaoPDF(workers=1, funcao=extrair_texto_proposta_amil)
+    service = AIService(pool_extracao=pool)
+    service.client = ClienteIAFalso(atraso=0.1)
+    try:
+        dados = asyncio.run(service.processar_pdf_completo(b"%PDF"))
+        assert dados["confianca"] == "layout"
+        assert dados["pontuacao_layout"] == 1.0
+        assert dados["operadora"] == "AMIL"
+        assert service.client.chamadas == 0
+        
+        service.limiar_layout = 1.1
+        dados = asyncio.run(service.processar_pdf_completo(b"%PDF"))
+        assert dados["confianca"] == "ia"
+        assert service.client.chamadas == 1
+    finally:
+        pool.encerrar()
+
+
+def test_prompt_com_orcamento_de_tokens():
+    """Testa a seleção de trechos: páginas relevantes dentro do orçamento e tokens economizados"""
+    texto = contrato_longo()
+    
+    selecao = selecionar_trechos(texto, orcamento_tokens=600)
+    assert selecao.tokens_selecionados <= 600
+    assert selecao.tokens_originais == estimar_tokens(texto) > 10_000
+    assert selecao.tokens_economizados == selecao.tokens_originais - selecao.tokens_selecionados
+    assert "--- página 21 ---\nQUADRO DE BENEFICIÁRIOS" in selecao.texto
+    assert "SULAMÉRICA" in selecao.texto
+    assert selecao.trechos_usados < selecao.trechos_total == 40
+    
+    # Texto que cabe no orçamento vai inteiro
+    assert selecionar_trechos(PROPOSTA_AMIL, 600).texto == PROPOSTA_AMIL
+    
+    pool = PoolExtracaoPDF(workers=1, funcao=extrair_texto_contrato_longo)
+    service = AIService(pool_extracao=pool, limiar_layout=1.1, orcamento_tokens=600)
+    service.client = ClienteIAFalso(atraso=0.01)
+    try:
+        dados = asyncio.run(service.processar_pdf_completo(b"%PDF"))
+    finally:
+        pool.encerrar()
+    assert dados["confianca"] == "ia"
+    assert dados["tokens_economizados"] > 10_000
+    assert "Mensalidade total: R$ 2.310,00" in service.client.prompts[0]
+    assert estimar_tokens(service.client.prompts[0]) < 1000
+
+
+def test_documento_grande_processado_em_partes():
+    """Testa o map-reduce: janelas em paralelo, deduplicação, votação e consistência do valor"""
+    pool = PoolExtracaoPDF(workers=1, funcao=extrair_texto_contrato_empresarial)
+    service = AIService(
+        max_concorrencia=16, pool_extracao=pool, limiar_layout=1.1,
+        orcamento_tokens=1200, concorrencia_janelas=16
+    )
+    service.client = ClienteIALeitor(atraso=0.3)
+    try:
+        asyncio.run(pool.extrair(b"%PDF"))  # sobe o worker fora da medição
+        inicio = time.perf_counter()
+        dados = asyncio.run(service.processar_pdf_completo(b"%PDF"))
+        duracao = time.perf_counter() - inicio
+    finally:
+        pool.encerrar()
+    
+    chamadas = service.client.chamadas
+    assert dados["chamadas_ia"] == chamadas > 4
+    # Em paralelo: a latência é a da janela mais lenta, não a soma
+    assert service.client.max_simultaneas == chamadas
+    assert duracao < 0.3 * chamadas / 2
+    
+    # As janelas se sobrepõem, mas cada beneficiário aparece uma vez
+    assert dados["nome_beneficiarios"] == [f"Pessoa Exemplo {n:03d}" for n in range(120)]
+    assert dados["idades"] == [18 + n % 50 for n in range(120)]
+    assert dados["operadora"] == "SULAMERICA"
+    assert dados["tipo_plano"] == "EMPRESARIAL"
+    assert dados["valor_atual"] == 45000.00
+    assert "Valores divergentes" in dados["observacoes"]
+
+
+def corpo_multipart(conteudo: bytes, arquivo: str = "proposta.pdf") -> bytes:
+    """Corpo multipart/form-data com o PDF no campo `file` e um campo de texto antes"""
+    return (
+        b"--limite\r\nContent-Disposition: form-data; name=\"origem\"\r\n\r\nsite\r\n"
+        b"--limite\r\nContent-Disposition: form-data; name=\"file\"; filename=\"" + arquivo.encode() + b"\"\r\n"
+        b"Content-Type: application/pdf\r\n\r\n" + conteudo + b"\r\n--limite--\r\n"
+    )
+
+
+def test_upload_pdf_lido_em_partes(monkeypatch, tmp_path):
+    """Testa o upload em partes: recusa antecipada, cabeçalho %PDF, arquivo temporário e limpeza"""
+    monkeypatch.setenv("PDF_UPLOAD_DIR", str(tmp_path))
+    cabecalhos = {"content-type": "multipart/form-data; boundary=limite"}
+    
+    async def receber(corpo: bytes, lidos: list, headers: dict = cabecalhos, **opcoes):
+        async def blocos():
+            for inicio in range(0, len(corpo), 1000):
+                lidos.append(inicio)
+                yield corpo[inicio:inicio + 1000]
+        return await receber_pdf(headers, blocos(), **opcoes)
+    
+    # Acima do limite: para de ler logo depois de passar dele
+    lidos = []
+    with pytest.raises(ArquivoMuitoGrandeError):
+        asyncio.run(receber(corpo_multipart(b"%PDF" + b"x" * 200_000), lidos, tamanho_maximo=10_000))
+    assert len(lidos) <= 12
+    
+    # Content-Length acima do limite: recusa sem ler o corpo
+    lidos = []
+    with pytest.raises(ArquivoMuitoGrandeError):
+        asyncio.run(receber(
+            b"", lidos, {**cabecalhos, "content-length": "50000000"}, tamanho_maximo=10 * 1024 * 1024
+        ))
+    assert lidos == []
+    
+    # Não é PDF: recusa no primeiro bloco
+    lidos = []
+    with pytest.raises(ValueError, match="não é um PDF"):
+        asyncio.run(receber(corpo_multipart(b"MZ" + b"x" * 50_000), lidos, tamanho_maximo=100_000))
+    assert len(lidos) == 1
+    
+    # Acima do limiar: arquivo temporário, lido pelo pypdf direto do disco
+    escrita = io.BytesIO()
+    writer = PdfWriter()
+    writer.add_blank_page(width=595, height=842)
+    writer.write(escrita)
+    conteudo = escrita.getvalue()
+    pdf = asyncio.run(receber(corpo_multipart(conteudo), [], tamanho_maximo=100_000, limiar_memoria=64))
+    assert pdf.arquivo == "proposta.pdf"
+    assert pdf.em_disco and pdf.tamanho == len(conteudo)
+    assert pdf.sha256 == hashlib.sha256(conteudo).hexdigest()
+    with open(pdf.origem, "rb") as arquivo:
+        assert arquivo.read() == conteudo
+    assert extrair_texto_pdf(pdf.origem) == ""
+    assert os.path.dirname(pdf.origem) == str(tmp_path)
+    caminho = pdf.origem
+    del pdf
+    assert not os.path.exists(caminho)
+    
+    # Descartado explicitamente
+    pdf = asyncio.run(receber(corpo_multipart(conteudo), [], tamanho_maximo=100_000, limiar_memoria=64))
+    pdf.descartar()
+    assert not os.path.exists(pdf.origem)
+    
+    # Extração compartilhada: quem enviou o arquivo desiste, a outra requisição ainda o lê
+    async def compartilhar():
+        cache = CacheExtracaoPDF(caminho=None)
+        primeiro = await receber(corpo_multipart(conteudo), [], tamanho_maximo=100_000, limiar_memoria=64)
+        segundo = await receber(corpo_multipart(conteudo), [], tamanho_maximo=100_000, limiar_memoria=64)
+        
+        async def calcular(pdf, progresso):
+            await asyncio.sleep(0.05)
+            with open(pdf.origem, "rb") as arquivo:
+                return {"tamanho": len(arquivo.read())}
+        
+        async def requisicao(pdf):
+            try:
+                return await cache.obter_ou_calcular(pdf, "v1", calcular)
+            finally:
+                pdf.descartar()
+        
+        tarefa_primeiro = asyncio.ensure_future(requisicao(primeiro))
+        await asyncio.sleep(0)
+        tarefa_segundo = asyncio.ensure_future(requisicao(segundo))
+        await asyncio.sleep(0.01)
+        tarefa_primeiro.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tarefa_primeiro
+        assert os.path.exists(primeiro.origem)
+        assert await tarefa_segundo == {"tamanho": len(conteudo)}
+        assert cache.compartilhadas == 1
+        assert not os.path.exists(primeiro.origem) and not os.path.exists(segundo.origem)
+    
+    asyncio.run(compartilhar())
+    
+    # Sobras de um processo que caiu: só as antigas saem (as recentes podem ser de outro worker)
+    antiga, recente, outro = tmp_path / "upload_antiga.pdf", tmp_path / "upload_recente.pdf", tmp_path / "outro.pdf"
+    for arquivo in (antiga, recente, outro):
+        arquivo.write_bytes(b"%PDF")
+    os.utime(antiga, (time.time() - 7200, time.time() - 7200))
+    os.utime(outro, (time.time() - 7200, time.time() - 7200))
+    assert limpar_uploads_orfaos() == 1
+    assert sorted(os.listdir(tmp_path)) == ["outro.pdf", "upload_recente.pdf"]
+    recente.unlink()
+    outro.unlink()
+    
+    # Na API
+    from fastapi.testclient import TestClient
+    from main import app
+    from src.presentation.routers.pdf_router import ai_service
+    
+    # A rota remove o arquivo temporário ao terminar, mesmo com erro
+    lidos_pelo_worker = []
+    
+    async def extrair(origem, timeout=None):
+        lidos_pelo_worker.append(os.path.exists(origem))
+        raise ValueError("PDF sem texto")
+    
+    monkeypatch.setenv("PDF_UPLOAD_MEMORIA_KB", "1")
+    monkeypatch.setattr(ai_service, "cache_extracao", None)
+    monkeypatch.setattr(ai_service.pool_extracao, "extrair", extrair)
+    response = TestClient(app).post(
+        "/api/v1/pdf/extrair", files={"file": ("proposta.pdf", b"%PDF" + b"x" * 5000, "application/pdf")}
+    )
+    assert response.status_code == 400
+    assert lidos_pelo_worker == [True]
+    assert os.listdir(tmp_path) == []
+    
+    response = TestClient(app).post(
+        "/api/v1/pdf/extrair", files={"file": ("proposta.pdf", b"MZ executavel", "application/pdf")}
+    )
+    assert response.status_code == 400
+    response = TestClient(app).post(
+        "/api/v1/pdf/extrair", files={"file": ("proposta.pdf", b"%PDF" + b"x" * (10 * 1024 * 1024), "application/pdf")}
+    )
+    assert response.status_code == 413
+
+
+def test_extracao_pagina_a_pagina_para_cedo():
+    """Testa a leitura página a página: parada com os campos encontrados e limites de páginas e caracteres"""
+    clausulas = "\n".join(f"Clausula {i}. Condicoes gerais de cobertura e carencia." for i in range(40))
+    parada = partial(criar_registro_padrao().campos_completos, limiar=0.8)
+    
+    # Campos na primeira página: lê mais uma (a lista de beneficiários acabou) e para
+    pdf = criar_pdf_com_texto([PROPOSTA_AMIL] + [clausulas] * 20)
+    assert extrair_texto_pdf(pdf).count(SEPARADOR_PAGINAS) == 20
+    texto = extrair_texto_pdf(pdf, parada=parada)
+    assert texto.count(SEPARADOR_PAGINAS) == 1
+    assert "Clausula 0" in texto
+    
+    # Beneficiários continuando na página seguinte: não para no meio da lista
+    titular, dependente = PROPOSTA_AMIL.split("Dependente")
+    pdf = criar_pdf_com_texto([titular, "Dependente" + dependente] + [clausulas] * 20)
+    texto = extrair_texto_pdf(pdf, parada=parada)
+    assert texto.count(SEPARADOR_PAGINAS) == 2
+    assert criar_registro_padrao().extrair(texto).dados["idades"] == [39, 5]
+    
+    # Sem campos reconhecidos: lê tudo, dentro dos limites
+    pdf = criar_pdf_com_texto([clausulas] * 10)
+    assert extrair_texto_pdf(pdf, parada=parada).count(SEPARADOR_PAGINAS) == 9
+    assert extrair_texto_pdf(pdf, max_paginas=3).count(SEPARADOR_PAGINAS) == 2
+    assert len(extrair_texto_pdf(pdf, max_caracteres=5000)) == 5000
+    
+    # Pool padrão do serviço: o critério vai para o worker junto com a função
+    service = AIService(limiar_layout=0.8)
+    service.client = ClienteIAFalso(atraso=0.1)
+    pdf = criar_pdf_com_texto([PROPOSTA_AMIL] + [clausulas] * 20)
+    try:
+        dados = asyncio.run(service.processar_pdf_completo(pdf))
+    finally:
+        service.pool_extracao.encerrar()
+    assert dados["confianca"] == "layout"
+    assert dados["idades"] == [39, 5]
+    assert dados["total_caracteres"] < 2 * len(clausulas)
+    assert service.client.chamadas == 0
@@ -0,0 +1,46 @@
+-- ============================================================
+-- REGRAS DE COTACAO - descontos, observacoes e faixas etarias
+-- ============================================================
+-- Cada linha e uma regra da tabela declarativa lida pelo backend
+-- (infrastructure/services/regras_cotacao.py). Dentro de uma categoria
+-- as regras sao avaliadas por ordem; em descontos vale a primeira que se
+-- aplica.
+--
+-- definicao por categoria:
+--   faixas_etarias: {"inicio": 18, "rotulo": "18-29 anos"}
+--   descontos:      {"minimo_vidas": 3, "maximo_vidas": null, "taxa": "0.05",
+--                    "operadoras": ["AMIL"], "tipos": ["PME"], "observacao": "..."}
+--   observacoes:    {"campo": "idade_maxima", "operador": ">=", "valor": 60,
+--                    "operadoras": [], "tipos": [], "texto": "..."}
+
+CREATE TABLE IF NOT EXISTS regras_cotacao (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  categoria TEXT NOT NULL CHECK (categoria IN ('faixas_etarias', 'descontos', 'observacoes')),
+  ordem INTEGER NOT NULL DEFAULT 0,
+  definicao JSONB NOT NULL,
+  ativo BOOLEAN DEFAULT true,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_regras_cotacao ON regras_cotacao(categoria, ordem) WHERE ativo;
+
+-- Regras em vigor antes da tabela
+INSERT INTO regras_cotacao (categoria, ordem, definicao)
+SELECT * FROM (VALUES
+  ('faixas_etarias', 1, '{"inicio": 0, "rotulo": "0-17 anos"}'::jsonb),
+  ('faixas_etarias', 2, '{"inicio": 18, "rotulo": "18-29 anos"}'::jsonb),
+  ('faixas_etarias', 3, '{"inicio": 30, "rotulo": "30-39 anos"}'::jsonb),
+  ('faixas_etarias', 4, '{"inicio": 40, "rotulo": "40-49 anos"}'::jsonb),
+  ('faixas_etarias', 5, '{"inicio": 50, "rotulo": "50-59 anos"}'::jsonb),
+  ('faixas_etarias', 6, '{"inicio": 60, "rotulo": "60+ anos"}'::jsonb),
+  ('descontos', 1, '{"minimo_vidas": 5, "taxa": "0.10", "observacao": "Desconto de 10% aplicado por família numerosa"}'::jsonb),
+  ('descontos', 2, '{"minimo_vidas": 3, "taxa": "0.05", "observacao": "Desconto de 5% aplicado"}'::jsonb),
+  ('observacoes', 1, '{"campo": "idade_maxima", "operador": ">=", "valor": 60, "texto": "Cotação inclui beneficiário(s) idoso(s) - pode requerer carência"}'::jsonb),
+  ('observacoes', 2, '{"campo": "idade_minima", "operador": "<", "valor": 18, "texto": "Cotação inclui criança(s) - verificar cobertura pediátrica"}'::jsonb)
+) AS padrao(categoria, ordem, definicao)
+WHERE NOT EXISTS (SELECT 1 FROM regras_cotacao);
+
+-- RLS
+ALTER TABLE regras_cotacao ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "regras_cotacao_read" ON regras_cotacao FOR SELECT USING (true);